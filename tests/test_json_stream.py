@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Plain unit tests of the ORM free JSON array decoder, they run without Odoo:
+
+    python -m pytest -q tests
+"""
+import importlib.util
+import json
+import os
+import unittest
+
+_JSON_STREAM_PATH = os.path.join(os.path.dirname(__file__), os.pardir, 'vraja_woocommerce_odoo_integration', 'tools',
+                                 'json_stream.py')
+_spec = importlib.util.spec_from_file_location('woocommerce_json_stream', _JSON_STREAM_PATH)
+json_stream = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(json_stream)
+
+
+def _split(data, size):
+    return [data[index:index + size] for index in range(0, len(data), size)]
+
+
+def _decode(data, size=None):
+    return list(json_stream.iter_json_array(_split(data, size) if size else [data]))
+
+
+class TestIterJsonArray(unittest.TestCase):
+
+    def test_whole_document(self):
+        self.assertEqual(_decode(b'[{"id": 1}, {"id": 2}]'), [{'id': 1}, {'id': 2}])
+        self.assertEqual(_decode(b' [ ] '), [])
+
+    def test_chunk_boundaries(self):
+        records = [{'id': 1, 'name': 'Café ☕', 'tags': [1, 2]}, 12345, -1.5e3, 'text, with ] chars',
+                   True, None, [], {}]
+        data = json.dumps(records, ensure_ascii=False).encode('utf-8')
+        for size in range(1, len(data) + 1):
+            self.assertEqual(_decode(data, size), records, "chunk size %s" % size)
+
+    def test_number_split_across_chunks(self):
+        self.assertEqual(_decode(b'[12,345]', 2), [12, 345])
+        self.assertEqual(list(json_stream.iter_json_array([b'[1', b'2', b'3]'])), [123])
+
+    def test_not_an_array(self):
+        self.assertEqual(_decode(b'{"code": "error"}', 3), [{'code': 'error'}])
+
+    def test_truncated(self):
+        for data in (b'[', b'[{"id": 1}', b'[{"id": 1},', b'[{"id": 1}, {"id"', b'[12'):
+            with self.assertRaises(ValueError, msg=data):
+                _decode(data, 2)
+
+    def test_truncated_yields_complete_elements_first(self):
+        records = []
+        with self.assertRaises(ValueError):
+            for record in json_stream.iter_json_array([b'[{"id": 1}, {"id": 2}, {"i']):
+                records.append(record)
+        self.assertEqual(records, [{'id': 1}, {'id': 2}])
+
+    def test_malformed_separators(self):
+        for data in (b'[1,,2]', b'[,1]', b'[1,]', b'[1 2]', b'[{"a": 1} {"b": 2}]', b'[,]', b'[1,2,,]'):
+            with self.assertRaises(ValueError, msg=data):
+                _decode(data)
+            with self.assertRaises(ValueError, msg=data):
+                _decode(data, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,7 @@
 {  # App information
     'name': 'WooCommerce to Odoo Connector',
     'category': '',
-    'version': '16.0.0',
+    'version': '16.0.1.0',
     'summary': """""",
     'description': """ """,
     'depends': ['delivery', 'sale_stock', 'sale_management', 'account','website_sale'],
@@ -29,6 +29,8 @@
         'views/woocommerce_order_workflow_automation.xml',
         'views/product_data_queue.xml',
         'views/woocommerce_inventory_data_queue.xml',
+        'views/woocommerce_http_cache.xml',
+        'views/woocommerce_api_metrics.xml',
         'views/menu_item.xml',  # ⬅ menus should always come after actions
         'views/res_partner_view.xml',
         'views/sale_order.xml',
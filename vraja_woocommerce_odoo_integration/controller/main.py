@@ -53,6 +53,11 @@ class Main(http.Controller):
         queue_id = request.env['customer.data.queue'].sudo().generate_woocommerce_customer_queue(instance_id)
         request.env['customer.data.queue.line'].sudo().create_woocommerce_customer_queue_line(res, instance_id,
                                                                                           queue_id)
+        if instance_id.sudo().is_woocommerce_circuit_open():
+            # The webhook data is kept in the queue, it is processed once the store answers again.
+            _logger.info("WooCommerce store of %s is unavailable, customer queue left to process later.",
+                         instance_id.name)
+            return
         queue_id.sudo().process_woocommerce_customer_queue()
 
     def get_basic_info(self, route):
@@ -0,0 +1,51 @@
+import logging
+
+from psycopg2.extras import execute_values
+
+from odoo.addons.vraja_woocommerce_odoo_integration.tools import payload_codec
+
+_logger = logging.getLogger("WooCommerce Queue Payload Migration")
+
+QUEUE_LINE_PAYLOAD_COLUMNS = [
+    ('woocommerce_order_data_queue_line', 'order_data_to_process'),
+    ('woocommerce_product_data_queue_line', 'product_data_to_process'),
+    ('woocommerce_customer_data_queue_line', 'customer_data_to_process'),
+    ('woocommerce_inventory_data_queue_line', 'inventory_data_to_process'),
+]
+BATCH_SIZE = 1000
+
+
+def _convert_payloads(cr, table, column):
+    """
+    Rewrite the ``pprint`` payloads of one queue line table as compact JSON. Rows which cannot be decoded are left
+    as they are, they are still read with ``ast.literal_eval`` when processed.
+    """
+    converted = failed = last_id = 0
+    while True:
+        cr.execute("SELECT id, {column} FROM {table} WHERE id > %s AND {column} IS NOT NULL ORDER BY id "
+                   "LIMIT %s".format(table=table, column=column), (last_id, BATCH_SIZE))
+        rows = cr.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        values = []
+        for line_id, text in rows:
+            try:
+                values.append((line_id, payload_codec.dumps(payload_codec.loads(text))))
+            except (ValueError, SyntaxError, MemoryError, RecursionError) as error:
+                failed += 1
+                _logger.warning("%s %s: payload kept as it is (%s)", table, line_id, error)
+        if values:
+            execute_values(cr._obj, "UPDATE {table} SET {column} = data.payload FROM (VALUES %s) AS data(id, payload) "
+                                    "WHERE {table}.id = data.id".format(table=table, column=column), values)
+            converted += len(values)
+    cr.execute("UPDATE {table} SET payload_encoding = %s WHERE payload_encoding IS NULL".format(table=table),
+               (payload_codec.ENCODING_JSON,))
+    _logger.info("%s: %s payloads converted to compact JSON, %s left unchanged.", table, converted, failed)
+
+
+def migrate(cr, version):
+    if not version:
+        return
+    for table, column in QUEUE_LINE_PAYLOAD_COLUMNS:
+        _convert_payloads(cr, table, column)
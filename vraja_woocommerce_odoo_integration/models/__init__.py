@@ -1,5 +1,7 @@
 from . import woocommerce_instance_integration
 from . import woocommerce_log
+from . import woocommerce_queue_payload
+from . import woocommerce_queue_ingestion
 from . import woocommerce_payment_gateway
 from . import woocommerce_shipping_method
 from . import customer_data_queue
@@ -18,8 +20,13 @@ from . import product_pricelist
 from . import woocommerce_product_image
 from . import woocommerce_inventory_data_queue
 from . import ir_cron
+from . import ir_sequence
 from . import product_template
 from . import woocommerce_webhook
 from . import woocommerce_taxes
 from . import account_tax
 from . import account_move
+from . import woocommerce_http_cache
+from . import woocommerce_api_metrics
+from . import woocommerce_circuit_breaker
+from . import woocommerce_order_sync_cursor
@@ -1,6 +1,5 @@
 import logging
-import pprint
-from odoo import models, api, fields, tools, _
+from odoo import models, api, fields, _
 from datetime import timedelta
 
 _logger = logging.getLogger("Customer Queue Line")
@@ -8,8 +7,11 @@ _logger = logging.getLogger("Customer Queue Line")
 
 class CustomerDataQueue(models.Model):
     _name = 'woocommerce.customer.data.queue'
-    _inherit = ["mail.thread", "mail.activity.mixin"]
+    _inherit = ["mail.thread", "mail.activity.mixin", "woocommerce.queue.ingestion.mixin"]
     _description = 'WooCommerce Customer Data'
+    _woocommerce_queue_sequence = 'vraja_woocommerce_odoo_integration.seq_woocommerce_customer_queue'
+    _woocommerce_queue_line_model = 'woocommerce.customer.data.queue.line'
+    _woocommerce_queue_line_field = 'customer_queue_id'
 
     @api.depends('customer_queue_line_ids.state')
     def _compute_customer_queue_line_state_and_count(self):
@@ -34,13 +36,14 @@ class CustomerDataQueue(models.Model):
     queue_process_count = fields.Integer(help="It is used for know, how many time queue is processed.")
     woocommerce_log_id = fields.Many2one('woocommerce.log', string="Logs")
 
-    @api.model
-    def create(self, vals):
-        sequence = self.env.ref("vraja_woocommerce_odoo_integration.seq_woocommerce_customer_queue")
-        name = sequence and sequence.next_by_id() or '/'
-        if type(vals) == dict:
+    @api.model_create_multi
+    def create(self, vals_list):
+        """
+        This method is used to add sequence number in new record, the numbers of all the records are reserved at once.
+        """
+        for vals, name in zip(vals_list, self._next_woocommerce_queue_names(len(vals_list))):
             vals.update({'name': name})
-        return super(CustomerDataQueue, self).create(vals)
+        return super(CustomerDataQueue, self).create(vals_list)
 
     def generate_woocommerce_customer_queue(self, instance):
         queue_id = self.create({
@@ -50,29 +53,25 @@ class CustomerDataQueue(models.Model):
 
     def create_woocommerce_customer_queue_job(self, instance_id, woocommerce_customer_list):
         """This method used to create a customer queue """
-        res_id_list = []
-        batch_size = 50
-        for woocommerce_customer in tools.split_every(batch_size, woocommerce_customer_list):
-            queue_id = self.generate_woocommerce_customer_queue(instance_id)
-            for customer in woocommerce_customer:
-                woocommerce_customer_dict = customer
-                self.env['woocommerce.customer.data.queue.line'].create_woocommerce_customer_queue_line(
-                    woocommerce_customer_dict,
-                    instance_id, queue_id)
-            res_id_list.append(queue_id.id)
-        return res_id_list
+        queue_line_object = self.env['woocommerce.customer.data.queue.line']
+        return self.create_woocommerce_queue_batches(
+            instance_id, woocommerce_customer_list,
+            lambda customer: queue_line_object.prepare_woocommerce_customer_queue_line_vals(customer, instance_id))
 
     def fetch_customers_from_woocommerce_to_odoo(self, instance, from_date, to_date,customer_id=''):
         """This method used to fetch a woocommerce customer"""
         woocommerce_customer_list = []
         try:
             url = "{0}/wp-json/wc/v3/customers/{1}".format(instance.woocommerce_url,customer_id)
-            response_status, response_data,next_page_link = instance.woocommerce_api_calling_process("GET", url)
+            if customer_id:
+                response_status, response_data,next_page_link = instance.woocommerce_api_calling_process("GET", url)
+            else:
+                response_status, response_data = instance.woocommerce_fetch_all_pages(
+                    url, params={'per_page': 100}, stream=instance.woocommerce_stream_responses)
             if not response_status:
                 _logger.info("Getting Some error while fetch customer from woocommerce : {0}".format(response_data))
                 return False
             woocommerce_customer_list = response_data
-            _logger.info(woocommerce_customer_list)
         except Exception as error:
             _logger.info("Getting Some Error In Fetch The customer :: {0}".format(error))
         return woocommerce_customer_list
@@ -101,7 +100,7 @@ class CustomerDataQueue(models.Model):
                                                                        'Process Started')
         for rec in self.customer_queue_line_ids:
             try:
-                customer_data = eval(rec.customer_data_to_process)
+                customer_data = rec.get_woocommerce_payload()
                 customer_id, msg, fault, line_state = self.env[
                     'res.partner'].create_update_customer_woocommerce_to_odoo(log_id,instance_id,
                                                                               customer_data=customer_data)
@@ -128,7 +127,9 @@ class CustomerDataQueue(models.Model):
 
 class CustomerDataQueueLine(models.Model):
     _name = 'woocommerce.customer.data.queue.line'
+    _inherit = 'woocommerce.queue.payload.mixin'
     _description = 'Customer Data Line'
+    _woocommerce_payload_field = 'customer_data_to_process'
 
     name = fields.Char(string='Customer')
     instance_id = fields.Many2one('woocommerce.instance.integration', string='Instance', help='Select Instance Id',
@@ -143,17 +144,23 @@ class CustomerDataQueueLine(models.Model):
     res_partner_id = fields.Many2one("res.partner")
 
 
-    def create_woocommerce_customer_queue_line(self, woocommerce_customer_dict, instance_id, queue_id):
-        """This method used to create a woocommerce customer queue  line """
-
+    @api.model
+    def prepare_woocommerce_customer_queue_line_vals(self, woocommerce_customer_dict, instance_id, queue_id=False):
+        """This method used to prepare the values of a woocommerce customer queue line """
         name = "%s %s" % (
             woocommerce_customer_dict.get('first_name') or "", (woocommerce_customer_dict.get('last_name') or ""))
-        customer_queue_line_id = self.create({
+        vals = {
             'customer_id': woocommerce_customer_dict.get('id'),
             'state': 'draft',
             'name': name.strip(),
-            'customer_data_to_process': pprint.pformat(woocommerce_customer_dict),
             'instance_id': instance_id and instance_id.id or False,
             'customer_queue_id': queue_id and queue_id.id or False,
-        })
+        }
+        vals.update(self.prepare_woocommerce_payload_vals(woocommerce_customer_dict, instance_id))
+        return vals
+
+    def create_woocommerce_customer_queue_line(self, woocommerce_customer_dict, instance_id, queue_id):
+        """This method used to create a woocommerce customer queue  line """
+        customer_queue_line_id = self.create(
+            self.prepare_woocommerce_customer_queue_line_vals(woocommerce_customer_dict, instance_id, queue_id))
         return customer_queue_line_id
@@ -0,0 +1,20 @@
+from odoo import models
+
+
+class IrSequence(models.Model):
+    _inherit = 'ir.sequence'
+
+    def next_woocommerce_sequence_numbers(self, count):
+        """
+        This method is used to reserve the next ``count`` numbers of the sequence at once.
+        Standard sequences take them in one query from their postgres sequence, the others one by one.
+        @return : list of the interpolated numbers
+        """
+        self.ensure_one()
+        if count <= 0:
+            return []
+        if self.implementation != 'standard' or self.use_date_range:
+            return [self.next_by_id() for _ in range(count)]
+        self.check_access_rights('read')
+        self.env.cr.execute("SELECT nextval('ir_sequence_%03d') FROM generate_series(1, %%s)" % self.id, (count,))
+        return [self.get_next_char(row[0]) for row in self.env.cr.fetchall()]
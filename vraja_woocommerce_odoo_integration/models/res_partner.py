@@ -1,4 +1,5 @@
 from odoo import models, fields
+from odoo.tools.sql import create_index
 
 
 class SalesOrder(models.Model):
@@ -9,6 +10,16 @@ class SalesOrder(models.Model):
     woocommerce_instance_id = fields.Many2one('woocommerce.instance.integration', string="Woocommerce Instance",
                                               help="This field show the instance details of Woocommerce", tracking=True)
 
+    def init(self):
+        """
+        This method is used to index the WooCommerce customer id with its instance, customers are looked up by it
+        on every customer and order import.
+        """
+        super(SalesOrder, self).init()
+        create_index(self._cr, 'res_partner_woocommerce_customer_id_index', self._table,
+                     ['woocommerce_customer_id', 'woocommerce_instance_id'],
+                     where='woocommerce_customer_id IS NOT NULL')
+
     def prepare_customer_vals(self, address, customer_id=False, type=False):
         country_id = self.env['res.country'].search([('code', '=', address.get('country'))])
         state_id = self.env['res.country.state'].search(
@@ -38,7 +49,7 @@ class SalesOrder(models.Model):
                 limit=1)
         else:
             existing_customer = self.env['res.partner'].search(
-                [('woocommerce_customer_id', '=', woocommerce_customer_id)],
+                [('woocommerce_customer_id', '=', str(woocommerce_customer_id))],
                 limit=1)
         try:
             if existing_customer:
@@ -1,9 +1,14 @@
 from odoo import models, fields, tools, _
+from odoo.tools import float_compare
+from odoo.exceptions import UserError
+from odoo.tools.sql import create_index, index_exists
 import pytz
 import re
 import logging
+import os
 import time
 from dateutil import parser
+from .woocommerce_order_resolver import WooCommerceOrderResolver
 
 utc = pytz.utc
 
@@ -17,6 +22,9 @@ class SaleOrder(models.Model):
     woocommerce_order_number = fields.Char(string="Woocommerce Order Number", copy=False,
                                            help="This is the represent the number of Woocommerce order")
     woocommerce_order_id = fields.Char("Woo Order Reference", help="WooCommerce Order Reference", copy=False)
+    woocommerce_order_date_modified = fields.Datetime(string="WooCommerce Modified On", copy=False,
+                                                      help="WooCommerce modification date (GMT) of the order version "
+                                                           "last processed in Odoo.")
     woocommerce_sale_auto_workflow_id = fields.Many2one('woocommerce.order.workflow.automation',
                                                         'WooCommerce Auto Workflow')
     payment_gateway_id = fields.Many2one('woocommerce.payment.gateway', string="Payment Method")
@@ -25,6 +33,36 @@ class SaleOrder(models.Model):
         copy=False,
         help="Indicates if WooCommerce order was already paid."
     )
+    woocommerce_workflow_stage = fields.Selection(
+        [('confirm', 'To Confirm'), ('deliver', 'To Deliver'), ('invoice', 'To Invoice'), ('done', 'Done')],
+        string="Auto Workflow Stage", copy=False, readonly=True, index='btree_not_null',
+        help="Next step of the sale auto workflow when the instance runs it in stages.")
+    woocommerce_workflow_attempts = fields.Integer(string="Auto Workflow Attempts", copy=False, readonly=True)
+    woocommerce_workflow_error = fields.Text(string="Auto Workflow Error", copy=False, readonly=True)
+
+    def init(self):
+        """
+        This method is used to index the WooCommerce order number with its instance, the key every order import
+        looks the existing order up with. The index is unique so that a second import of the same order fails
+        instead of duplicating it, databases already holding duplicates get a plain index.
+        """
+        super(SaleOrder, self).init()
+        if index_exists(self._cr, 'sale_order_woocommerce_order_number_uniq') or index_exists(
+                self._cr, 'sale_order_woocommerce_order_number_index'):
+            return
+        self._cr.execute("""SELECT 1 FROM sale_order
+                            WHERE woocommerce_order_number IS NOT NULL AND woocommerce_order_number != ''
+                            GROUP BY instance_id, woocommerce_order_number HAVING count(*) > 1 LIMIT 1""")
+        if self._cr.fetchone():
+            _logger.warning("Duplicated WooCommerce order numbers found, the order number index is created "
+                            "without the unique constraint.")
+            create_index(self._cr, 'sale_order_woocommerce_order_number_index', self._table,
+                         ['woocommerce_order_number', 'instance_id'],
+                         where="woocommerce_order_number IS NOT NULL AND woocommerce_order_number != ''")
+            return
+        self._cr.execute("""CREATE UNIQUE INDEX sale_order_woocommerce_order_number_uniq
+                            ON sale_order (woocommerce_order_number, instance_id)
+                            WHERE woocommerce_order_number IS NOT NULL AND woocommerce_order_number != ''""")
 
     def find_create_woocommerce_customer_in_odoo(self, instance_id, woocommerce_order_dictionary, log_id=False,
                                                  line=False):
@@ -39,12 +77,15 @@ class SaleOrder(models.Model):
         woocommerce_customer_id = woocommerce_order_dictionary.get('customer_id')
         if not woocommerce_customer_id:
             return False
-        odoo_customer_id = self.env['res.partner'].search([('woocommerce_customer_id', '=', woocommerce_customer_id)])
+        odoo_customer_id = self.env['res.partner'].search(
+            [('woocommerce_customer_id', '=', str(woocommerce_customer_id))])
         if odoo_customer_id:
             return odoo_customer_id
         else:
             try:
-                customer_data = self.env['woocommerce.customer.data.queue'].fetch_customers_from_woocommerce_to_odoo(
+                prefetched_customers = self.env.context.get('woocommerce_prefetched_customers') or {}
+                customer_data = prefetched_customers.get(str(woocommerce_customer_id)) or self.env[
+                    'woocommerce.customer.data.queue'].fetch_customers_from_woocommerce_to_odoo(
                     instance_id, from_date=False, to_date=False, customer_id=woocommerce_customer_id)
                 if customer_data:
                     customer_id = self.env['res.partner'].create_update_customer_woocommerce_to_odoo(log_id,
@@ -61,16 +102,38 @@ class SaleOrder(models.Model):
             #                                                                              log_id=log_id)
             # return customer_id
 
+    def prefetch_woocommerce_customers(self, instance_id, woocommerce_order_dictionaries):
+        """
+        Fetch concurrently the WooCommerce customers of the given orders which do not exist in Odoo yet.
+        @return : dict of WooCommerce customer id (str) -> customer response
+        """
+        customer_ids = {str(order.get('customer_id')) for order in woocommerce_order_dictionaries
+                        if order.get('customer_id')}
+        if not customer_ids:
+            return {}
+        existing_customer_ids = set(self.env['res.partner'].search(
+            [('woocommerce_customer_id', 'in', list(customer_ids))]).mapped('woocommerce_customer_id'))
+        missing_customer_ids = sorted(customer_ids - existing_customer_ids)
+        results = instance_id.woocommerce_api_fan_out([
+            ("GET", "{0}/wp-json/wc/v3/customers/{1}".format(instance_id.woocommerce_url, customer_id))
+            for customer_id in missing_customer_ids])
+        return {customer_id: response_data for customer_id, (response_status, response_data, next_page_link)
+                in zip(missing_customer_ids, results) if response_status}
+
+    def get_woocommerce_order_resolver(self, instance_id=False):
+        """
+        This method is used to get the resolver of the current queue run, or a resolver for this call only.
+        """
+        resolver = self.env.context.get('woocommerce_order_resolver')
+        if resolver is None:
+            resolver = WooCommerceOrderResolver(self.env, instance_id)
+        return resolver
+
     def get_price_list(self, currency_id, instance_id):
-        price_list_object = self.env['product.pricelist']
-        price_list_id = instance_id.woocommerce_price_list_id or False
-        if not price_list_id:
-            price_list_id = price_list_object.search([('currency_id', '=', currency_id.id)], limit=1)
-        return price_list_id
+        return self.get_woocommerce_order_resolver(instance_id).get_pricelist(currency_id)
 
     def create_or_update_payment_gateway_and_workflow(self, woocommerce_order_dictionary, instance_id, line):
-        woocommerce_financial_status_object = self.env["woocommerce.financial.status.configuration"]
-        payment_gateway_obj = self.env["woocommerce.payment.gateway"]
+        resolver = self.get_woocommerce_order_resolver(instance_id)
         try:
             # below code was used for find financial status from order response
             if (woocommerce_order_dictionary.get("transaction_id")) or (
@@ -100,22 +163,13 @@ class SaleOrder(models.Model):
 
             # based on payment gateway we found financial status using below code
             if no_payment_gateway:
-                payment_gateway = payment_gateway_obj.search([("code", "=", "no_payment_method"),
-                                                              ("instance_id", "=", instance_id.id)])
-                woocommerce_financial_status = woocommerce_financial_status_object.search(
-                    [("instance_id", "=", instance_id.id),
-                     ("financial_status", "=",
-                      financial_status),
-                     ("payment_gateway_id", "=",
-                      payment_gateway.id)],
-                    limit=1)
+                payment_gateway = resolver.find_payment_gateway("no_payment_method")
+                woocommerce_financial_status = resolver.get_financial_status(financial_status,
+                                                                             payment_gateway=payment_gateway)
             else:
-                payment_gateway = payment_gateway_obj.search_or_create_woocommerce_payment_gateway(instance_id,
-                                                                                                   code=code,
-                                                                                                   name=name)
-                woocommerce_financial_status = woocommerce_financial_status_object.search(
-                    [('instance_id', '=', instance_id.id), ('payment_gateway_id.name', '=', payment_gateway.name),
-                     ('financial_status', '=', financial_status)], limit=1)
+                payment_gateway = resolver.search_or_create_payment_gateway(code, name)
+                woocommerce_financial_status = resolver.get_financial_status(
+                    financial_status, payment_gateway_name=payment_gateway.name)
 
             if not woocommerce_financial_status:
                 message = "We cant find financial status for order number- {0}".format(
@@ -158,8 +212,7 @@ class SaleOrder(models.Model):
         wc_variant_id = order_line_data.get("variation_id")
         product_sku = order_line_data.get("sku")
 
-        ProductListingItem = self.env['woocommerce.product.listing.item']
-        ProductListing = self.env['woocommerce.product.listing']
+        resolver = self.get_woocommerce_order_resolver(instance_id)
 
         # ---------------------------------------------------
         # ✅ STEP 1: SKU already in order line
@@ -168,21 +221,9 @@ class SaleOrder(models.Model):
             return product_sku
 
         # ---------------------------------------------------
-        # ✅ STEP 2: Try from listing items
+        # ✅ STEP 2: Try from listing items (variant_id first, fallback to product_id)
         # ---------------------------------------------------
-        listing_item = False
-
-        # Try variant_id first
-        if wc_variant_id and wc_variant_id != 0:
-            listing_item = ProductListingItem.search([
-                ('woocommerce_product_variant_id', '=', wc_variant_id)
-            ], limit=1)
-
-        # Fallback: try product_id
-        if not listing_item:
-            listing_item = ProductListingItem.search([
-                ('woocommerce_product_listing_id.woocommerce_product_id', '=', wc_product_id)
-            ], limit=1)
+        listing_item = resolver.get_listing_item(wc_variant_id, wc_product_id)
 
         # Found SKU
         if listing_item and listing_item.product_sku:
@@ -194,12 +235,7 @@ class SaleOrder(models.Model):
         sale_order_id.message_post(
             body=f"SKU missing for '{order_line_data.get('name')}'. Attempting product import...")
 
-        product_listing = ProductListing.woocommerce_create_products(
-            product_queue_line=False,
-            instance=instance_id,
-            log_id=log_id,
-            order_line_product_listing_id=wc_product_id
-        )
+        product_listing = resolver.import_product(wc_product_id, log_id)
 
         # If import failed → return False
         if not product_listing:
@@ -208,31 +244,41 @@ class SaleOrder(models.Model):
         # ---------------------------------------------------
         # ✅ STEP 4: Retry finding SKU after product import
         # ---------------------------------------------------
-
-        # Try variant
-        if wc_variant_id and wc_variant_id != 0:
-            listing_item = ProductListingItem.search([
-                ('woocommerce_product_variant_id', '=', wc_variant_id)
-            ], limit=1)
-
-        # Try product
-        if not listing_item:
-            listing_item = ProductListingItem.search([
-                ('woocommerce_product_listing_id.woocommerce_product_id', '=', wc_product_id)
-            ], limit=1)
+        listing_item = resolver.get_listing_item(wc_variant_id, wc_product_id)
 
         return listing_item.product_sku if listing_item and listing_item.product_sku else False
 
+    def create_woocommerce_order_lines(self, order_line_vals_list):
+        """
+        This method is used to create all the lines of the order with a single create, the amounts of the product
+        lines being computed once afterwards without per-line rounding.
+        """
+        order_lines = self.env['sale.order.line'].create(order_line_vals_list)
+        order_lines.filtered(lambda order_line: not order_line.is_delivery).with_context(
+            round=False)._compute_amount()
+        return order_lines
+
     def create_woocommerce_sale_order_line(self, sale_order_id, woocommerce_order_dictionary, woocommerce_taxes,
                                            instance_id, log_id=False, order_queue_line=False):
+        order_line_vals_list, skip_auto_workflow = self.prepare_woocommerce_sale_order_line_vals(
+            sale_order_id, woocommerce_order_dictionary, woocommerce_taxes, instance_id, log_id, order_queue_line)
+        self.create_woocommerce_order_lines(order_line_vals_list)
+        return True, '', False, 'draft', skip_auto_workflow
 
+    def prepare_woocommerce_sale_order_line_vals(self, sale_order_id, woocommerce_order_dictionary, woocommerce_taxes,
+                                                 instance_id, log_id=False, order_queue_line=False):
+        """
+        This method is used to prepare the values of the product lines of the order.
+        @return : list of sale order line values, True when the auto workflow must be skipped
+        """
         woocommerce_order_lines = woocommerce_order_dictionary.get("line_items")
         if isinstance(woocommerce_order_lines, dict):
             woocommerce_order_lines = [woocommerce_order_lines]
 
-        message = ''
         skip_auto_workflow = False
-        Product = self.env['product.product']
+        resolver = self.get_woocommerce_order_resolver(instance_id)
+        order_line_vals_list = []
+        partner_lang = sale_order_id.partner_id.lang
 
         for order_line_data in woocommerce_order_lines:
 
@@ -256,15 +302,12 @@ class SaleOrder(models.Model):
                 continue
 
             # ✅ Find product in Odoo
-            product_id = Product.search([("default_code", "=", product_sku)], limit=1)
+            product_id = resolver.get_product(product_sku)
 
-            # ✅ Re-import product if not found after SKU obtained
+            # ✅ Re-import product if not found after SKU obtained (at most once per run)
             if not product_id:
-                self.env['woocommerce.product.listing'].woocommerce_create_products(
-                    product_queue_line=False, instance=instance_id, log_id=log_id,
-                    order_line_product_listing_id=order_line_data.get('product_id')
-                )
-                product_id = Product.search([("default_code", "=", product_sku)], limit=1)
+                resolver.import_product(order_line_data.get('product_id'), log_id)
+                product_id = resolver.get_product(product_sku)
 
             # ✅ Final check
             if not product_id:
@@ -291,9 +334,7 @@ class SaleOrder(models.Model):
             if order_line_data.get('taxes'):
                 line_taxes = []
                 for taxes in order_line_data.get('taxes'):
-                    tax = self.env['account.tax'].search([
-                        ('woocommerce_tax_id.woocommerce_tax_id', '=', taxes.get('id'))
-                    ], limit=1)
+                    tax = resolver.get_tax(taxes.get('id'))
                     if tax:
                         line_taxes.append(tax.id)
                     else:
@@ -307,12 +348,8 @@ class SaleOrder(models.Model):
                 if line_taxes:
                     order_line_vals["tax_id"] = [(6, 0, line_taxes)]
 
-            sale_order_line = self.env['sale.order.line'].create(order_line_vals)
-
-            # ✅ Set description
-            desc = []
-            if sale_order_line.name:
-                desc.append(sale_order_line.name)
+            # ✅ Set description (the default product description is computed here so the line is created once)
+            desc = [product_id.with_context(lang=partner_lang).get_product_multiline_description_sale()]
             if order_line_data.get('name'):
                 desc.append(order_line_data.get('name'))
 
@@ -320,10 +357,10 @@ class SaleOrder(models.Model):
             if discount_total > 0:
                 desc.append(f"Discount applied: -{discount_total:.2f}")
 
-            sale_order_line.name = "\n".join([d for d in desc if d])
-            sale_order_line.with_context(round=False)._compute_amount()
+            order_line_vals['name'] = "\n".join([d for d in desc if d])
+            order_line_vals_list.append(order_line_vals)
 
-        return True, message, False, 'draft', skip_auto_workflow
+        return order_line_vals_list, skip_auto_workflow
 
     def convert_woocommerce_order_date(self, order_response):
         if order_response.get("date_created", False):
@@ -334,6 +371,17 @@ class SaleOrder(models.Model):
             date_order = str(date_order)
         return date_order
 
+    def convert_woocommerce_gmt_date(self, gmt_date):
+        """
+        This method is used to convert a WooCommerce ``*_gmt`` date (2024-01-31T10:20:30) into a naive UTC datetime.
+        """
+        if not gmt_date:
+            return False
+        try:
+            return parser.parse(gmt_date).replace(tzinfo=None)
+        except (ValueError, OverflowError):
+            return False
+
     def woocommerce_prepare_tax_data(self, woocommerce_order_dictionary, line, instance_id, woocommerce_taxes):
         rate_percent = ""
 
@@ -350,11 +398,10 @@ class SaleOrder(models.Model):
                 woocommerce_taxes.update({order_tax.get('rate_id'): {"name": order_tax.get('label'),
                                                                      "rate": order_tax.get('rate_percent')}})
             elif rate_percent == "not available":
-                params = {"_fields": "id,name,rate"}
                 try:
-                    url = "{0}/wp-json/wc/v3/taxes/{1}".format(instance_id.woocommerce_url, params)
-                    response_status, response_data, next_page_link = instance_id.woocommerce_api_calling_process("GET",
-                                                                                                                 url)
+                    url = "{0}/wp-json/wc/v3/taxes/{1}".format(instance_id.woocommerce_url, order_tax.get('rate_id'))
+                    response_status, response_data, next_page_link = instance_id.woocommerce_api_calling_process(
+                        "GET", url, field_set='tax_rate')
                     tax_data = response_data
                 except Exception:
                     _logger.info(response_data)
@@ -370,26 +417,32 @@ class SaleOrder(models.Model):
         return woocommerce_taxes
 
     def search_or_create_delivery_carrier(self, shipping_product_id, delivery_method, shipping_line):
-        delivery_carrier_object = self.env["delivery.carrier"]
-        shipping_method_object = self.env['woocommerce.shipping.method']
-        carrier = delivery_carrier_object.search([("woocommerce_delivery_code", "=", delivery_method)], limit=1)
-        woocommerce_shipping_method = shipping_method_object.search([("name", "ilike", delivery_method)],
-                                                                    limit=1)
+        resolver = self.get_woocommerce_order_resolver(self.instance_id)
+        carrier = resolver.find_carrier(delivery_method)
         if not carrier:
-            carrier = delivery_carrier_object.search([("name", "=", delivery_method)], limit=1)
-        if not carrier:
-            carrier = delivery_carrier_object.search(["|", ("name", "ilike", delivery_method),
-                                                      ("woocommerce_delivery_code", "ilike", delivery_method)], limit=1)
-        if not carrier:
-            carrier = delivery_carrier_object.create(
+            woocommerce_shipping_method = resolver.find_shipping_method(delivery_method)
+            carrier = self.env["delivery.carrier"].create(
                 {"name": delivery_method, "woocommerce_delivery_code": delivery_method,
                  "woocommerce_shipping_method_id": woocommerce_shipping_method.id,
                  "fixed_price": shipping_line.get("total"),
                  "product_id": shipping_product_id.id})
+            resolver.register_carrier(delivery_method, carrier)
         return carrier
 
     def woocommerce_create_shipping_fee_coupon_lines(self, instance_id, woocommerce_order_dictionary, tax_included,
                                                      woo_taxes, sale_order_id):
+        self.create_woocommerce_order_lines(self.prepare_woocommerce_shipping_fee_line_vals(
+            instance_id, woocommerce_order_dictionary, tax_included, woo_taxes, sale_order_id))
+        return True
+
+    def prepare_woocommerce_shipping_fee_line_vals(self, instance_id, woocommerce_order_dictionary, tax_included,
+                                                   woo_taxes, sale_order_id):
+        """
+        This method is used to prepare the values of the shipping and fee lines of the order, the carrier of the
+        order is set on the way.
+        @return : list of sale order line values
+        """
+        order_line_vals_list = []
 
         # below code was used for create shipping line
         shipping_product_id = instance_id.woocommerce_shipping_product_id
@@ -409,8 +462,7 @@ class SaleOrder(models.Model):
                     total_shipping += float(shipping_line.get("total_tax", 0.0))
                 shipping_line_vals = self.prepare_vals_for_sale_order_line(total_shipping, 1, shipping_product,
                                                                            sale_order_id, True)
-                shipping_line_id = self.env['sale.order.line'].create(shipping_line_vals)
-                _logger.info("Shipping line is created for the sale order: %s.", self.name)
+                order_line_vals_list.append(shipping_line_vals)
 
         # below code was used for add fee line in sale order
         for fee_line in woocommerce_order_dictionary.get("fee_lines"):
@@ -427,9 +479,8 @@ class SaleOrder(models.Model):
                                                                       instance_id.woocommerce_fee_product_id,
                                                                       sale_order_id, True)
                 # fee_line_vals.update({'price_unit': total_fee})
-                fee_line_id = self.env['sale.order.line'].create(fee_line_vals)
-                _logger.info("Fee line is created for the sale order %s.", self.name)
-        return True
+                order_line_vals_list.append(fee_line_vals)
+        return order_line_vals_list
 
     def auto_confirm_woocommerce_sale_order(self, sale_order_id):
         """
@@ -456,22 +507,70 @@ class SaleOrder(models.Model):
                         log_id : object of main log
                         line : object of log line
                 """
-        try:
-            for picking_id in sale_order_id.picking_ids:
-                for move_id in picking_id.move_ids_without_package:
-                    # if move_id.state in ['assigned']:
-                    #     move_id.sudo().write({
-                    #         'quantity_done': move_id.forecast_availability,
-                    #     })
-                    for line in move_id.move_line_ids:
-                        line.qty_done = move_id.product_uom_qty
-                # using below code we will validate delivery order automatically
-                picking_id.with_context(skip_sms=True).button_validate()
-                return True, 'Delivery Order Validated Successfully', False, 'completed'
-        except Exception as e:
-            error_msg = 'Can not validate delivery order of sale order - {0} \n Error: {1}'.format(
-                sale_order_id.name, e)
-            return False, error_msg, True, 'partially_completed'
+        return sale_order_id.validate_woocommerce_deliveries_in_bulk()[sale_order_id.id]
+
+    def prepare_woocommerce_pickings_to_validate(self, pickings):
+        """
+        This method is used to set the done quantities of the pickings to their whole demand: the pickings are
+        reserved together, the reserved moves get their reservation as done quantity in one call and only the moves
+        which could not be fully reserved are written one by one.
+        """
+        pickings.filtered(lambda picking: picking.state in ('confirmed', 'waiting')).action_assign()
+        moves = pickings.move_ids.filtered(lambda move: move.state not in ('done', 'cancel'))
+        moves._set_quantities_to_reservation()
+        for move in moves.filtered(lambda move: float_compare(move.quantity_done, move.product_uom_qty,
+                                                              precision_rounding=move.product_uom.rounding) < 0):
+            move.quantity_done = move.product_uom_qty
+        return True
+
+    def validate_woocommerce_pickings(self, pickings):
+        """
+        This method is used to validate the pickings in a savepoint without the immediate transfer, backorder and
+        SMS wizards.
+        """
+        with self.env.cr.savepoint():
+            self.prepare_woocommerce_pickings_to_validate(pickings)
+            pickings.with_context(skip_immediate=True, skip_backorder=True, skip_sms=True,
+                                  picking_ids_not_to_backorder=pickings.ids).button_validate()
+        return True
+
+    def validate_woocommerce_deliveries_in_bulk(self):
+        """
+        This method is used to validate the open delivery orders of all the orders at once. When the whole batch can
+        not be validated, the pickings left are validated one by one so that each failure is reported on its own
+        picking and order.
+        @return : dictionary of order id: (result, message, fault, state) as given for a single order
+        """
+        results = {}
+        pickings = self.picking_ids.filtered(lambda picking: picking.state not in ('done', 'cancel'))
+        picking_errors = {}
+        if pickings:
+            try:
+                self.validate_woocommerce_pickings(pickings)
+            except Exception as error:
+                if len(pickings) == 1:
+                    picking_errors[pickings.id] = str(error)
+                _logger.info("Bulk validation of %s delivery orders failed: %s", len(pickings), error)
+            remaining_pickings = pickings.filtered(lambda picking: picking.state != 'done')
+            if len(pickings) > 1:
+                for picking in remaining_pickings:
+                    try:
+                        self.validate_woocommerce_pickings(picking)
+                    except Exception as error:
+                        picking_errors[picking.id] = str(error)
+            for picking in pickings.filtered(lambda picking: picking.state != 'done'):
+                picking_errors.setdefault(picking.id, "The delivery order requires a manual validation.")
+            _logger.info("%s of %s delivery orders validated.", len(pickings) - len(picking_errors), len(pickings))
+        for sale_order in self:
+            errors = ["{0}: {1}".format(picking.name, picking_errors[picking.id])
+                      for picking in sale_order.picking_ids & pickings if picking.id in picking_errors]
+            if errors:
+                error_msg = 'Can not validate delivery order of sale order - {0} \n Error: {1}'.format(
+                    sale_order.name, '\n'.join(errors))
+                results[sale_order.id] = (False, error_msg, True, 'partially_completed')
+            else:
+                results[sale_order.id] = (True, 'Delivery Order Validated Successfully', False, 'completed')
+        return results
 
     def auto_create_woocommerce_invoice(self, sale_order_id, sale_auto_workflow_id):
         """
@@ -588,6 +687,142 @@ class SaleOrder(models.Model):
             error_msg = f"Cannot create invoice for Sale Order {sale_order_id.name}\nError: {e}"
             return False, error_msg, True, 'failed'
 
+    def create_woocommerce_invoices_in_bulk(self):
+        """
+        This method is used to invoice the orders together instead of one by one: they are grouped by auto workflow,
+        invoice journal and company, the invoices of a group are created by one ``_create_invoices`` and posted
+        together, and the payments of the paid orders are created and posted in one batch. A group which fails is
+        invoiced order by order, so one faulty order does not hold the others back.
+        @return : dictionary of order id: (result, message, fault, state) as given for a single order
+        """
+        results, groups = {}, {}
+        for sale_order in self:
+            sale_auto_workflow_id = sale_order.woocommerce_sale_auto_workflow_id
+            if sale_order.state != 'sale' or sale_order.invoice_status != 'to invoice':
+                results[sale_order.id] = (False, f"No items to invoice for {sale_order.name}", False, 'completed')
+            elif not sale_auto_workflow_id.invoice_journal_id:
+                results[sale_order.id] = (
+                    False, f"No Invoice Journal configured in workflow for {sale_order.name}", True, 'failed')
+            else:
+                groups.setdefault((sale_auto_workflow_id, sale_order.company_id), []).append(sale_order.id)
+        for (sale_auto_workflow_id, company), sale_order_ids in groups.items():
+            sale_orders = self.browse(sale_order_ids)
+            try:
+                with self.env.cr.savepoint():
+                    results.update(sale_orders.with_company(company).create_woocommerce_invoice_group(
+                        sale_auto_workflow_id))
+            except Exception as error:
+                _logger.info("Bulk invoicing of %s orders failed, they are invoiced one by one: %s",
+                             len(sale_orders), error)
+                for sale_order in sale_orders:
+                    results[sale_order.id] = self.auto_create_woocommerce_invoice_in_savepoint(
+                        sale_order, sale_auto_workflow_id)
+        return results
+
+    def auto_create_woocommerce_invoice_in_savepoint(self, sale_order_id, sale_auto_workflow_id):
+        """
+        This method is used to invoice one order of a batch, an error rolling back that order's invoice only so that
+        the other orders of the batch keep theirs.
+        @return : (result, message, fault, state) as given by auto_create_woocommerce_invoice
+        """
+        try:
+            with self.env.cr.savepoint():
+                return self.auto_create_woocommerce_invoice(sale_order_id, sale_auto_workflow_id)
+        except Exception as error:
+            return False, f"Invoice not created for {sale_order_id.name}: {error}", True, 'failed'
+
+    def get_woocommerce_payment_journal_error(self, sale_auto_workflow_id):
+        payment_journal = sale_auto_workflow_id.payment_journal_id
+        if not payment_journal:
+            return ("Payment Journal not configured → Cannot register payment for order {0}",
+                    'partially_completed')
+        if payment_journal.type not in ("bank", "cash"):
+            return (f"Invalid Payment Journal '{payment_journal.name}'. Only Bank/Cash journal can be used for "
+                    "payments.", 'failed')
+        if not payment_journal.inbound_payment_method_line_ids:
+            return f"No inbound payment method found in journal '{payment_journal.name}'.", 'failed'
+        return False
+
+    def create_woocommerce_invoice_group(self, sale_auto_workflow_id):
+        """
+        This method is used to invoice orders sharing the same auto workflow and company. Paid orders whose payment
+        can not be registered with the workflow journal are not invoiced, like the single order process reports them.
+        """
+        results = {}
+        sale_orders = self
+        payment_journal_error = self.get_woocommerce_payment_journal_error(sale_auto_workflow_id)
+        if payment_journal_error:
+            message, state = payment_journal_error
+            for sale_order in self.filtered('woocommerce_is_paid'):
+                results[sale_order.id] = (False, message.replace("{0}", sale_order.name), True, state)
+            sale_orders = self.filtered(lambda order: not order.woocommerce_is_paid)
+        if not sale_orders:
+            return results
+        # One invoice per order (grouped by order), all created at once.
+        invoices = sale_orders.with_context(
+            default_journal_id=sale_auto_workflow_id.invoice_journal_id.id)._create_invoices(grouped=True)
+        invoice_by_order = {}
+        for invoice in invoices:
+            invoice_by_order[invoice.invoice_line_ids.sale_line_ids.order_id[:1].id] = invoice
+        invoices_by_instance = {}
+        for sale_order in sale_orders.filtered(lambda order: order.instance_id and order.id in invoice_by_order):
+            invoices_by_instance.setdefault(sale_order.instance_id.id, []).append(invoice_by_order[sale_order.id].id)
+        for instance_id, invoice_ids in invoices_by_instance.items():
+            self.env['account.move'].browse(invoice_ids).write({'woocommerce_instance_id': instance_id})
+        invoices.action_post()
+        paid_orders = sale_orders.filtered(lambda order: order.woocommerce_is_paid and order.id in invoice_by_order)
+        payment_by_order = paid_orders.create_woocommerce_payments_in_bulk(sale_auto_workflow_id, invoice_by_order)
+        for sale_order in sale_orders:
+            if sale_order.id not in invoice_by_order:
+                results[sale_order.id] = (False, f"Invoice not created for {sale_order.name}", True, 'failed')
+            elif sale_order.id in payment_by_order:
+                results[sale_order.id] = (True, payment_by_order[sale_order.id], False, 'completed')
+            else:
+                results[sale_order.id] = (True, "Invoice created successfully", False, 'completed')
+        _logger.info("%s invoices created and posted for %s orders.", len(invoices), len(sale_orders))
+        return results
+
+    def create_woocommerce_payments_in_bulk(self, sale_auto_workflow_id, invoice_by_order):
+        """
+        This method is used to register the payments of the paid orders with one search for the existing payments
+        and one create, the payments being posted together.
+        @return : dictionary of order id: message
+        """
+        if not self:
+            return {}
+        payment_journal = sale_auto_workflow_id.payment_journal_id
+        payment_method_line = payment_journal.inbound_payment_method_line_ids[:1]
+        existing_payments = {}
+        for payment in self.env['account.payment'].search(
+                [('ref', 'in', [order.woocommerce_order_id or order.name for order in self]),
+                 ('partner_id', 'in', self.partner_id.ids), ('state', '!=', 'cancel')]):
+            existing_payments.setdefault((payment.ref, payment.partner_id.id), []).append(payment)
+        messages, payment_vals_list, payment_order_ids = {}, [], []
+        for sale_order in self:
+            invoice = invoice_by_order[sale_order.id]
+            reference = sale_order.woocommerce_order_id or sale_order.name
+            existing_payment = next((payment for payment in existing_payments.get(
+                (reference, sale_order.partner_id.id), []) if not float_compare(
+                payment.amount, invoice.amount_total, precision_rounding=invoice.currency_id.rounding)), False)
+            if existing_payment:
+                messages[sale_order.id] = f"Invoice created. Payment already exists → {existing_payment.name}"
+                continue
+            payment_vals_list.append({
+                'payment_type': 'inbound',
+                'partner_id': sale_order.partner_id.id,
+                'amount': invoice.amount_total,
+                'journal_id': payment_journal.id,
+                'payment_method_line_id': payment_method_line.id,
+                'date': fields.Date.today(),
+                'ref': reference,
+            })
+            payment_order_ids.append(sale_order.id)
+        if payment_vals_list:
+            self.env['account.payment'].create(payment_vals_list).action_post()
+        for sale_order_id in payment_order_ids:
+            messages[sale_order_id] = "Invoice created & payment registered successfully"
+        return messages
+
     def check_automatic_workflow_process_for_woocommerce_order(self, instance_id, woocommerce_order_dictionary,
                                                                sale_order_id, financial_status, skip_auto_workflow):
         result = False
@@ -609,6 +844,12 @@ class SaleOrder(models.Model):
         if (
                 sale_auto_workflow_id and sale_auto_workflow_id.confirm_sale_order and sale_auto_workflow_id.validate_delivery_order and
                 sale_order_id.state == 'sale'):
+            deferred_delivery_order_ids = self.env.context.get('woocommerce_deferred_delivery_order_ids')
+            if deferred_delivery_order_ids is not None:
+                # Bulk delivery validation: the queue validates the deliveries of its orders together once its lines
+                # are processed, and invoices them afterwards.
+                deferred_delivery_order_ids.append(sale_order_id.id)
+                return True, "Sale order created, delivery validation queued", False, 'completed'
             result, log_msg, fault_or_not, line_state = self.auto_validate_woocommerce_delivery_order(sale_order_id)
             if not result:
                 return result, log_msg, fault_or_not, line_state
@@ -617,8 +858,15 @@ class SaleOrder(models.Model):
                 and sale_auto_workflow_id.create_invoice
                 and sale_order_id.state == 'sale'
         ):
-            result, log_msg, fault_or_not, line_state = self.auto_create_woocommerce_invoice(sale_order_id,
-                                                                                             sale_auto_workflow_id)
+            deferred_invoice_order_ids = self.env.context.get('woocommerce_deferred_invoice_order_ids')
+            if deferred_invoice_order_ids is not None:
+                # Bulk invoicing: the queue invoices its orders together once its lines are processed.
+                deferred_invoice_order_ids.append(sale_order_id.id)
+                result, log_msg, fault_or_not, line_state = True, "Sale order created, invoice queued", False, \
+                    'completed'
+            else:
+                result, log_msg, fault_or_not, line_state = self.auto_create_woocommerce_invoice(
+                    sale_order_id, sale_auto_workflow_id)
             if not result:
                 return result, log_msg, fault_or_not, line_state
         #  If no workflow actions were triggered, still mark process as successful (not failed)
@@ -633,6 +881,201 @@ class SaleOrder(models.Model):
 
         return result, log_msg, fault_or_not, line_state
 
+    def get_woocommerce_workflow_stages(self):
+        """
+        This method is used to get the stages the sale auto workflow of the order goes through, in the order the
+        inline workflow runs them: nothing is done when the workflow does not confirm the order.
+        """
+        sale_auto_workflow_id = self.woocommerce_sale_auto_workflow_id
+        if not sale_auto_workflow_id or not sale_auto_workflow_id.confirm_sale_order:
+            return []
+        stages = ['confirm']
+        if sale_auto_workflow_id.validate_delivery_order:
+            stages.append('deliver')
+        if sale_auto_workflow_id.create_invoice:
+            stages.append('invoice')
+        return stages
+
+    def get_next_woocommerce_workflow_stage(self, stage=False):
+        stages = self.get_woocommerce_workflow_stages()
+        if stage:
+            stages = stages[stages.index(stage) + 1:] if stage in stages else []
+        return stages and stages[0] or 'done'
+
+    def queue_woocommerce_order_workflow(self, skip_auto_workflow):
+        """
+        This method is used to hand the imported order to the staged sale auto workflow instead of running it
+        inline, the stage crons of the instance confirm, deliver and invoice it afterwards.
+        """
+        if skip_auto_workflow:
+            return True, "Order Created Successfully without perform sale auto workflow", False, 'completed'
+        if not self.get_woocommerce_workflow_stages():
+            return True, "Sale order created successfully (no automatic workflow applied)", False, 'completed'
+        self.write({'woocommerce_workflow_stage': self.get_next_woocommerce_workflow_stage(),
+                    'woocommerce_workflow_attempts': 0,
+                    'woocommerce_workflow_error': False})
+        return True, "Sale order created successfully, sale auto workflow queued", False, 'completed'
+
+    def run_woocommerce_workflow_stage(self):
+        """
+        This method is used to run the current sale auto workflow stage of the order in a savepoint. On success the
+        order moves to its next stage, on failure the changes of the stage are rolled back and the error is kept on
+        the order, which stays at the same stage for the next run.
+        @return : True when the stage succeeded, error message otherwise
+        """
+        self.ensure_one()
+        stage = self.woocommerce_workflow_stage
+        try:
+            with self.env.cr.savepoint():
+                if stage == 'confirm':
+                    if self.state in ('draft', 'sent'):
+                        result, log_msg, fault_or_not, line_state = self.auto_confirm_woocommerce_sale_order(self)
+                        if not result:
+                            raise UserError(log_msg)
+                elif stage == 'deliver':
+                    if self.state == 'sale':
+                        result, log_msg, fault_or_not, line_state = self.auto_validate_woocommerce_delivery_order(
+                            self)
+                        if not result:
+                            raise UserError(log_msg)
+                elif stage == 'invoice':
+                    if self.state == 'sale':
+                        result, log_msg, fault_or_not, line_state = self.auto_create_woocommerce_invoice(
+                            self, self.woocommerce_sale_auto_workflow_id)
+                        # Nothing left to invoice is not an error.
+                        if not result and fault_or_not:
+                            raise UserError(log_msg)
+                self.write({'woocommerce_workflow_stage': self.get_next_woocommerce_workflow_stage(stage),
+                            'woocommerce_workflow_attempts': 0,
+                            'woocommerce_workflow_error': False})
+        except Exception as error:
+            self.write({'woocommerce_workflow_attempts': self.woocommerce_workflow_attempts + 1,
+                        'woocommerce_workflow_error': str(error)})
+            return str(error)
+        return True
+
+    def run_woocommerce_workflow_stage_in_bulk(self, stage):
+        """
+        This method is used to run the delivery or invoice stage of the orders with the bulk delivery validation or
+        invoicing, the orders are then moved to their next stage or keep their error like with
+        ``run_woocommerce_workflow_stage``.
+        @return : dictionary of order id: True or error message
+        """
+        stage_results = {}
+        if stage == 'deliver':
+            sale_orders = self.filtered(lambda order: order.state == 'sale')
+            results = sale_orders.validate_woocommerce_deliveries_in_bulk()
+            results.update({sale_order.id: (True, '', False, 'completed') for sale_order in self - sale_orders})
+        else:
+            results = self.create_woocommerce_invoices_in_bulk()
+        for sale_order_id, (result, log_msg, fault_or_not, line_state) in results.items():
+            sale_order = self.browse(sale_order_id)
+            if result or not fault_or_not:
+                next_stage = sale_order.get_next_woocommerce_workflow_stage(stage)
+                sale_order.write({'woocommerce_workflow_stage': next_stage,
+                                  'woocommerce_workflow_attempts': 0,
+                                  'woocommerce_workflow_error': False})
+                stage_results[sale_order_id] = True
+            else:
+                sale_order.write({'woocommerce_workflow_attempts': sale_order.woocommerce_workflow_attempts + 1,
+                                  'woocommerce_workflow_error': log_msg})
+                stage_results[sale_order_id] = log_msg
+        return stage_results
+
+    def lease_woocommerce_workflow_orders(self, instance, stage, excluded_order_ids=None):
+        """
+        This method is used to lock the next batch of orders of the instance waiting at the given stage. The rows
+        are locked with SKIP LOCKED until the batch is committed, so the workers of a stage never share an order.
+        @return : sale orders of the batch
+        """
+        self.env.flush_all()
+        self.env.cr.execute("""
+            SELECT id FROM sale_order
+            WHERE instance_id = %(instance)s AND woocommerce_workflow_stage = %(stage)s
+              AND COALESCE(woocommerce_workflow_attempts, 0) < %(attempts)s
+              AND NOT (id = ANY(%(excluded)s::integer[]))
+            ORDER BY id LIMIT %(limit)s FOR UPDATE SKIP LOCKED""",
+            {'instance': instance.id, 'stage': stage, 'attempts': max(instance.woocommerce_workflow_max_attempts, 1),
+             'excluded': list(excluded_order_ids or []),
+             'limit': max(instance['woocommerce_workflow_%s_batch_size' % stage], 1)})
+        return self.browse([order_id for order_id, in self.env.cr.fetchall()])
+
+    def cron_process_woocommerce_order_workflow_stage(self, instance_id, stage, worker=1):
+        """
+        Worker of one sale auto workflow stage of an instance: it runs the stage on a batch of orders, commits it
+        and takes the next batch until no order is waiting. Orders which failed are tried again by the next run.
+        """
+        instance = self.env['woocommerce.instance.integration'].browse(instance_id)
+        if not instance.exists() or not instance.active or not instance.woocommerce_staged_order_workflow:
+            return False
+        worker_name = "%s/%s/%s/%s" % (instance.id, stage, worker, os.getpid())
+        attempted_order_ids, log_id = [], False
+        while True:
+            sale_orders = self.lease_woocommerce_workflow_orders(instance, stage, attempted_order_ids)
+            if not sale_orders:
+                break
+            attempted_order_ids += sale_orders.ids
+            if (stage == 'invoice' and instance.woocommerce_bulk_invoicing) or (
+                    stage == 'deliver' and instance.woocommerce_bulk_delivery_validation):
+                stage_results = sale_orders.run_woocommerce_workflow_stage_in_bulk(stage)
+            else:
+                stage_results = {sale_order.id: sale_order.run_woocommerce_workflow_stage()
+                                 for sale_order in sale_orders}
+            for result in stage_results.values():
+                if result is True:
+                    continue
+                if not log_id:
+                    log_id = self.env['woocommerce.log'].generate_woocommerce_logs('order', 'import', instance,
+                                                                                   'Process Started')
+                self.env['woocommerce.log.line'].generate_woocommerce_process_line(
+                    'order', 'import', instance, result, False, result, log_id, True)
+            self._cr.commit()
+            _logger.info("Order workflow worker %s processed %s orders", worker_name, len(sale_orders))
+        if log_id:
+            log_id.woocommerce_operation_message = 'Process Has Been Finished'
+            self._cr.commit()
+        return True
+
+    def action_retry_woocommerce_workflow(self):
+        """
+        This method is used to give the orders whose stage failed too many times a new series of attempts.
+        """
+        self.filtered(lambda order: order.woocommerce_workflow_stage not in (False, 'done')).write(
+            {'woocommerce_workflow_attempts': 0, 'woocommerce_workflow_error': False})
+        return True
+
+    def cancel_woocommerce_orders_in_bulk(self):
+        """
+        This method is used to cancel the orders with one ``action_cancel``. Orders already delivered or invoiced are
+        left for a manual cancellation, and when the batch fails the orders are cancelled one by one so that each
+        failure is reported on its own order.
+        @return : dictionary of order id: True or error message
+        """
+        results = {}
+        sale_orders = self
+        for sale_order in self:
+            if sale_order.picking_ids.filtered(lambda picking: picking.state == 'done') or \
+                    sale_order.invoice_ids.filtered(lambda invoice: invoice.state == 'posted'):
+                results[sale_order.id] = "The order is already delivered or invoiced, cancel it manually."
+                sale_orders -= sale_order
+        if not sale_orders:
+            return results
+        try:
+            with self.env.cr.savepoint():
+                sale_orders.with_context(disable_cancel_warning=True).action_cancel()
+            results.update(dict.fromkeys(sale_orders.ids, True))
+        except Exception as error:
+            _logger.info("Bulk cancellation of %s orders failed, they are cancelled one by one: %s",
+                         len(sale_orders), error)
+            for sale_order in sale_orders:
+                try:
+                    with self.env.cr.savepoint():
+                        sale_order.with_context(disable_cancel_warning=True).action_cancel()
+                    results[sale_order.id] = True
+                except Exception as error:
+                    results[sale_order.id] = str(error)
+        return results
+
     def process_import_order_from_woocommerce(self, woocommerce_order_dictionary, instance_id, log_id=False,
                                               line=False, cancelled=False):
 
@@ -650,6 +1093,9 @@ class SaleOrder(models.Model):
                                       ("woocommerce_order_number", "=", order_number)], limit=1)
         if existing_order:
             line.sale_order_id = existing_order.id
+            # Remember the processed version, the next incremental import skips it while it is unchanged.
+            existing_order.woocommerce_order_date_modified = self.convert_woocommerce_gmt_date(
+                woocommerce_order_dictionary.get('date_modified_gmt')) or existing_order.woocommerce_order_date_modified
             if cancelled:
                 if existing_order.state not in ['cancel', 'done']:
                     existing_order.action_cancel()
@@ -685,8 +1131,8 @@ class SaleOrder(models.Model):
             if isinstance(woocommerce_taxes, bool):
                 return False
 
-        currency_id = self.env['res.currency'].search([('name', '=', woocommerce_order_dictionary.get('currency'))],
-                                                      limit=1)
+        currency_id = self.get_woocommerce_order_resolver(instance_id).get_currency(
+            woocommerce_order_dictionary.get('currency'))
         price_list_id = self.get_price_list(currency_id, instance_id)
         date_order = self.convert_woocommerce_order_date(woocommerce_order_dictionary)
         sale_order_id = self.create({"partner_id": customer_id and customer_id.id,
@@ -706,6 +1152,8 @@ class SaleOrder(models.Model):
                               'woocommerce_order_number': woocommerce_order_dictionary.get('number', ''),
                               'woocommerce_sale_auto_workflow_id': financial_status.sale_auto_workflow_id.id,
                               "woocommerce_order_id": woocommerce_order_dictionary.get("id"),
+                              "woocommerce_order_date_modified": self.convert_woocommerce_gmt_date(
+                                  woocommerce_order_dictionary.get('date_modified_gmt')),
                               "woocommerce_is_paid": True if woocommerce_order_dictionary.get('status') in (
                                   'processing', 'completed') else False,
                               })
@@ -713,17 +1161,18 @@ class SaleOrder(models.Model):
         line.sale_order_id = sale_order_id.id  # this line used for set the sale order id in order queue line sale order field
         tax_included = woocommerce_order_dictionary.get("prices_include_tax")
         if sale_order_id:
-            order_lines, msg, fault_or_not, line_state, skip_auto_workflow = sale_order_id.create_woocommerce_sale_order_line(
+            # Product, shipping and fee lines are inserted together, the order totals are computed once.
+            order_line_vals_list, skip_auto_workflow = sale_order_id.prepare_woocommerce_sale_order_line_vals(
                 sale_order_id,
                 woocommerce_order_dictionary,
                 woocommerce_taxes,
                 instance_id=instance_id,
                 log_id=log_id,
                 order_queue_line=line)
-            if not order_lines:
-                return False, msg, True, line_state
-            sale_order_id.woocommerce_create_shipping_fee_coupon_lines(instance_id, woocommerce_order_dictionary,
-                                                                       tax_included, woocommerce_taxes, sale_order_id)
+            order_line_vals_list += sale_order_id.prepare_woocommerce_shipping_fee_line_vals(
+                instance_id, woocommerce_order_dictionary, tax_included, woocommerce_taxes, sale_order_id)
+            sale_order_id.create_woocommerce_order_lines(order_line_vals_list)
+            _logger.info("%s lines are created for the sale order %s.", len(order_line_vals_list), sale_order_id.name)
             # if float(woocommerce_order_dictionary.get('discount_total', 0.0)) > 0.0:
             #     # Extract coupon code(s)
             #     coupon_lines = woocommerce_order_dictionary.get('coupon_lines', [])
@@ -755,8 +1204,15 @@ class SaleOrder(models.Model):
             #     sale_order_line = self.env['sale.order.line'].create(order_line_vals)
             #     sale_order_line.with_context(round=False)._compute_amount()
 
-            check_process_status, log_msg, fault_or_not, line_state = self.check_automatic_workflow_process_for_woocommerce_order(
-                instance_id, woocommerce_order_dictionary, sale_order_id, financial_status, skip_auto_workflow)
+            if instance_id.woocommerce_staged_order_workflow:
+                # Confirmation, delivery and invoicing are left to the stage crons of the instance.
+                check_process_status, log_msg, fault_or_not, line_state = \
+                    sale_order_id.queue_woocommerce_order_workflow(skip_auto_workflow)
+            else:
+                check_process_status, log_msg, fault_or_not, line_state = \
+                    self.check_automatic_workflow_process_for_woocommerce_order(
+                        instance_id, woocommerce_order_dictionary, sale_order_id, financial_status,
+                        skip_auto_workflow)
             # if check_process_status:
             #     msg = "sale order created successfully" if not log_msg else log_msg
             #     return True, msg, False, 'completed'
@@ -0,0 +1,147 @@
+import json
+import logging
+from datetime import timedelta
+
+from psycopg2 import IntegrityError
+
+from odoo import models, fields, api, SUPERUSER_ID
+from ..tools import metrics
+
+_logger = logging.getLogger("WooCommerce API Metrics")
+
+METRICS_RETENTION_DAYS = 30
+
+
+class WooCommerceApiMetrics(models.Model):
+    _name = 'woocommerce.api.metrics'
+    _description = 'WooCommerce API Metrics'
+    _order = 'hour DESC, request_count DESC'
+    _rec_name = 'endpoint'
+
+    instance_id = fields.Many2one('woocommerce.instance.integration', string='Instance', required=True,
+                                  ondelete='cascade', index=True)
+    method = fields.Char(string='Method', required=True)
+    endpoint = fields.Char(string='Endpoint', required=True, help='Endpoint template, e.g. /products/{id}/variations')
+    hour = fields.Datetime(string='Hour', required=True, index=True)
+    request_count = fields.Integer(string='Requests')
+    error_count = fields.Integer(string='Errors', help='Requests answered with HTTP >= 400 or without any response.')
+    retry_count = fields.Integer(string='Retries', help='Extra attempts (transient errors and throttling).')
+    # Hourly byte totals of an endpoint can exceed an int4 column: stored as numeric without decimals.
+    bytes_sent = fields.Float(string='Bytes Sent', digits=(20, 0))
+    bytes_received = fields.Float(string='Bytes Received', digits=(20, 0))
+    dns_time = fields.Float(string='DNS (s)', help='Total time spent resolving the host name.')
+    connect_time = fields.Float(string='Connect (s)', help='Total time spent opening TCP/TLS connections.')
+    ttfb_time = fields.Float(string='TTFB (s)', help='Total time between sending the request and receiving the '
+                                                     'response headers.')
+    total_time = fields.Float(string='Total (s)', help='Total time including retries, backoff and rate limiting.')
+    throttle_wait_time = fields.Float(string='Rate Limiter Wait (s)')
+    avg_time_ms = fields.Float(string='Avg (ms)', compute='_compute_average_times')
+    avg_dns_ms = fields.Float(string='Avg DNS (ms)', compute='_compute_average_times')
+    avg_connect_ms = fields.Float(string='Avg Connect (ms)', compute='_compute_average_times')
+    avg_ttfb_ms = fields.Float(string='Avg TTFB (ms)', compute='_compute_average_times')
+    p50_ms = fields.Float(string='p50 (ms)', group_operator='max')
+    p95_ms = fields.Float(string='p95 (ms)', group_operator='max')
+    p99_ms = fields.Float(string='p99 (ms)', group_operator='max')
+    status_codes = fields.Text(string='Status Codes', help='JSON object: HTTP status -> number of responses.')
+    latency_histogram = fields.Text(string='Latency Histogram',
+                                    help='JSON list of counts per latency bucket (%s ms).' % ', '.join(
+                                        map(str, metrics.LATENCY_BUCKETS_MS)))
+
+    _sql_constraints = [
+        ('instance_method_endpoint_hour_uniq', 'unique(instance_id, method, endpoint, hour)',
+         'API metrics already exist for this endpoint and hour.')
+    ]
+
+    @api.depends('request_count', 'total_time', 'dns_time', 'connect_time', 'ttfb_time')
+    def _compute_average_times(self):
+        for record in self:
+            count = record.request_count or 1
+            record.avg_time_ms = record.total_time * 1000.0 / count
+            record.avg_dns_ms = record.dns_time * 1000.0 / count
+            record.avg_connect_ms = record.connect_time * 1000.0 / count
+            record.avg_ttfb_ms = record.ttfb_time * 1000.0 / count
+
+    def _get_woocommerce_metrics_aggregate(self):
+        self.ensure_one()
+        return {
+            'requests': self.request_count, 'errors': self.error_count, 'retries': self.retry_count,
+            'bytes_sent': int(self.bytes_sent), 'bytes_received': int(self.bytes_received), 'dns': self.dns_time,
+            'connect': self.connect_time, 'ttfb': self.ttfb_time, 'total': self.total_time,
+            'throttle_wait': self.throttle_wait_time, 'status_codes': json.loads(self.status_codes or '{}'),
+            'histogram': json.loads(self.latency_histogram or '[]') or [0] * (len(metrics.LATENCY_BUCKETS_MS) + 1),
+        }
+
+    @api.model
+    def _prepare_woocommerce_metrics_vals(self, aggregate):
+        histogram = aggregate['histogram']
+        return {
+            'request_count': aggregate['requests'],
+            'error_count': aggregate['errors'],
+            'retry_count': aggregate['retries'],
+            'bytes_sent': aggregate['bytes_sent'],
+            'bytes_received': aggregate['bytes_received'],
+            'dns_time': aggregate['dns'],
+            'connect_time': aggregate['connect'],
+            'ttfb_time': aggregate['ttfb'],
+            'total_time': aggregate['total'],
+            'throttle_wait_time': aggregate['throttle_wait'],
+            'status_codes': json.dumps(aggregate['status_codes'], sort_keys=True),
+            'latency_histogram': json.dumps(histogram),
+            'p50_ms': metrics.percentile(histogram, 0.50),
+            'p95_ms': metrics.percentile(histogram, 0.95),
+            'p99_ms': metrics.percentile(histogram, 0.99),
+        }
+
+    @api.model
+    def flush_woocommerce_api_metrics(self, force=False):
+        """
+        Store the API metrics aggregated by this worker. A separate cursor is used, so the metrics are kept even
+        when the synchronisation transaction is rolled back and the rows are never locked for a long import.
+        """
+        dbname = self.env.cr.dbname
+        if not force and not metrics.flush_due(dbname):
+            return False
+        drained = metrics.drain(dbname)
+        if not drained:
+            return False
+        try:
+            with self.pool.cursor() as cr:
+                metrics_object = self.with_env(self.env(cr=cr, user=SUPERUSER_ID))
+                instance_ids = set(metrics_object.env['woocommerce.instance.integration'].browse(
+                    {key[0] for key in drained}).exists().ids)
+                for (instance_id, method, endpoint, hour), aggregate in drained.items():
+                    if instance_id in instance_ids:
+                        metrics_object._store_woocommerce_metrics(instance_id, method, endpoint, hour, aggregate)
+        except Exception as error:
+            _logger.warning("Unable to store WooCommerce API metrics, keeping them for the next flush: %s", error)
+            metrics.restore(dbname, drained)
+            return False
+        return True
+
+    @api.model
+    def _store_woocommerce_metrics(self, instance_id, method, endpoint, hour, aggregate):
+        domain_params = (instance_id, method, endpoint, hour)
+        query = """SELECT id FROM woocommerce_api_metrics
+                   WHERE instance_id = %s AND method = %s AND endpoint = %s AND hour = %s
+                   FOR UPDATE"""
+        self.env.cr.execute(query, domain_params)
+        row = self.env.cr.fetchone()
+        if not row:
+            vals = self._prepare_woocommerce_metrics_vals(aggregate)
+            vals.update(instance_id=instance_id, method=method, endpoint=endpoint, hour=hour)
+            try:
+                with self.env.cr.savepoint():
+                    return self.create(vals)
+            except IntegrityError:
+                # Another worker created the row meanwhile, merge into it.
+                self.env.cr.execute(query, domain_params)
+                row = self.env.cr.fetchone()
+        record = self.browse(row[0])
+        merged = metrics.merge_aggregate(record._get_woocommerce_metrics_aggregate(), aggregate)
+        record.write(self._prepare_woocommerce_metrics_vals(merged))
+        return record
+
+    @api.autovacuum
+    def _gc_woocommerce_api_metrics(self):
+        limit_date = fields.Datetime.now() - timedelta(days=METRICS_RETENTION_DAYS)
+        self.search([('hour', '<', limit_date)]).unlink()
@@ -0,0 +1,100 @@
+import logging
+from datetime import datetime
+
+from psycopg2 import IntegrityError
+
+from odoo import models, fields, api, SUPERUSER_ID
+from ..tools import circuit_breaker
+
+_logger = logging.getLogger("WooCommerce Circuit Breaker")
+
+# Seconds during which a worker trusts its own copy of the shared circuit state.
+CIRCUIT_STATE_REFRESH_SECONDS = 5
+
+
+class WooCommerceCircuitBreaker(models.Model):
+    _name = 'woocommerce.circuit.breaker'
+    _description = 'WooCommerce Circuit Breaker'
+    _rec_name = 'instance_id'
+
+    instance_id = fields.Many2one('woocommerce.instance.integration', string='Instance', required=True,
+                                  ondelete='cascade', index=True)
+    state = fields.Selection([(circuit_breaker.CLOSED, 'Closed'), (circuit_breaker.OPEN, 'Open'),
+                              (circuit_breaker.HALF_OPEN, 'Half Open')], string='State', required=True,
+                             default=circuit_breaker.CLOSED)
+    failure_count = fields.Integer(string='Consecutive Failures')
+    opened_until = fields.Datetime(string='Open Until', help='No request is sent to the store before this time.')
+    last_error = fields.Char(string='Last Error')
+
+    _sql_constraints = [
+        ('instance_uniq', 'unique(instance_id)', 'An instance can only have one circuit breaker.')
+    ]
+
+    @api.model
+    def _get_woocommerce_breaker(self, instance):
+        return circuit_breaker.get_breaker(instance._get_woocommerce_session_key(),
+                                           instance.woocommerce_circuit_failure_threshold,
+                                           instance.woocommerce_circuit_reset_timeout)
+
+    @api.model
+    def sync_woocommerce_circuit_breaker(self, instance, force=False):
+        """
+        Share the state changes of this worker and take over the ones of the other workers. A separate cursor
+        is used: the state must be visible to the other workers right away, whatever happens to the current
+        transaction.
+        """
+        breaker = self._get_woocommerce_breaker(instance)
+        change = breaker.pop_change()
+        if not change and not force and not breaker.load_due(CIRCUIT_STATE_REFRESH_SECONDS):
+            return breaker
+        try:
+            with self.pool.cursor() as cr:
+                breaker_object = self.with_env(self.env(cr=cr, user=SUPERUSER_ID))
+                if change:
+                    breaker_object._store_woocommerce_circuit_state(instance.id, *change)
+                cr.execute("""SELECT state, failure_count, opened_until, last_error FROM woocommerce_circuit_breaker
+                              WHERE instance_id = %s""", (instance.id,))
+                row = cr.fetchone()
+        except Exception as error:
+            _logger.warning("Unable to share the circuit breaker state of %s: %s", instance.name, error)
+            return breaker
+        if row:
+            opened_until = row[2] and (row[2] - datetime(1970, 1, 1)).total_seconds() or 0.0
+            breaker.load(row[0], row[1], opened_until, row[3])
+        else:
+            breaker.load(circuit_breaker.CLOSED, 0, 0.0)
+        return breaker
+
+    @api.model
+    def _store_woocommerce_circuit_state(self, instance_id, state, failures, opened_until, last_error):
+        vals = {
+            'state': state,
+            'failure_count': failures,
+            'opened_until': opened_until and datetime.utcfromtimestamp(opened_until) or False,
+            'last_error': last_error or False,
+        }
+        self.env.cr.execute("SELECT id FROM woocommerce_circuit_breaker WHERE instance_id = %s FOR UPDATE",
+                            (instance_id,))
+        row = self.env.cr.fetchone()
+        if not row:
+            try:
+                with self.env.cr.savepoint():
+                    return self.create(dict(vals, instance_id=instance_id))
+            except IntegrityError:
+                self.env.cr.execute("SELECT id FROM woocommerce_circuit_breaker WHERE instance_id = %s FOR UPDATE",
+                                    (instance_id,))
+                row = self.env.cr.fetchone()
+        record = self.browse(row[0])
+        if record.state != state:
+            _logger.warning("WooCommerce circuit breaker of instance %s: %s -> %s (%s)", instance_id, record.state,
+                            state, last_error)
+        record.write(vals)
+        return record
+
+    def action_reset_woocommerce_circuit_breaker(self):
+        for record in self:
+            record.write({'state': circuit_breaker.CLOSED, 'failure_count': 0, 'opened_until': False})
+            breaker = self._get_woocommerce_breaker(record.instance_id)
+            breaker.pop_change()
+            breaker.load(circuit_breaker.CLOSED, 0, 0.0)
+        return True
@@ -0,0 +1,100 @@
+import json
+import logging
+from datetime import timedelta
+
+from psycopg2 import IntegrityError
+
+from odoo import models, fields, api
+from ..tools import api_client
+
+_logger = logging.getLogger("WooCommerce HTTP Cache")
+
+
+class WooCommerceHttpCache(models.Model):
+    _name = 'woocommerce.http.cache'
+    _description = 'WooCommerce HTTP Cache'
+    _order = 'write_date DESC'
+
+    instance_id = fields.Many2one('woocommerce.instance.integration', string='Instance', required=True,
+                                  ondelete='cascade', index=True)
+    url = fields.Char(string='URL', required=True, help='Requested URL including the sorted query parameters.')
+    etag = fields.Char(string='ETag')
+    last_modified = fields.Char(string='Last Modified')
+    response_body = fields.Text(string='Response Body')
+    next_page_link = fields.Char(string='Next Page Link')
+    fetched_at = fields.Datetime(string='Validated At', help='Last time the body was downloaded or revalidated.')
+    hit_count = fields.Integer(string='Hits', help='Number of times the cached body was reused.')
+
+    _sql_constraints = [
+        ('instance_url_uniq', 'unique(instance_id, url)', 'The HTTP cache already has an entry for this URL.')
+    ]
+
+    @api.model
+    def _get_woocommerce_cache_key(self, api_url, params=False):
+        return api_client.request_cache_key(api_url, params)
+
+    def _is_woocommerce_cache_fresh(self, instance):
+        return self.fetched_at and self.fetched_at + timedelta(
+            minutes=instance.woocommerce_reference_cache_ttl) > fields.Datetime.now()
+
+    @api.model
+    def woocommerce_cached_get(self, instance, api_url, params=False):
+        """
+        Conditional GET: the stored ETag / Last-Modified validators are sent, a 304 answer reuses the stored body.
+        Without validators the stored body is reused as long as it is younger than the instance TTL.
+        :return: (status, data, next_page_link, unchanged)
+        """
+        if instance.woocommerce_reference_cache_ttl <= 0:
+            response_status, response_data, next_page_link = instance.woocommerce_api_calling_process(
+                "GET", api_url, params=params)
+            return response_status, response_data, next_page_link, False
+        cache_key = self._get_woocommerce_cache_key(api_url, params)
+        cache_entry = self.search([('instance_id', '=', instance.id), ('url', '=', cache_key)], limit=1)
+        headers = {}
+        if cache_entry:
+            if not cache_entry.etag and not cache_entry.last_modified and cache_entry._is_woocommerce_cache_fresh(
+                    instance):
+                cache_entry.hit_count += 1
+                return True, json.loads(cache_entry.response_body), cache_entry.next_page_link, True
+            if cache_entry.etag:
+                headers['If-None-Match'] = cache_entry.etag
+            if cache_entry.last_modified:
+                headers['If-Modified-Since'] = cache_entry.last_modified
+        _logger.info("Conditional Request API URL:::: %s" % cache_key)
+        response = instance._woocommerce_send_request("GET", api_url, params=params, headers=headers)
+        next_page_link = response.links and response.links.get('next', {}).get('url')
+        if response.status_code == 304 and cache_entry:
+            cache_entry.write({'fetched_at': fields.Datetime.now(), 'hit_count': cache_entry.hit_count + 1})
+            return True, json.loads(cache_entry.response_body), cache_entry.next_page_link, True
+        if response.status_code not in [200, 201]:
+            return False, response.text, next_page_link, False
+        response_body = response.text
+        unchanged = bool(cache_entry) and cache_entry.response_body == response_body
+        vals = {
+            'etag': response.headers.get('ETag') or False,
+            'last_modified': response.headers.get('Last-Modified') or False,
+            'response_body': response_body,
+            'next_page_link': next_page_link or False,
+            'fetched_at': fields.Datetime.now(),
+        }
+        if cache_entry:
+            cache_entry.write(vals)
+        else:
+            self._create_woocommerce_cache_entry(dict(vals, instance_id=instance.id, url=cache_key))
+        return True, response.json(), next_page_link, unchanged
+
+    @api.model
+    def _create_woocommerce_cache_entry(self, vals):
+        """
+        Another worker may store the same URL at the same time, the cache entry is then simply skipped.
+        """
+        try:
+            with self.env.cr.savepoint():
+                return self.create(vals)
+        except IntegrityError:
+            _logger.info("HTTP cache entry for %s already created by another transaction.", vals.get('url'))
+            return self.browse()
+
+    def action_clear_woocommerce_cache(self):
+        self.unlink()
+        return True
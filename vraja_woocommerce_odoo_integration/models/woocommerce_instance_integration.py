@@ -1,10 +1,11 @@
 import logging
-import requests
-import base64
 import json
 from datetime import datetime, timedelta
 from odoo import models, fields, api, _
+from odoo.exceptions import UserError
 from odoo.addons.base.models.res_partner import _tz_get
+from ..tools import api_client, batch_writer, circuit_breaker, compression, fan_out, pagination, rate_limiter, \
+    retry_policy
 
 _logger = logging.getLogger("WooCommerce")
 
@@ -64,6 +65,144 @@ class WooCommerceInstanceIntegrations(models.Model):
 
     webhook_ids = fields.One2many("woocommerce.webhook", "instance_id", "Webhooks")
 
+    woocommerce_pool_connections = fields.Integer(string="Connection Pools", copy=False,
+                                                  default=api_client.DEFAULT_POOL_CONNECTIONS,
+                                                  help="Number of host connection pools kept by the keep-alive "
+                                                       "HTTP session of each Odoo worker.")
+    woocommerce_pool_maxsize = fields.Integer(string="Connections Per Pool", copy=False,
+                                              default=api_client.DEFAULT_POOL_MAXSIZE,
+                                              help="Maximum number of keep-alive connections reused per host by "
+                                                   "each Odoo worker.")
+    woocommerce_rate_limit = fields.Float(string="Max Requests Per Second", copy=False,
+                                          default=rate_limiter.DEFAULT_RATE,
+                                          help="Upper limit of the adaptive rate limiter. The rate is lowered "
+                                               "automatically when the store answers 429/503 or responds slowly.")
+    woocommerce_rate_limit_burst = fields.Integer(string="Request Burst", copy=False,
+                                                  default=rate_limiter.DEFAULT_BURST,
+                                                  help="Number of requests which can be sent back to back before "
+                                                       "the rate limit applies.")
+    woocommerce_max_retries = fields.Integer(string="Max Retries", copy=False,
+                                             default=retry_policy.DEFAULT_MAX_RETRIES,
+                                             help="Number of times a request is replayed after a timeout, a "
+                                                  "connection error or a 500/502/504 response. Only idempotent "
+                                                  "requests are replayed after they reached the store.")
+    woocommerce_request_timeout = fields.Integer(string="Request Timeout (Seconds)", copy=False,
+                                                 default=retry_policy.DEFAULT_TIMEOUT,
+                                                 help="Maximum time to wait for a WooCommerce response.")
+    woocommerce_page_workers = fields.Integer(string="Concurrent Requests", copy=False,
+                                              default=pagination.DEFAULT_PAGE_WORKERS,
+                                              help="Number of requests sent in parallel for list pages, variations, "
+                                                   "image downloads and per-ID fetches. Bounded by the connections "
+                                                   "per pool.")
+    woocommerce_stream_responses = fields.Boolean(string="Stream Large Responses", copy=False, default=True,
+                                                  help="Decode order, product and customer pages while they are "
+                                                       "downloaded and create the queues record by record, instead "
+                                                       "of loading every page in memory first.")
+    woocommerce_compress_responses = fields.Boolean(string="Compressed Responses", copy=False, default=True,
+                                                    help="Ask WooCommerce for gzip (or brotli when available) "
+                                                         "encoded responses.")
+    woocommerce_compress_requests = fields.Boolean(string="Compressed Batch Requests", copy=False, default=False,
+                                                   help="Send products/variations batch bodies gzip encoded. When "
+                                                        "the store rejects them the plain JSON body is sent "
+                                                        "again automatically.")
+    woocommerce_compress_queue_payloads = fields.Boolean(
+        string="Compressed Queue Data", copy=False, default=True,
+        help="Store the order, product, customer and inventory data of the queue lines zlib compressed when it is "
+             "larger than a few kilobytes. Small payloads are always kept as plain JSON.")
+    woocommerce_requests_count = fields.Integer(string="Requests", compute="_compute_woocommerce_transfer_counters",
+                                                help="Requests sent by this Odoo worker since it was started.")
+    woocommerce_bytes_sent = fields.Integer(string="Bytes Sent", compute="_compute_woocommerce_transfer_counters")
+    woocommerce_bytes_sent_uncompressed = fields.Integer(string="Bytes Sent (Uncompressed)",
+                                                         compute="_compute_woocommerce_transfer_counters")
+    woocommerce_bytes_received = fields.Integer(string="Bytes Received",
+                                                compute="_compute_woocommerce_transfer_counters")
+    woocommerce_bytes_received_uncompressed = fields.Integer(string="Bytes Received (Uncompressed)",
+                                                             compute="_compute_woocommerce_transfer_counters")
+    woocommerce_reference_cache_ttl = fields.Integer(string="Reference Data Cache (Minutes)", copy=False, default=60,
+                                                     help="Payment gateways, shipping methods, categories, tags and "
+                                                          "taxes are revalidated with ETag/Last-Modified. When the "
+                                                          "store sends no validator the cached body is reused for "
+                                                          "this many minutes. 0 disables the cache.")
+    woocommerce_order_sync_overlap = fields.Integer(
+        string="Order Sync Overlap (Minutes)", copy=False, default=10,
+        help="The scheduled order imports ask for the orders modified since the last synced modification date minus "
+             "this overlap, so orders saved while the previous import was running are not missed.")
+    woocommerce_cancel_reconciliation = fields.Boolean(
+        string="Reconcile Cancelled Orders", copy=False, default=False,
+        help="The cancelled order cron only downloads the id, number and status of the cancelled orders and cancels "
+             "the matching Odoo orders directly, without creating order queues.")
+    woocommerce_cancel_reconciliation_days = fields.Integer(
+        string="Reconciliation Lookback (Days)", copy=False, default=1,
+        help="Orders whose status changed during these last days are reconciled.")
+    woocommerce_reconcile_refunded_orders = fields.Boolean(string="Cancel Refunded Orders", copy=False, default=True)
+    woocommerce_reconcile_failed_orders = fields.Boolean(string="Cancel Failed Orders", copy=False, default=True)
+    woocommerce_order_sync_cursor_ids = fields.One2many("woocommerce.order.sync.cursor", "instance_id",
+                                                        string="Order Sync Cursors")
+    woocommerce_order_queue_workers = fields.Integer(
+        string="Order Queue Workers", copy=False, default=1,
+        help="Number of scheduled actions processing the order queues of this instance concurrently. Each one "
+             "needs a free cron thread of the Odoo server.")
+    woocommerce_order_queue_chunk_size = fields.Integer(
+        string="Order Queue Chunk Size", copy=False, default=10,
+        help="Number of order queue lines a worker leases, processes and commits at once.")
+    woocommerce_order_queue_lease_timeout = fields.Integer(
+        string="Order Queue Lease (Minutes)", copy=False, default=15,
+        help="Queue lines leased by a worker which stopped unexpectedly are processed by another worker after "
+             "this delay. Must be longer than the processing of one chunk.")
+    woocommerce_staged_order_workflow = fields.Boolean(
+        string="Staged Sale Auto Workflow", copy=False, default=False,
+        help="Imported orders are only created as quotations. Their confirmation, delivery validation and "
+             "invoicing/payment are done afterwards by separate scheduled actions, stage by stage.")
+    woocommerce_workflow_confirm_batch_size = fields.Integer(string="Confirmation Batch Size", copy=False, default=50)
+    woocommerce_workflow_confirm_workers = fields.Integer(string="Confirmation Workers", copy=False, default=1)
+    woocommerce_workflow_deliver_batch_size = fields.Integer(string="Delivery Batch Size", copy=False, default=20)
+    woocommerce_workflow_deliver_workers = fields.Integer(string="Delivery Workers", copy=False, default=1)
+    woocommerce_workflow_invoice_batch_size = fields.Integer(string="Invoicing Batch Size", copy=False, default=20)
+    woocommerce_workflow_invoice_workers = fields.Integer(string="Invoicing Workers", copy=False, default=1)
+    woocommerce_bulk_delivery_validation = fields.Boolean(
+        string="Bulk Delivery Validation", copy=False, default=False,
+        help="Validate the delivery orders of the imported orders together: the pickings of a queue chunk (or of a "
+             "delivery batch with the staged workflow) are reserved, filled and validated at once. Pickings which "
+             "can not be validated with the others are validated and reported one by one.")
+    woocommerce_bulk_invoicing = fields.Boolean(
+        string="Bulk Invoicing", copy=False, default=False,
+        help="Invoice the imported orders together: the orders of a queue chunk (or of an invoicing batch with the "
+             "staged workflow) are invoiced by workflow and company at once, and their payments registered in one "
+             "batch.")
+    woocommerce_workflow_max_attempts = fields.Integer(
+        string="Workflow Attempts", copy=False, default=3,
+        help="A failing stage is tried again by the next runs of its scheduled action until this number of "
+             "attempts is reached, the order then waits for a manual retry.")
+    woocommerce_circuit_failure_threshold = fields.Integer(
+        string="Circuit Breaker Failures", copy=False, default=circuit_breaker.DEFAULT_FAILURE_THRESHOLD,
+        help="Consecutive failures (connection errors, timeouts, HTTP 5xx) after which requests to the store are "
+             "suspended.")
+    woocommerce_circuit_reset_timeout = fields.Integer(
+        string="Circuit Breaker Pause (Seconds)", copy=False, default=circuit_breaker.DEFAULT_RESET_TIMEOUT,
+        help="How long requests stay suspended before a single probe request is sent to the store again.")
+    woocommerce_circuit_state = fields.Selection(related="woocommerce_circuit_breaker_id.state",
+                                                 string="Circuit Breaker State")
+    woocommerce_circuit_opened_until = fields.Datetime(related="woocommerce_circuit_breaker_id.opened_until",
+                                                       string="Suspended Until")
+    woocommerce_circuit_last_error = fields.Char(related="woocommerce_circuit_breaker_id.last_error",
+                                                 string="Last Failure")
+    woocommerce_circuit_breaker_id = fields.Many2one("woocommerce.circuit.breaker",
+                                                     compute="_compute_woocommerce_circuit_breaker_id")
+
+    def _compute_woocommerce_circuit_breaker_id(self):
+        breakers = self.env['woocommerce.circuit.breaker'].search([('instance_id', 'in', self.ids)])
+        for instance in self:
+            instance.woocommerce_circuit_breaker_id = breakers.filtered(lambda b: b.instance_id == instance)[:1]
+
+    def _compute_woocommerce_transfer_counters(self):
+        for instance in self:
+            counters = compression.get_transfer_counters(instance._get_woocommerce_session_key())
+            instance.woocommerce_requests_count = counters['requests']
+            instance.woocommerce_bytes_sent = counters['bytes_sent']
+            instance.woocommerce_bytes_sent_uncompressed = counters['bytes_sent_uncompressed']
+            instance.woocommerce_bytes_received = counters['bytes_received']
+            instance.woocommerce_bytes_received_uncompressed = counters['bytes_received_uncompressed']
+
     # @api.model
     # def create(self, vals):
     #     record = super(WooCommerceInstanceIntegrations, self).create(vals)
@@ -85,16 +224,51 @@ class WooCommerceInstanceIntegrations(models.Model):
     #             'consumer_secret': inst.consumer_secret,
     #         }).create_customer_webhook()
 
+    def write(self, vals):
+        """
+        Recycle the pooled HTTP session of this worker when the connection settings are changed. Other workers
+        detect the change on their next request and rebuild their own session.
+        """
+        res = super(WooCommerceInstanceIntegrations, self).write(vals)
+        if set(vals) & {'woocommerce_url', 'woocommerce_key', 'woocommerce_secret', 'woocommerce_pool_connections',
+                        'woocommerce_pool_maxsize', 'active'}:
+            for instance in self:
+                api_client.close_session(instance._get_woocommerce_session_key())
+        if set(vals) & {'woocommerce_url', 'woocommerce_key', 'woocommerce_secret'}:
+            # A store which was unreachable with the old settings gets a fresh chance.
+            self.action_reset_woocommerce_circuit_breaker()
+        if 'woocommerce_order_queue_workers' in vals:
+            for instance in self:
+                instance.setup_woocommerce_process_order_queue_cron()
+        if set(vals) & {'woocommerce_staged_order_workflow', 'woocommerce_workflow_confirm_workers',
+                        'woocommerce_workflow_deliver_workers', 'woocommerce_workflow_invoice_workers'}:
+            for instance in self:
+                instance.setup_woocommerce_order_workflow_crons()
+        return res
+
+    def unlink(self):
+        for instance in self:
+            api_client.close_session(instance._get_woocommerce_session_key())
+        return super(WooCommerceInstanceIntegrations, self).unlink()
+
     def action_test_connection(self):
         instance = self
-        self.env['woocommerce.payment.gateway'].import_woocommerce_payment_gateway(self)
-        self.env['woocommerce.shipping.method'].import_shipping_method(self)
+        if self.is_woocommerce_circuit_open():
+            raise UserError(_("Requests to this store are suspended until %s after repeated failures (%s). Reset "
+                              "the circuit breaker from the API Connection tab to try again now.") % (
+                self.woocommerce_circuit_opened_until, self.woocommerce_circuit_last_error or ''))
+        # Reference data which did not change since the last test is not processed again.
+        reference_self = self.with_context(woocommerce_skip_unchanged_reference_data=True)
+        reference_self.env['woocommerce.payment.gateway'].import_woocommerce_payment_gateway(self)
+        reference_self.env['woocommerce.shipping.method'].import_shipping_method(self)
         self.env['woocommerce.customer.data.queue'].import_customers_from_woocommerce_to_odoo(self)
-        self.env['woocommerce.product.category'].import_product_category(self)
-        self.env['woocommerce.product.tags'].import_product_tags(self)
+        reference_self.env['woocommerce.product.category'].import_product_category(self)
+        reference_self.env['woocommerce.product.tags'].import_product_tags(self)
         self.setup_woocommerce_export_stock_cron()
         self.setup_woocommerce_import_cancelled_order_cron()
         self.setup_woocommerce_import_order_cron()
+        self.setup_woocommerce_process_order_queue_cron()
+        self.setup_woocommerce_order_workflow_crons()
         message = _("Connection Test Succeeded!")
         return {
             'effect': {
@@ -171,27 +345,267 @@ class WooCommerceInstanceIntegrations(models.Model):
         _logger.info("Created import order cron for instance: %s", self.name)
         return True
 
-    def woocommerce_api_calling_process(self, request_type=False, api_url=False, request_data=False, params=False):
-        data = "%s:%s" % (self.woocommerce_key,
-                          self.woocommerce_secret)
-        encode_data = base64.b64encode(data.encode("utf-8"))
-        authorization_data = "Basic %s" % (encode_data.decode("utf-8"))
-        headers = {
-            'Authorization': authorization_data,
-            "Content-Type": "application/json"
-        }
+    def setup_woocommerce_process_order_queue_cron(self):
+        """Create one order queue worker cron per configured worker, the crons of removed workers are archived."""
+        workers = max(self.woocommerce_order_queue_workers, 1)
+        existing_crons = {cron.code: cron for cron in self.env['ir.cron'].search(
+            [('code', 'like', 'model.cron_process_woocommerce_order_queue({0},'.format(self.id)),
+             ('active', 'in', [True, False]), ('woocommerce_instance', '=', self.id)])}
+        for worker in range(1, workers + 1):
+            code_method = f"model.cron_process_woocommerce_order_queue({self.id}, {worker})"
+            cron = existing_crons.pop(code_method, False)
+            if cron:
+                if not cron.active:
+                    cron.active = True
+                continue
+            cron_name = f"Woocommerce: [{self.name}] Process Order Queue (Worker {worker})"
+            self.create_cron_for_automation_task(cron_name=cron_name, model_name='woocommerce.order.data.queue',
+                                                 code_method=code_method, interval_type='minutes',
+                                                 interval_number=5, numbercall=-1, nextcall_timegap_minutes=worker)
+            _logger.info("Created order queue worker %s cron for instance: %s", worker, self.name)
+        for cron in existing_crons.values():
+            cron.active = False
+        return True
+
+    def setup_woocommerce_order_workflow_crons(self):
+        """
+        Create the workers of each sale auto workflow stage when the staged workflow is enabled, the crons of removed
+        workers (all of them when it is disabled) are archived.
+        """
+        existing_crons = {cron.code: cron for cron in self.env['ir.cron'].search(
+            [('code', 'like', 'model.cron_process_woocommerce_order_workflow_stage({0},'.format(self.id)),
+             ('active', 'in', [True, False]), ('woocommerce_instance', '=', self.id)])}
+        if self.woocommerce_staged_order_workflow:
+            for stage, stage_name in [('confirm', 'Confirm Orders'), ('deliver', 'Validate Deliveries'),
+                                      ('invoice', 'Invoice Orders')]:
+                workers = max(self['woocommerce_workflow_%s_workers' % stage], 1)
+                for worker in range(1, workers + 1):
+                    code_method = f"model.cron_process_woocommerce_order_workflow_stage({self.id}, '{stage}', {worker})"
+                    cron = existing_crons.pop(code_method, False)
+                    if cron:
+                        if not cron.active:
+                            cron.active = True
+                        continue
+                    cron_name = f"Woocommerce: [{self.name}] {stage_name} (Worker {worker})"
+                    self.create_cron_for_automation_task(cron_name=cron_name, model_name='sale.order',
+                                                         code_method=code_method, interval_type='minutes',
+                                                         interval_number=5, numbercall=-1,
+                                                         nextcall_timegap_minutes=worker)
+                    _logger.info("Created %s worker %s cron for instance: %s", stage, worker, self.name)
+        for cron in existing_crons.values():
+            cron.active = False
+        return True
+
+    def _get_woocommerce_session_key(self):
+        return self.env.cr.dbname, self.id
+
+    def get_woocommerce_api_client(self):
+        """
+        Build the ORM free API client of this instance. The client only keeps plain values, so it can be passed to
+        worker threads while the underlying keep-alive session is shared by the whole Odoo worker.
+        """
+        self.ensure_one()
+        self.env['woocommerce.circuit.breaker'].sync_woocommerce_circuit_breaker(self)
+        return api_client.WooCommerceApiClient(self._get_woocommerce_session_key(), self.woocommerce_url,
+                                               self.woocommerce_key, self.woocommerce_secret,
+                                               pool_connections=self.woocommerce_pool_connections,
+                                               pool_maxsize=self.woocommerce_pool_maxsize,
+                                               rate_limit=self.woocommerce_rate_limit,
+                                               rate_limit_burst=self.woocommerce_rate_limit_burst,
+                                               max_retries=self.woocommerce_max_retries,
+                                               timeout=self.woocommerce_request_timeout,
+                                               compress_responses=self.woocommerce_compress_responses,
+                                               compress_requests=self.woocommerce_compress_requests,
+                                               failure_threshold=self.woocommerce_circuit_failure_threshold,
+                                               reset_timeout=self.woocommerce_circuit_reset_timeout)
+
+    def _woocommerce_send_request(self, request_type, api_url, request_data=False, params=False, headers=False):
+        """
+        Send one request through the pooled client of the instance and return the raw response.
+        """
+        if request_type not in ('GET', 'HEAD'):
+            self._woocommerce_invalidate_response_cache(api_url)
+        try:
+            return self.get_woocommerce_api_client().send(request_type, api_url, data=request_data or None,
+                                                          params=params or None, headers=headers or None)
+        finally:
+            self._woocommerce_after_api_requests()
+
+    def _woocommerce_response_cache_key(self, request_type, api_url, params):
+        return self.id, request_type, api_client.request_cache_key(api_url, params)
+
+    def _woocommerce_invalidate_response_cache(self, api_url):
+        """
+        A write to a resource drops the memoized responses of that resource and of everything below it.
+        """
+        response_cache = self.env.context.get('woocommerce_response_cache')
+        if not response_cache:
+            return
+        written_path = api_client.resource_path(api_url)
+        for cache_key in [key for key in response_cache if key[0] == self.id]:
+            cached_path = api_client.resource_path(cache_key[2].split('?', 1)[0])
+            if cached_path.startswith(written_path) or written_path.startswith(cached_path):
+                response_cache.pop(cache_key, None)
+
+    def _woocommerce_after_api_requests(self):
+        """
+        Share the circuit breaker state changed by the last requests and store the API metrics.
+        """
+        for instance in self:
+            self.env['woocommerce.circuit.breaker'].sync_woocommerce_circuit_breaker(instance)
+        self._woocommerce_flush_api_metrics()
+
+    def _woocommerce_flush_api_metrics(self, force=False):
+        """
+        The requests are measured in memory by the API client, they are stored at most once per minute.
+        """
+        return self.env['woocommerce.api.metrics'].flush_woocommerce_api_metrics(force=force)
+
+    def is_woocommerce_circuit_open(self):
+        """
+        This method is used to check, before any work is started, whether requests to the store are suspended.
+        """
+        self.ensure_one()
+        return self.env['woocommerce.circuit.breaker'].sync_woocommerce_circuit_breaker(self).is_open()
+
+    def action_reset_woocommerce_circuit_breaker(self):
+        breaker_object = self.env['woocommerce.circuit.breaker']
+        breakers = breaker_object.search([('instance_id', 'in', self.ids)])
+        breakers.action_reset_woocommerce_circuit_breaker()
+        for instance in self - breakers.instance_id:
+            breaker = breaker_object._get_woocommerce_breaker(instance)
+            breaker.pop_change()
+            breaker.load(circuit_breaker.CLOSED, 0, 0.0)
+        return True
+
+    def action_open_woocommerce_api_metrics(self):
+        self._woocommerce_flush_api_metrics(force=True)
+        action = self.env['ir.actions.act_window']._for_xml_id(
+            'vraja_woocommerce_odoo_integration.action_woocommerce_api_metrics')
+        action['domain'] = [('instance_id', 'in', self.ids)]
+        return action
+
+    def woocommerce_api_cached_get(self, api_url, params=False):
+        """
+        GET reference data (gateways, shipping methods, categories, tags, taxes) through the persistent HTTP cache.
+        :return: (status, data, next_page_link, unchanged) where unchanged is True when the cached body was reused.
+        """
+        return self.env['woocommerce.http.cache'].woocommerce_cached_get(self, api_url, params)
+
+    def woocommerce_api_calling_process(self, request_type=False, api_url=False, request_data=False, params=False,
+                                        field_set=False):
+        """
+        :param field_set: name of a projection declared in ``api_client.FIELD_SETS`` (or a list of field names) to
+                          only receive these keys from WooCommerce.
+        """
+        if field_set:
+            params = api_client.apply_field_projection(params, field_set)
+        response_cache = self.env.context.get('woocommerce_response_cache')
+        cache_key = request_type == 'GET' and response_cache is not None and self._woocommerce_response_cache_key(
+            request_type, api_url, params)
+        if cache_key and cache_key in response_cache:
+            _logger.info("Memoized Request API URL:::: %s" % api_url)
+            return response_cache[cache_key]
         _logger.info("Shipment Request API URL:::: %s" % api_url)
-        _logger.info("Shipment Request Data:::: %s" % request_data)
-        response_data = requests.request(method=request_type, url=api_url, headers=headers, data=request_data,
-                                         params=params, verify=False)
+        _logger.debug("Shipment Request Data:::: %s", request_data)
+        response_data = self._woocommerce_send_request(request_type, api_url, request_data, params)
         next_page_link = response_data.links and response_data.links.get('next', {}).get('url')
         if response_data.status_code in [200, 201]:
             response_data = response_data.json()
-            _logger.info(">>> Response Data {}".format(response_data))
+            _logger.debug(">>> Response Data %s", response_data)
+            if cache_key:
+                response_cache[cache_key] = (True, response_data, next_page_link)
             return True, response_data, next_page_link
         else:
             return False, response_data.text, next_page_link
 
+    def woocommerce_fetch_all_pages(self, api_url, params=False, field_set=False, stream=False):
+        """
+        Fetch every page of a WooCommerce list endpoint. The first page gives the total number of pages, the other
+        pages are requested concurrently through the instance rate limiter.
+        :param stream: return a generator decoding the records while the pages are downloaded instead of a list.
+        :return: (True, records) or (False, error message)
+        Complete lists are memoized when the context holds a ``woocommerce_response_cache`` dict.
+        """
+        if field_set:
+            params = api_client.apply_field_projection(params, field_set)
+        response_cache = self.env.context.get('woocommerce_response_cache')
+        cache_key = not stream and response_cache is not None and self._woocommerce_response_cache_key(
+            'GET_ALL', api_url, params)
+        if cache_key and cache_key in response_cache:
+            _logger.info("Memoized Paginated Request API URL:::: %s" % api_url)
+            return True, response_cache[cache_key]
+        _logger.info("Paginated Request API URL:::: %s" % api_url)
+        client = self.get_woocommerce_api_client()
+        try:
+            if stream:
+                records = self._woocommerce_guard_record_stream(
+                    pagination.open_record_stream(client, api_url, params=params,
+                                                  max_workers=self.woocommerce_page_workers), api_url)
+            else:
+                records = pagination.fetch_all_pages(client, api_url, params=params,
+                                                     max_workers=self.woocommerce_page_workers)
+        except pagination.WooCommercePaginationError as error:
+            return False, error.response_text
+        finally:
+            self._woocommerce_after_api_requests()
+        if cache_key:
+            response_cache[cache_key] = records
+        return True, records
+
+    def woocommerce_api_fan_out(self, request_specs, max_workers=False):
+        """
+        Run independent requests concurrently through the instance client.
+        :param request_specs: list of ``fan_out.RequestSpec`` or (method, url, params, data, media) tuples.
+        :return: list of (status, data, next_page_link) in the order of the specs.
+        """
+        if not request_specs:
+            return []
+        _logger.info("Fan-out of %s WooCommerce requests", len(request_specs))
+        try:
+            return fan_out.fan_out(self.get_woocommerce_api_client(), request_specs,
+                                   max_workers=max_workers or self.woocommerce_page_workers)
+        finally:
+            self._woocommerce_after_api_requests()
+
+    def get_woocommerce_batch_writer(self):
+        return batch_writer.WooCommerceBatchWriter(batch_writer.BATCH_LIMIT)
+
+    def woocommerce_batch_write(self, writer, concurrent=True):
+        """
+        Send the operations collected by a ``batch_writer.WooCommerceBatchWriter`` in chunks of at most 100 objects.
+        :param concurrent: send the chunks in parallel (keep False when a chunk depends on the previous one).
+        :return: list of ``batch_writer.BatchItemResult``, one per operation.
+        """
+        requests = writer.build_requests()
+        if not requests:
+            return []
+        for url in {request.url for request in requests}:
+            self._woocommerce_invalidate_response_cache(url)
+        _logger.info("Batch write of %s operations in %s requests", len(writer), len(requests))
+        responses = self.woocommerce_api_fan_out(
+            [fan_out.RequestSpec('POST', request.url, data=json.dumps(request.body)) for request in requests],
+            max_workers=False if concurrent else 1)
+        writer.clear()
+        return writer.map_results(requests, responses)
+
+    @api.model
+    def _woocommerce_guard_record_stream(self, records, api_url):
+        """
+        A streamed fetch can fail after some records were already handed to the queue builder. Stop the stream
+        there and keep the queues created so far instead of losing the whole import; the returned stream is flagged
+        ``truncated`` so the caller does not move its sync date over the records never received.
+        """
+        def _on_finish(stream):
+            if stream.truncated:
+                _logger.error("WooCommerce stream %s interrupted after %s records: %s", api_url, stream.count,
+                              stream.error)
+            else:
+                _logger.info("WooCommerce stream %s finished with %s records.", api_url, stream.count)
+            self._woocommerce_after_api_requests()
+
+        return pagination.GuardedRecordStream(records, on_finish=_on_finish)
+
     def get_stock_updates(self):
         """
         This method is used to fetch odoo product in which last stock updated in last 3 hours.
@@ -211,6 +625,9 @@ class WooCommerceInstanceIntegrations(models.Model):
         in inventory_data_to_process.
         """
         instance_id = self.env['woocommerce.instance.integration'].browse(instance)
+        if instance_id.is_woocommerce_circuit_open():
+            _logger.warning("Skipping stock export, WooCommerce store of %s is unavailable.", instance_id.name)
+            return False
         _logger.info("Starting WooCommerce stock export for instance: %s", instance_id.name)
 
         # Create log
@@ -293,23 +710,13 @@ class WooCommerceInstanceIntegrations(models.Model):
 
         # Prepare list of values to create all queue lines in one call
         create_vals = []
+        inventory_queue_line_object = self.env['woocommerce.inventory.data.queue.line']
         for line in queue_line_data:
-            create_vals.append({
-                'product_id': line['product_id'],
-                'inventory_data_to_process': json.dumps({
-                    "woocommerce_product_id": line['woocommerce_product_id'],
-                    "stock_quantity": line['stock_quantity'],
-                    "available": line['available'],
-                    "product_type": line['product_type'],
-                    "parent_product_id": line['parent_product_id']
-                }),
-                'state': 'draft',
-                'instance_id': instance_id.id,
-                'woocommerce_inventory_queue_id': queue_id.id,
-            })
+            create_vals.append(inventory_queue_line_object.prepare_woocommerce_inventory_queue_line_vals(
+                line, instance_id, queue_id))
 
         if create_vals:
-            self.env['woocommerce.inventory.data.queue.line'].create(create_vals)
+            inventory_queue_line_object.create(create_vals)
 
         # Remove empty log if no lines were created
         if not log_id.woocommerce_operation_line_ids:
@@ -1,17 +1,19 @@
 import logging
 import requests
-import json
-from odoo.tools.safe_eval import safe_eval
-from odoo import models, fields, tools, api
+from odoo import models, fields, api
+from ..tools import batch_writer
 
 _logger = logging.getLogger("WooCommerce Inventory Queue")
 
 
 class InventoryDataQueue(models.Model):
     _name = "woocommerce.inventory.data.queue"
-    _inherit = ["mail.thread", "mail.activity.mixin"]
+    _inherit = ["mail.thread", "mail.activity.mixin", "woocommerce.queue.ingestion.mixin"]
     _description = "WooCommerce Inventory Data Queue"
     _order = 'id DESC'
+    _woocommerce_queue_sequence = 'vraja_woocommerce_odoo_integration.seq_inventory_queue'
+    _woocommerce_queue_line_model = 'woocommerce.inventory.data.queue.line'
+    _woocommerce_queue_line_field = 'woocommerce_inventory_queue_id'
 
     @api.depends('woocommerce_inventory_queue_line_ids.state')
     def _compute_queue_line_state_and_count(self):
@@ -46,13 +48,10 @@ class InventoryDataQueue(models.Model):
     @api.model_create_multi
     def create(self, vals_list):
         """
-        Add sequence number when creating a new queue record.
+        Add sequence number when creating new queue records, the numbers of all the records are reserved at once.
         """
-        sequence = self.env.ref("vraja_woocommerce_odoo_integration.seq_inventory_queue")
-        for vals in vals_list:
-            name = sequence and sequence.next_by_id() or '/'
-            if isinstance(vals, dict):
-                vals.update({'name': name})
+        for vals, name in zip(vals_list, self._next_woocommerce_queue_names(len(vals_list))):
+            vals.update({'name': name})
         return super(InventoryDataQueue, self).create(vals_list)
 
     def unlink(self):
@@ -73,18 +72,22 @@ class InventoryDataQueue(models.Model):
     def create_woocommerce_inventory_queue_job(self, instance_id, woocommerce_inventory_list, log_id):
         """
         Create queue and queue lines for WooCommerce stock export based on batch size.
+        Every inventory dict holds the product_id and the stock data of one product, a product listed twice
+        keeps its last quantity.
         """
-        queue_id_list = []
-        batch_size = 50
-        for woocommerce_inventories in tools.split_every(batch_size, woocommerce_inventory_list):
-            queue_id = self.generate_woocommerce_inventory_queue(instance_id)
-            for inventory in woocommerce_inventories:
-                self.env['woocommerce.inventory.data.queue.line'].create_woocommerce_inventory_queue_line(
-                    inventory, instance_id, queue_id, log_id
-                )
-            queue_id_list.append(queue_id.id)
-            if not queue_id.woocommerce_inventory_queue_line_ids:
-                queue_id.unlink()
+        inventories = {}
+        for inventory in woocommerce_inventory_list:
+            inventories.pop(inventory['product_id'], None)
+            inventories[inventory['product_id']] = inventory
+        queue_line_object = self.env['woocommerce.inventory.data.queue.line']
+        queue_id_list = self.create_woocommerce_queue_batches(
+            instance_id, list(inventories.values()),
+            lambda inventory: queue_line_object.prepare_woocommerce_inventory_queue_line_vals(inventory, instance_id))
+        if queue_id_list and log_id:
+            msg = f"{len(inventories)} inventory queue lines created in {len(queue_id_list)} queues"
+            self.env['woocommerce.log.line'].generate_woocommerce_process_line(
+                'inventory', 'export', instance_id, msg, False, msg, log_id, False
+            )
         return queue_id_list
 
     def process_queue_to_export_stock(self):
@@ -93,8 +96,6 @@ class InventoryDataQueue(models.Model):
         """
         self.export_inventory_from_odoo_to_woocommerce()
 
-    from odoo.tools.safe_eval import safe_eval
-    import json
     import logging
 
     _logger = logging.getLogger("WooCommerce Inventory Export")
@@ -113,6 +114,11 @@ class InventoryDataQueue(models.Model):
             return True
 
         for rec in process_records:
+            if rec.instance_id.is_woocommerce_circuit_open():
+                # The store is down: leave the queue untouched instead of failing its lines.
+                _logger.warning("WooCommerce store of %s is unavailable, stock queue %s skipped.",
+                                rec.instance_id.name, rec.name)
+                continue
             log_id = rec.woocommerce_log_id or self.env['woocommerce.log'].generate_woocommerce_logs(
                 'inventory', 'export', rec.instance_id, 'Process Started'
             )
@@ -128,16 +134,14 @@ class InventoryDataQueue(models.Model):
             if not queue_lines:
                 continue
 
-            # Separate data for simple & variant products
-            product_updates_simple = []
-            variant_updates_map = {}  # {parent_product_id: [updates]}
-            line_map = {}
+            # Simple products go to products/batch, variants to the batch endpoint of their parent product.
+            # The writer sends at most 100 objects per request and maps every answer back to its queue line.
+            instance = rec.instance_id
+            writer = instance.get_woocommerce_batch_writer()
 
             for line in queue_lines:
                 try:
-                    inventory_data = line.inventory_data_to_process
-                    if isinstance(inventory_data, str):
-                        inventory_data = json.loads(inventory_data)  # better: use safe_eval
+                    inventory_data = line.get_woocommerce_payload()
 
                     woocommerce_id = inventory_data.get('woocommerce_product_id')
                     available_qty = int(inventory_data.get('available', 0))
@@ -162,11 +166,10 @@ class InventoryDataQueue(models.Model):
 
                     # 🟢 Separate simple vs variant
                     if product_type == 'variant' and parent_product_id:
-                        variant_updates_map.setdefault(parent_product_id, []).append(update_data)
+                        resource = f"products/{parent_product_id}/variations"
                     else:
-                        product_updates_simple.append(update_data)
-
-                    line_map[woocommerce_id] = line
+                        resource = "products"
+                    writer.update(batch_writer.batch_url(instance.woocommerce_url, resource), update_data, ref=line)
 
                 except Exception as error:
                     line.state = 'failed'
@@ -177,77 +180,32 @@ class InventoryDataQueue(models.Model):
                     )
                     _logger.error(msg)
 
-            # === 🟢 Update SIMPLE products ===
-            if product_updates_simple:
-                try:
-                    api_url = f"{rec.instance_id.woocommerce_url}/wp-json/wc/v3/products/batch"
-                    request_data = {"update": product_updates_simple}
-                    success, response, next_page_link = rec.instance_id.woocommerce_api_calling_process(
-                        request_type='POST', api_url=api_url, request_data=json.dumps(request_data)
-                    )
-
-                    if success:
-                        for prod in product_updates_simple:
-                            line = line_map.get(prod.get('id'))
-                            if line:
-                                line.state = 'completed'
-                        msg = f"✅ Updated {len(product_updates_simple)} simple products successfully."
-                        rec.state = 'completed'
-                        _logger.info(msg)
-                        self.env['woocommerce.log.line'].generate_woocommerce_process_line(
-                            'inventory', 'export', rec.instance_id, msg, product_updates_simple,
-                            json.dumps(response), log_id, False
-                        )
-                    else:
-                        for prod in product_updates_simple:
-                            line = line_map.get(prod.get('id'))
-                            if line:
-                                line.state = 'failed'
-                        msg = f"❌ Failed to update simple products: {response}"
-                        rec.state = 'failed'
-                        _logger.error(msg)
-                        self.env['woocommerce.log.line'].generate_woocommerce_process_line(
-                            'inventory', 'export', rec.instance_id, msg, product_updates_simple,
-                            json.dumps(response), log_id, True
-                        )
-                except Exception as e:
-                    _logger.error(f"Error updating simple products: {str(e)}")
-
-            # === 🟣 Update VARIANT products ===
-            for parent_id, variant_updates in variant_updates_map.items():
-                try:
-                    api_url = f"{rec.instance_id.woocommerce_url}/wp-json/wc/v3/products/{parent_id}/variations/batch"
-                    request_data = json.dumps({"update": variant_updates})
-                    success, response, _ = rec.instance_id.woocommerce_api_calling_process(
-                        request_type='POST', api_url=api_url, request_data=request_data
-                    )
-
-                    if success:
-                        for prod in variant_updates:
-                            line = line_map.get(prod.get('id'))
-                            if line:
-                                line.state = 'completed'
-                        msg = f"✅ Updated {len(variant_updates)} variants (Parent ID: {parent_id}) successfully."
-                        rec.state = 'completed'
-                        _logger.info(msg)
-                        self.env['woocommerce.log.line'].generate_woocommerce_process_line(
-                            'inventory', 'export', rec.instance_id, msg, variant_updates,
-                            json.dumps(response), log_id, False
-                        )
-                    else:
-                        for prod in variant_updates:
-                            line = line_map.get(prod.get('id'))
-                            if line:
-                                line.state = 'failed'
-                        msg = f"❌ Failed to update variants for product {parent_id}. Response: {response}"
-                        rec.state = 'failed'
-                        _logger.error(msg)
-                        self.env['woocommerce.log.line'].generate_woocommerce_process_line(
-                            'inventory', 'export', rec.instance_id, msg, variant_updates,
-                            json.dumps(response), log_id, True
-                        )
-                except Exception as e:
-                    _logger.error(f"Error updating variants for parent {parent_id}: {str(e)}")
+            try:
+                results = instance.woocommerce_batch_write(writer)
+            except Exception as error:
+                _logger.error(f"Error exporting stock of queue {rec.name}: {str(error)}")
+                results = []
+
+            exported_data = []
+            for result in results:
+                line = result.ref
+                if result.success:
+                    line.state = 'completed'
+                    exported_data.append(result.payload)
+                    continue
+                line.state = 'failed'
+                msg = f"❌ Failed to update stock of {line.product_id.display_name} " \
+                      f"(WooCommerce ID: {result.payload.get('id')}): {result.error}"
+                _logger.error(msg)
+                self.env['woocommerce.log.line'].generate_woocommerce_process_line(
+                    'inventory', 'export', instance, msg, result.payload, result.data or result.error, log_id, True
+                )
+            if exported_data:
+                msg = f"✅ Updated stock of {len(exported_data)} products/variants successfully."
+                _logger.info(msg)
+                self.env['woocommerce.log.line'].generate_woocommerce_process_line(
+                    'inventory', 'export', instance, msg, exported_data, False, log_id, False
+                )
 
             rec.woocommerce_log_id = log_id
             log_id.woocommerce_operation_message = 'Process Finished'
@@ -260,7 +218,8 @@ class InventoryDataQueue(models.Model):
 
 class WoocommerceInventoryDataQueueLine(models.Model):
     _name = "woocommerce.inventory.data.queue.line"
-    _inherit = ["mail.thread", "mail.activity.mixin"]
+    _inherit = ["mail.thread", "mail.activity.mixin", "woocommerce.queue.payload.mixin"]
+    _woocommerce_payload_field = 'inventory_data_to_process'
 
     product_id = fields.Many2one('product.product')
     woocommerce_inventory_queue_id = fields.Many2one(
@@ -278,6 +237,22 @@ class WoocommerceInventoryDataQueueLine(models.Model):
         copy=False
     )
 
+    @api.model
+    def prepare_woocommerce_inventory_queue_line_vals(self, inventory, instance_id, queue_id=False):
+        """
+        Prepare the values of a queue line, every key of the inventory dict but product_id is stored as its data.
+        """
+        data_dict = {key: value for key, value in inventory.items() if key != 'product_id'}
+        data_dict['stock_quantity'] = int(data_dict.get('stock_quantity') or 0)
+        vals = {
+            'product_id': inventory['product_id'],
+            'state': 'draft',
+            'instance_id': instance_id.id,
+            'woocommerce_inventory_queue_id': queue_id and queue_id.id or False,
+        }
+        vals.update(self.prepare_woocommerce_payload_vals(data_dict, instance_id))
+        return vals
+
     def create_woocommerce_inventory_queue_line(self, product_id, woocommerce_product_id, stock_quantity, instance_id, queue_id, log_id):
         """
         Create or update queue line with product data stored as dict in inventory_data_to_process.
@@ -294,20 +269,15 @@ class WoocommerceInventoryDataQueueLine(models.Model):
         ], limit=1)
 
         if existing_line:
-            existing_line.inventory_data_to_process = json.dumps(data_dict)
+            existing_line.set_woocommerce_payload(data_dict)
             msg = f"Updated inventory queue line for product {existing_line.product_id.display_name}"
             self.env['woocommerce.log.line'].generate_woocommerce_process_line(
                 'inventory', 'export', instance_id, msg, data_dict, msg, log_id, False
             )
             return existing_line
 
-        line = self.create({
-            'product_id': product_id,
-            'inventory_data_to_process': json.dumps(data_dict),
-            'state': 'draft',
-            'instance_id': instance_id.id,
-            'woocommerce_inventory_queue_id': queue_id.id,
-        })
+        line = self.create(self.prepare_woocommerce_inventory_queue_line_vals(
+            dict(data_dict, product_id=product_id), instance_id, queue_id))
         msg = f"New inventory queue line created for product {line.product_id.display_name}"
         self.env['woocommerce.log.line'].generate_woocommerce_process_line(
             'inventory', 'export', instance_id, msg, data_dict, msg, log_id, False
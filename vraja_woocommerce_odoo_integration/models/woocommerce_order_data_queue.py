@@ -2,19 +2,24 @@
 # See LICENSE file for full copyright and licensing details.
 from odoo import models, fields, api, tools, _
 from datetime import datetime, timedelta
-from odoo.tools.safe_eval import safe_eval
+from ..tools import circuit_breaker, pagination
+from .woocommerce_order_resolver import WooCommerceOrderResolver
 import logging
-import pprint
+import os
 import pytz
+from psycopg2 import OperationalError
 
 _logger = logging.getLogger("WooCommerce Order Queue")
 
 
 class WooCommerceOrderDataQueue(models.Model):
     _name = "woocommerce.order.data.queue"
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'woocommerce.queue.ingestion.mixin']
     _description = "WooCommerce Order Data Queue"
     _order = 'id DESC'
+    _woocommerce_queue_sequence = 'vraja_woocommerce_odoo_integration.seq_woocommerce_order_queue'
+    _woocommerce_queue_line_model = 'woocommerce.order.data.queue.line'
+    _woocommerce_queue_line_field = 'woocommerce_order_queue_id'
 
     @api.depends('woocommerce_order_queue_line_ids.state')
     def _compute_queue_line_state_and_count(self):
@@ -40,13 +45,14 @@ class WooCommerceOrderDataQueue(models.Model):
                                                        "woocommerce_order_queue_id", string="Order Queue")
     woocommerce_log_id = fields.Many2one('woocommerce.log', string="Logs")
 
-    @api.model
-    def create(self, vals):
-        sequence = self.env.ref("vraja_woocommerce_odoo_integration.seq_woocommerce_order_queue")
-        name = sequence and sequence.next_by_id() or '/'
-        if type(vals) == dict:
+    @api.model_create_multi
+    def create(self, vals_list):
+        """
+        This method is used to add sequence number in new record, the numbers of all the records are reserved at once.
+        """
+        for vals, name in zip(vals_list, self._next_woocommerce_queue_names(len(vals_list))):
             vals.update({'name': name})
-        return super(WooCommerceOrderDataQueue, self).create(vals)
+        return super(WooCommerceOrderDataQueue, self).create(vals_list)
 
     def unlink(self):
         """
@@ -58,17 +64,14 @@ class WooCommerceOrderDataQueue(models.Model):
         return super(WooCommerceOrderDataQueue, self).unlink()
 
     def create_woocommerce_order_queue_job(self, instance, woocommerce_order_list):
-        res_id_list = []
-        batch_size = 50
-        for woocommerce_orders in tools.split_every(batch_size, woocommerce_order_list):
-            queue_id = self.create({'instance_id': instance.id})
-            for woocommerce_order in woocommerce_orders:
-                woocommerce_order_dict = woocommerce_order
-                self.env['woocommerce.order.data.queue.line'].create_woocommerce_order_queue_line(
-                    woocommerce_order_dict, 'draft',
-                    instance, queue_id)
-            res_id_list.append(queue_id.id)
-        return res_id_list
+        """
+        This method is used to create the order queues, 50 orders per queue, each with one create of its lines.
+        """
+        queue_line_object = self.env['woocommerce.order.data.queue.line']
+        return self.create_woocommerce_queue_batches(
+            instance, woocommerce_order_list,
+            lambda woocommerce_order: queue_line_object.prepare_woocommerce_order_queue_line_vals(
+                woocommerce_order, 'draft', instance))
 
     def fetch_orders_from_woocommerce_to_odoo(self, instance, from_date, to_date, woocommerce_order_ids):
         """This method used to fetch a woocommerce orders"""
@@ -86,55 +89,206 @@ class WooCommerceOrderDataQueue(models.Model):
                     'status': 'cancelled' if cancelled else 'completed'
                 })
             url = "{0}/wp-json/wc/v3/orders".format(instance.woocommerce_url)
-            response_status, response_data, next_page_link = instance.woocommerce_api_calling_process("GET", url, params=params)
+            # Cancellation only needs the order number, so skip line items, addresses and meta data.
+            response_status, response_data = instance.woocommerce_fetch_all_pages(
+                url, params=params, field_set='order_status' if cancelled else False,
+                stream=instance.woocommerce_stream_responses)
             if not response_status:
                 _logger.info("Getting Some error while fetch order from Woocommerce : {0}".format(response_data))
                 return False
             woocommerce_order_list = response_data
-            while next_page_link:
-                response_status, response_data, next_page_link = instance.woocommerce_api_calling_process("GET",next_page_link,
-                                                                                                          params=params)
-                woocommerce_order_list += response_data
-            _logger.info(woocommerce_order_list)
         except Exception as error:
             _logger.info("Getting Some Error In Fetch The orders :: {0}".format(error))
         return woocommerce_order_list
 
+    def fetch_modified_orders_from_woocommerce(self, instance, order_status, modified_after):
+        """
+        This method is used to fetch the orders of a status modified after the given GMT date, oldest change first.
+        @return : list (or stream) of orders, False when the request failed
+        """
+        params = {
+            'modified_after': modified_after.strftime('%Y-%m-%dT%H:%M:%S'),
+            'dates_are_gmt': 'true',
+            'status': order_status,
+            'orderby': 'modified',
+            'order': 'asc',
+            'per_page': 100,
+        }
+        url = "{0}/wp-json/wc/v3/orders".format(instance.woocommerce_url)
+        try:
+            response_status, response_data = instance.woocommerce_fetch_all_pages(
+                url, params=params, field_set='order_status' if order_status == 'cancelled' else False,
+                stream=instance.woocommerce_stream_responses)
+        except Exception as error:
+            _logger.info("Getting Some Error In Fetch The orders :: {0}".format(error))
+            return False
+        if not response_status:
+            _logger.info("Getting Some error while fetch order from Woocommerce : {0}".format(response_data))
+            return False
+        return response_data
+
+    def skip_unchanged_woocommerce_orders(self, instance, woocommerce_orders, sync_state):
+        """
+        This method is used to drop the orders whose version was already processed in Odoo, or which are still
+        waiting in a queue line of the instance, before they are queued.
+        ``sync_state`` collects the number of fetched/skipped orders and the highest modification date seen.
+        """
+        sale_order_object = self.env['sale.order']
+        queue_line_object = self.env['woocommerce.order.data.queue.line']
+        for woocommerce_orders_chunk in tools.split_every(100, woocommerce_orders):
+            order_numbers = [str(order.get('number') or '') for order in woocommerce_orders_chunk]
+            processed_dates = {sale_order.woocommerce_order_number: sale_order.woocommerce_order_date_modified
+                               for sale_order in sale_order_object.search(
+                                   [('instance_id', '=', instance.id), ('woocommerce_order_number', 'in', order_numbers)])}
+            pending_order_ids = {queue_line['order_data_id'] for queue_line in queue_line_object.search_read(
+                [('instance_id', '=', instance.id), ('state', 'in', ['draft', 'partially_completed']),
+                 ('order_data_id', 'in', [str(order.get('id')) for order in woocommerce_orders_chunk])],
+                ['order_data_id'])}
+            for woocommerce_order in woocommerce_orders_chunk:
+                sync_state['fetched'] += 1
+                date_modified = sale_order_object.convert_woocommerce_gmt_date(woocommerce_order.get('date_modified_gmt'))
+                if date_modified and (not sync_state['last_modified_date'] or
+                                      date_modified > sync_state['last_modified_date']):
+                    sync_state['last_modified_date'] = date_modified
+                processed_date = processed_dates.get(str(woocommerce_order.get('number') or ''))
+                if (processed_date and date_modified and processed_date >= date_modified) or \
+                        str(woocommerce_order.get('id')) in pending_order_ids:
+                    sync_state['skipped'] += 1
+                    continue
+                yield woocommerce_order
+
+    def import_modified_orders_from_woocommerce_to_odoo(self, instance):
+        """
+        Incremental import: only the orders modified since the stored cursor (minus the instance overlap) are
+        fetched, the unchanged ones are skipped and the cursor is moved to the newest modification date seen.
+        """
+        cancelled = self.env.context.get('cancelled', False)
+        order_status = 'cancelled' if cancelled else 'completed'
+        sync_cursor = self.env['woocommerce.order.sync.cursor'].get_woocommerce_order_sync_cursor(instance, order_status)
+        if sync_cursor.last_modified_date:
+            modified_after = sync_cursor.last_modified_date - timedelta(minutes=instance.woocommerce_order_sync_overlap)
+        else:
+            modified_after = fields.Datetime.now() - timedelta(days=1 if cancelled else 10)
+        run_date = fields.Datetime.now()
+        woocommerce_order_list = self.fetch_modified_orders_from_woocommerce(instance, order_status, modified_after)
+        if woocommerce_order_list is False:
+            return []
+        sync_state = {'fetched': 0, 'skipped': 0, 'last_modified_date': sync_cursor.last_modified_date}
+        res_id_list = self.create_woocommerce_order_queue_job(
+            instance, self.skip_unchanged_woocommerce_orders(instance, woocommerce_order_list, sync_state))
+        queued_count = sync_state['fetched'] - sync_state['skipped']
+        # The orders come oldest change first: an interrupted stream leaves the cursor at the last order received,
+        # the next run continues from there.
+        sync_cursor.write({
+            'last_modified_date': sync_state['last_modified_date'],
+            'last_run_date': run_date,
+            'last_fetched_count': sync_state['fetched'],
+            'last_queued_count': queued_count,
+        })
+        if pagination.is_truncated(woocommerce_order_list):
+            _logger.error("Incremental %s order import for %s interrupted after %s orders: %s", order_status,
+                          instance.name, sync_state['fetched'], woocommerce_order_list.error)
+        elif not cancelled:
+            instance.woocommerce_last_synced_order_date = run_date
+        _logger.info("Incremental %s order import for %s: %s fetched, %s unchanged skipped, cursor at %s",
+                     order_status, instance.name, sync_state['fetched'], sync_state['skipped'],
+                     sync_state['last_modified_date'])
+        return res_id_list
+
     def import_order_from_woocommerce_to_odoo(self, instance, from_date=False, to_date=False,woocommerce_order_ids=False):
         """import order from woocommerce"""
+        # Without an explicit window or order IDs (crons) only the orders changed since the last run are imported.
+        incremental = not from_date and not to_date and not woocommerce_order_ids
         from_date = from_date if from_date else fields.Datetime.now() - timedelta(10)
         to_date = to_date if to_date else fields.Datetime.now()
         cancelled = self.env.context.get('cancelled', False)
-        woocommerce_order_list = self.fetch_orders_from_woocommerce_to_odoo(instance, from_date, to_date,woocommerce_order_ids)
-        if cancelled and not woocommerce_order_list:
-            _logger.info("No CANCELLED orders found to import for instance: %s", instance.name)
-            return True
+        res_id_list = []
+        # The order list may be a stream: queues are created while the pages are downloaded.
+        if incremental:
+            woocommerce_order_list = False
+            res_id_list = self.import_modified_orders_from_woocommerce_to_odoo(instance)
+        else:
+            woocommerce_order_list = self.fetch_orders_from_woocommerce_to_odoo(instance, from_date, to_date,
+                                                                               woocommerce_order_ids)
         if woocommerce_order_list:
             res_id_list = self.create_woocommerce_order_queue_job(instance, woocommerce_order_list)
-            if cancelled:
-                for queue in self.env['woocommerce.order.data.queue'].browse(res_id_list):
-                    queue.name = f"{queue.name} - Cancelled Orders"
-        if not woocommerce_order_list:
+        if cancelled:
+            for queue in self.env['woocommerce.order.data.queue'].browse(res_id_list):
+                queue.name = f"{queue.name} - Cancelled Orders"
+        if cancelled and not res_id_list:
+            _logger.info("No CANCELLED orders found to import for instance: %s", instance.name)
+            return True
+        if not res_id_list:
             _logger.info("There is no order to import for instance: %s", instance.name)
-            return res_id_list
+        return res_id_list
 
     def process_woocommerce_order_queue(self, instance_id=False):
         """This method was used for process the order queue line from order queue"""
-        sale_order_object, instance_id = self.env['sale.order'], instance_id if instance_id else self.instance_id
-        order_data_queues = self
-        cancelled =  'cancelled orders' in (self.name or '').lower()
-        for order_data_queue in order_data_queues:
+        instance_id = instance_id if instance_id else self.instance_id
+        for order_data_queue in self:
             if order_data_queue.woocommerce_log_id:
                 log_id = order_data_queue.woocommerce_log_id
             else:
                 log_id = self.env['woocommerce.log'].generate_woocommerce_logs('order', 'import', instance_id,'Process Started')
             self._cr.commit()
-            order_data_queue_lines = order_data_queue.woocommerce_order_queue_line_ids.filtered(
-                lambda x: x.state in ['draft', 'partially_completed', 'failed'])
-            for line in order_data_queue_lines:
-                try:
-                    woocommerce_order_dictionary = safe_eval(line.order_data_to_process)
-                    result, msg, fault_or_not, line_state = sale_order_object.process_import_order_from_woocommerce(
+            # Lines leased by a running cron worker are left to it, the leases are read again from the database.
+            queue_lines = order_data_queue.woocommerce_order_queue_line_ids
+            queue_lines.invalidate_recordset(['state', 'lease_expires_at'])
+            now = fields.Datetime.now()
+            order_data_queue_lines = queue_lines.filtered(
+                lambda x: x.state in ['draft', 'partially_completed', 'failed'] and (
+                        not x.lease_expires_at or x.lease_expires_at < now))
+            order_data_queue.process_woocommerce_order_queue_lines(order_data_queue_lines, instance_id, log_id)
+            order_data_queue.woocommerce_log_id = log_id.id
+            log_id.woocommerce_operation_message = 'Process Has Been Finished'
+            if not log_id.woocommerce_operation_line_ids:
+                log_id.unlink()
+
+    def process_woocommerce_order_queue_lines(self, order_data_queue_lines, instance_id, log_id):
+        """
+        This method is used to process the given lines of this queue, each line in its own savepoint.
+        @return : False when the processing was interrupted because the store is unavailable
+        """
+        self.ensure_one()
+        sale_order_object = self.env['sale.order']
+        cancelled = 'cancelled orders' in (self.name or '').lower()
+        woocommerce_order_dictionaries = {}
+        for line in order_data_queue_lines:
+            try:
+                woocommerce_order_dictionaries[line.id] = line.get_woocommerce_payload()
+            except Exception as error:
+                _logger.info(error)
+        # Customers missing in Odoo are fetched concurrently once per queue instead of once per order.
+        # Requests refused by the circuit breaker come back as failed results, the breaker is checked before each
+        # line below.
+        prefetched_customers = {} if cancelled else sale_order_object.prefetch_woocommerce_customers(
+            instance_id, list(woocommerce_order_dictionaries.values()))
+        # Products, taxes, gateways, carriers... referenced by the whole queue are searched once.
+        resolver = WooCommerceOrderResolver(self.env, instance_id)
+        if not cancelled:
+            resolver.prefetch(list(woocommerce_order_dictionaries.values()))
+        # With the bulk delivery validation / invoicing the orders are collected and validated / invoiced together
+        # after the lines.
+        deferred_delivery_order_ids = [] if instance_id.woocommerce_bulk_delivery_validation and not cancelled \
+            else None
+        deferred_invoice_order_ids = [] if instance_id.woocommerce_bulk_invoicing and not cancelled else None
+        queue_sale_order_object = sale_order_object.with_context(
+            woocommerce_prefetched_customers=prefetched_customers, woocommerce_order_resolver=resolver,
+            woocommerce_deferred_delivery_order_ids=deferred_delivery_order_ids,
+            woocommerce_deferred_invoice_order_ids=deferred_invoice_order_ids)
+        available = True
+        for line in order_data_queue_lines:
+            if instance_id.is_woocommerce_circuit_open():
+                # The store is down: keep the remaining lines as they are for the next run.
+                _logger.warning("WooCommerce store of %s is unavailable, order queue %s paused.",
+                                instance_id.name, self.name)
+                available = False
+                break
+            try:
+                with self.env.cr.savepoint():
+                    woocommerce_order_dictionary = woocommerce_order_dictionaries.get(
+                        line.id) or line.get_woocommerce_payload()
+                    result, msg, fault_or_not, line_state = queue_sale_order_object.process_import_order_from_woocommerce(
                         woocommerce_order_dictionary,
                         instance_id, log_id, line, cancelled = cancelled)
                     if result:
@@ -149,35 +303,201 @@ class WooCommerceOrderDataQueue(models.Model):
                                                                                            instance_id, msg,
                                                                                            False, msg, log_id,
                                                                                            fault_or_not)
-                except Exception as error:
-                    _logger.info(error)
-            self.woocommerce_log_id = log_id.id
+            except circuit_breaker.WooCommerceCircuitOpenError as error:
+                _logger.warning(error)
+                available = False
+                break
+            except Exception as error:
+                # Another line can still be processed: the savepoint rolled back the changes of this one only,
+                # records the resolver may have remembered from it included.
+                resolver.invalidate()
+                _logger.info(error)
+        if deferred_delivery_order_ids or deferred_invoice_order_ids:
+            self.finish_woocommerce_queue_workflow_in_bulk(order_data_queue_lines, deferred_delivery_order_ids or [],
+                                                           deferred_invoice_order_ids or [], instance_id, log_id)
+        return available
+
+    def finish_woocommerce_queue_workflow_in_bulk(self, order_data_queue_lines, delivery_order_ids,
+                                                  invoice_order_ids, instance_id, log_id):
+        """
+        This method is used to validate the deliveries, then create the invoices, of the orders created by the queue
+        lines together. The result of each order is recorded on its queue line and in the log like when the order
+        goes through the auto workflow on its own.
+        """
+        sale_order_object = self.env['sale.order']
+        results = {}
+        # Orders of lines rolled back after they were collected no longer exist.
+        delivery_orders = sale_order_object.browse(delivery_order_ids).exists()
+        if delivery_orders:
+            results.update(delivery_orders.validate_woocommerce_deliveries_in_bulk())
+            invoice_order_ids = invoice_order_ids + [
+                sale_order.id for sale_order in delivery_orders
+                if results[sale_order.id][0] and sale_order.state == 'sale'
+                and sale_order.woocommerce_sale_auto_workflow_id.create_invoice]
+        invoice_orders = sale_order_object.browse(invoice_order_ids).exists()
+        if invoice_orders and instance_id.woocommerce_bulk_invoicing:
+            results.update(invoice_orders.create_woocommerce_invoices_in_bulk())
+        else:
+            for sale_order in invoice_orders:
+                results[sale_order.id] = sale_order_object.auto_create_woocommerce_invoice_in_savepoint(
+                    sale_order, sale_order.woocommerce_sale_auto_workflow_id)
+        for line in order_data_queue_lines.filtered(lambda queue_line: queue_line.sale_order_id.id in results):
+            result, msg, fault_or_not, line_state = results[line.sale_order_id.id]
+            if not result and fault_or_not:
+                line.state = line_state
+            self.env['woocommerce.log.line'].generate_woocommerce_process_line('order', 'import', instance_id, msg,
+                                                                               False, msg, log_id, fault_or_not)
+        return True
+
+    def cron_process_woocommerce_order_queue(self, instance_id, worker=1):
+        """
+        Order queue worker of an instance. Several workers (crons) drain the same backlog concurrently: each one
+        leases a chunk of lines of a queue no other worker is processing, processes and commits it, and leases the
+        next chunk until nothing is left. The lease of a worker which died expires after the instance lease timeout.
+        Failed lines are not retried here, they are processed again from the queue.
+        """
+        instance = self.env['woocommerce.instance.integration'].browse(instance_id)
+        if not instance.exists() or not instance.active:
+            return False
+        if instance.is_woocommerce_circuit_open():
+            _logger.warning("Skipping order queue processing, WooCommerce store of %s is unavailable.", instance.name)
+            return False
+        line_object = self.env['woocommerce.order.data.queue.line']
+        worker_name = "%s/%s/%s" % (instance.id, worker, os.getpid())
+        attempted_line_ids, log_id = [], False
+        while True:
+            line_ids = line_object.lease_woocommerce_order_queue_lines(instance, worker_name, attempted_line_ids)
+            if not line_ids:
+                break
+            attempted_line_ids += line_ids
+            if not log_id:
+                log_id = self.env['woocommerce.log'].generate_woocommerce_logs('order', 'import', instance,
+                                                                               'Process Started')
+            lines = line_object.browse(line_ids)
+            order_data_queue = lines.woocommerce_order_queue_id
+            self.env.cr.execute("""UPDATE woocommerce_order_data_queue SET woocommerce_log_id = %s
+                                   WHERE id = %s AND woocommerce_log_id IS NULL""", (log_id.id, order_data_queue.id))
+            order_data_queue.invalidate_recordset(['woocommerce_log_id'])
+            available = order_data_queue.process_woocommerce_order_queue_lines(lines, instance, log_id)
+            lines.release_woocommerce_order_queue_lease()
+            self._cr.commit()
+            _logger.info("Order queue worker %s processed %s lines of %s", worker_name, len(lines),
+                         order_data_queue.name)
+            if not available:
+                break
+        if log_id:
             log_id.woocommerce_operation_message = 'Process Has Been Finished'
             if not log_id.woocommerce_operation_line_ids:
                 log_id.unlink()
+        return True
 
     def cron_import_cancelled_order(self, instance_id):
         """cron to import cancelled order from woocommerce"""
         instance = self.env['woocommerce.instance.integration'].browse(instance_id)
+        if instance.is_woocommerce_circuit_open():
+            _logger.warning("Skipping cancelled order import, WooCommerce store of %s is unavailable.", instance.name)
+            return False
+        if instance.woocommerce_cancel_reconciliation:
+            return self.reconcile_cancelled_woocommerce_orders(instance)
         _logger.info("Importing CANCELLED WooCommerce orders: %s", instance.name)
         return self.with_context(cancelled=True).import_order_from_woocommerce_to_odoo(instance)
 
+    def get_woocommerce_reconciliation_statuses(self, instance):
+        statuses = ['cancelled']
+        if instance.woocommerce_reconcile_refunded_orders:
+            statuses.append('refunded')
+        if instance.woocommerce_reconcile_failed_orders:
+            statuses.append('failed')
+        return statuses
+
+    def reconcile_cancelled_woocommerce_orders(self, instance):
+        """
+        This method is used to cancel in Odoo the orders cancelled (refunded, failed) in WooCommerce during the
+        instance lookback without queuing them: only the id, number, status and modification date of the orders are
+        downloaded, each chunk is matched against the open sale orders with one query and the matching orders are
+        cancelled together. Orders which need no action leave no trace.
+        """
+        statuses = self.get_woocommerce_reconciliation_statuses(instance)
+        modified_after = fields.Datetime.now() - timedelta(days=max(instance.woocommerce_cancel_reconciliation_days,
+                                                                    1))
+        params = {
+            'modified_after': modified_after.strftime('%Y-%m-%dT%H:%M:%S'),
+            'dates_are_gmt': 'true',
+            'status': ','.join(statuses),
+            'per_page': 100,
+        }
+        url = "{0}/wp-json/wc/v3/orders".format(instance.woocommerce_url)
+        try:
+            response_status, woocommerce_orders = instance.woocommerce_fetch_all_pages(
+                url, params=params, field_set='order_status', stream=instance.woocommerce_stream_responses)
+        except Exception as error:
+            _logger.info("Getting Some Error In Fetch The orders :: {0}".format(error))
+            return False
+        if not response_status:
+            _logger.info("Getting Some error while fetch order from Woocommerce : {0}".format(woocommerce_orders))
+            return False
+        fetched_count, cancelled_count, log_id = 0, 0, False
+        for woocommerce_orders_chunk in tools.split_every(500, woocommerce_orders):
+            fetched_count += len(woocommerce_orders_chunk)
+            woocommerce_statuses = {str(order.get('number') or ''): order.get('status')
+                                    for order in woocommerce_orders_chunk if order.get('number')}
+            self.env.flush_all()
+            self.env.cr.execute("""SELECT id, woocommerce_order_number FROM sale_order
+                                   WHERE instance_id = %s AND woocommerce_order_number = ANY(%s)
+                                     AND state IN ('draft', 'sent', 'sale')""",
+                                (instance.id, list(woocommerce_statuses)))
+            order_numbers = dict(self.env.cr.fetchall())
+            if not order_numbers:
+                continue
+            results = self.env['sale.order'].browse(list(order_numbers)).cancel_woocommerce_orders_in_bulk()
+            if not log_id:
+                log_id = self.env['woocommerce.log'].generate_woocommerce_logs('order', 'import', instance,
+                                                                               'Process Started')
+            for sale_order_id, error in results.items():
+                order_number = order_numbers[sale_order_id]
+                if error is True:
+                    cancelled_count += 1
+                    msg = "Order Number {0} - Cancelled in Odoo ({1} in WooCommerce)".format(
+                        order_number, woocommerce_statuses.get(order_number))
+                else:
+                    msg = "Order Number {0} - Can not be cancelled in Odoo ({1} in WooCommerce): {2}".format(
+                        order_number, woocommerce_statuses.get(order_number), error)
+                self.env['woocommerce.log.line'].generate_woocommerce_process_line(
+                    'order', 'import', instance, msg, False, msg, log_id, error is not True)
+            self._cr.commit()
+        if log_id:
+            log_id.woocommerce_operation_message = 'Process Has Been Finished'
+        _logger.info("Cancelled order reconciliation for %s: %s %s orders fetched, %s cancelled in Odoo",
+                     instance.name, fetched_count, '/'.join(statuses), cancelled_count)
+        if pagination.is_truncated(woocommerce_orders):
+            _logger.error("Cancelled order reconciliation for %s interrupted: %s", instance.name,
+                          woocommerce_orders.error)
+            return False
+        return True
+
     def cron_import_order(self, instance_id):
         """cron to import order from woocommerce"""
         instance = self.env['woocommerce.instance.integration'].browse(instance_id)
+        if instance.is_woocommerce_circuit_open():
+            _logger.warning("Skipping order import, WooCommerce store of %s is unavailable.", instance.name)
+            return False
         _logger.info("Importing Woocommerce orders: %s", instance.name)
         return self.import_order_from_woocommerce_to_odoo(instance)
 
 class WoocommerceOrderDataQueueLine(models.Model):
     _name = 'woocommerce.order.data.queue.line'
+    _inherit = 'woocommerce.queue.payload.mixin'
     _description = "Woocommerce Order Data Queue Line"
     _rec_name = 'woocommerce_order_queue_id'
+    _woocommerce_payload_field = 'order_data_to_process'
 
     name = fields.Char(string='Name')
-    woocommerce_order_queue_id = fields.Many2one('woocommerce.order.data.queue', string='Order Data Queue')
+    woocommerce_order_queue_id = fields.Many2one('woocommerce.order.data.queue', string='Order Data Queue',
+                                                 index=True)
 
     instance_id = fields.Many2one('woocommerce.instance.integration', string='Instance', help='Select Instance Id')
-    order_data_id = fields.Char(string="Order Data ID", help='This is the Order Id of Woocommerce Order')
+    order_data_id = fields.Char(string="Order Data ID", help='This is the Order Id of Woocommerce Order',
+                                index=True)
     state = fields.Selection(
         [('draft', 'Draft'), ('partially_completed', 'Partially Completed'),
          ('completed', 'Completed'), ('failed', 'Failed')], tracking=True,
@@ -187,15 +507,83 @@ class WoocommerceOrderDataQueueLine(models.Model):
     #                                  help="This field gives information regarding how many time we will try to proceed the order",
     #                                  copy=False)
     sale_order_id = fields.Many2one('sale.order', string="Sale Order")
+    lease_expires_at = fields.Datetime(string="Leased Until", copy=False, readonly=True,
+                                       help="The line is being processed by an order queue worker until this time.")
+    leased_by = fields.Char(string="Leased By", copy=False, readonly=True)
 
-    def create_woocommerce_order_queue_line(self, woocommerce_order_dict, state, instance_id,
-                                            queue_id):
-        order_queue_line_id = self.create({
+    @api.model
+    def lease_woocommerce_order_queue_lines(self, instance, worker_name, excluded_line_ids=None, retry=True):
+        """
+        This method is used to lease the next chunk of draft lines of the instance for a worker. The lines all
+        belong to one queue which no other worker holds an active lease on: the queue row is locked with SKIP LOCKED
+        while its lines are leased, so concurrent workers pick different queues. The lease is committed right away.
+        @return : ids of the leased lines
+        """
+        now = fields.Datetime.now()
+        lease_until = now + timedelta(minutes=max(instance.woocommerce_order_queue_lease_timeout, 1))
+        chunk_size = max(instance.woocommerce_order_queue_chunk_size, 1)
+        excluded_line_ids = list(excluded_line_ids or [])
+        try:
+            self.env.cr.execute("""
+                SELECT queue.id FROM woocommerce_order_data_queue queue
+                WHERE queue.instance_id = %(instance)s
+                  AND EXISTS (SELECT 1 FROM woocommerce_order_data_queue_line line
+                              WHERE line.woocommerce_order_queue_id = queue.id
+                                AND line.state IN ('draft', 'partially_completed')
+                                AND (line.lease_expires_at IS NULL OR line.lease_expires_at < %(now)s)
+                                AND NOT (line.id = ANY(%(excluded)s::integer[])))
+                  AND NOT EXISTS (SELECT 1 FROM woocommerce_order_data_queue_line line
+                                  WHERE line.woocommerce_order_queue_id = queue.id
+                                    AND line.lease_expires_at >= %(now)s AND line.leased_by != %(worker)s)
+                ORDER BY queue.id LIMIT 1 FOR UPDATE SKIP LOCKED""",
+                {'instance': instance.id, 'now': now, 'excluded': excluded_line_ids, 'worker': worker_name})
+            row = self.env.cr.fetchone()
+            if not row:
+                self.env.cr.commit()
+                return []
+            self.env.cr.execute("""
+                UPDATE woocommerce_order_data_queue_line SET lease_expires_at = %(until)s, leased_by = %(worker)s
+                WHERE id IN (SELECT id FROM woocommerce_order_data_queue_line
+                             WHERE woocommerce_order_queue_id = %(queue)s
+                               AND state IN ('draft', 'partially_completed')
+                               AND (lease_expires_at IS NULL OR lease_expires_at < %(now)s)
+                               AND NOT (id = ANY(%(excluded)s::integer[]))
+                             ORDER BY id LIMIT %(limit)s FOR UPDATE SKIP LOCKED)
+                RETURNING id""", {'until': lease_until, 'worker': worker_name, 'queue': row[0], 'now': now,
+                                    'excluded': excluded_line_ids, 'limit': chunk_size})
+            line_ids = sorted(line_id for line_id, in self.env.cr.fetchall())
+            self.env.cr.commit()
+        except OperationalError as error:
+            # A worker leased the same queue at the same time: its lines are left to it.
+            _logger.info("Order queue lease of worker %s failed: %s", worker_name, error)
+            self.env.cr.rollback()
+            if not retry:
+                return []
+            return self.lease_woocommerce_order_queue_lines(instance, worker_name, excluded_line_ids, retry=False)
+        self.invalidate_model(['lease_expires_at', 'leased_by'])
+        return line_ids
+
+    def release_woocommerce_order_queue_lease(self):
+        if self.ids:
+            self.env.cr.execute("""UPDATE woocommerce_order_data_queue_line SET lease_expires_at = NULL, leased_by = NULL
+                                   WHERE id IN %s""", (tuple(self.ids),))
+            self.invalidate_recordset(['lease_expires_at', 'leased_by'])
+        return True
+
+    @api.model
+    def prepare_woocommerce_order_queue_line_vals(self, woocommerce_order_dict, state, instance_id, queue_id=False):
+        vals = {
             'order_data_id': woocommerce_order_dict.get('id'),
             'state': state,
             # 'name': shopify_order_dict.strip(),
-            'order_data_to_process': pprint.pformat(woocommerce_order_dict),
             'instance_id': instance_id.id,
-            'woocommerce_order_queue_id': queue_id.id
-        })
+            'woocommerce_order_queue_id': queue_id and queue_id.id or False
+        }
+        vals.update(self.prepare_woocommerce_payload_vals(woocommerce_order_dict, instance_id))
+        return vals
+
+    def create_woocommerce_order_queue_line(self, woocommerce_order_dict, state, instance_id,
+                                            queue_id):
+        order_queue_line_id = self.create(
+            self.prepare_woocommerce_order_queue_line_vals(woocommerce_order_dict, state, instance_id, queue_id))
         return order_queue_line_id
@@ -0,0 +1,255 @@
+class WooCommerceOrderResolver(object):
+    """
+    Lookups of the Odoo records the WooCommerce orders of one queue run refer to: products by SKU, listing items by
+    WooCommerce product / variation id, taxes by WooCommerce tax id, payment gateways, financial statuses, carriers,
+    currencies and pricelists.
+
+    ``prefetch`` loads the references of all the orders of the batch with one search per kind of record, the lookups
+    are then served from memory. A key which was not prefetched is searched once and remembered, records created
+    while the orders are processed (imported products, new gateways or carriers) invalidate the affected mappings.
+    Products missing in Odoo are imported at most once per run, see ``import_product``.
+    The resolver is handed to ``sale.order`` through the ``woocommerce_order_resolver`` context key.
+    """
+
+    def __init__(self, env, instance):
+        self.env = env
+        self.instance = instance
+        self._imported_products = {}
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Forget every mapping, to call when records created through the resolver may have been rolled back.
+        Failed product imports are kept: nothing was created by them and they would fail again.
+        """
+        self._imported_products = {key: listing_id for key, listing_id in self._imported_products.items()
+                                   if not listing_id}
+        self._products = {}
+        self._listing_items_by_variant = {}
+        self._listing_items_by_product = {}
+        self._taxes = {}
+        self._currencies = {}
+        self._pricelists = {}
+        self._payment_gateways = None
+        self._financial_statuses = None
+        self._carriers = None
+        self._shipping_methods = None
+        self._carrier_by_method = {}
+
+    def prefetch(self, woocommerce_order_dictionaries):
+        skus, variant_ids, product_ids, tax_ids, currencies = set(), set(), set(), set(), set()
+        for order in woocommerce_order_dictionaries:
+            if order.get('currency'):
+                currencies.add(order.get('currency'))
+            order_lines = order.get('line_items') or []
+            if isinstance(order_lines, dict):
+                order_lines = [order_lines]
+            for order_line in order_lines:
+                if order_line.get('sku'):
+                    skus.add(order_line.get('sku'))
+                if order_line.get('variation_id'):
+                    variant_ids.add(str(order_line.get('variation_id')))
+                if order_line.get('product_id'):
+                    product_ids.add(str(order_line.get('product_id')))
+                tax_ids.update(tax.get('id') for tax in order_line.get('taxes') or [] if tax.get('id'))
+        skus.update(self._prefetch_listing_items(variant_ids, product_ids))
+        self._prefetch_products(skus)
+        self._prefetch_taxes(tax_ids)
+        self._prefetch_currencies(currencies)
+        self._load_payment_references()
+        return self
+
+    # Products
+
+    def _prefetch_listing_items(self, variant_ids, product_ids):
+        listing_item_object = self.env['woocommerce.product.listing.item']
+        variant_ids = variant_ids - set(self._listing_items_by_variant)
+        product_ids = product_ids - set(self._listing_items_by_product)
+        skus = set()
+        if variant_ids:
+            for item in listing_item_object.search([('woocommerce_product_variant_id', 'in', list(variant_ids))]):
+                self._listing_items_by_variant.setdefault(item.woocommerce_product_variant_id, item.id)
+                skus.add(item.product_sku)
+            self._listing_items_by_variant.update(dict.fromkeys(variant_ids - set(self._listing_items_by_variant),
+                                                                False))
+        if product_ids:
+            for item in listing_item_object.search(
+                    [('woocommerce_product_listing_id.woocommerce_product_id', 'in', list(product_ids))]):
+                self._listing_items_by_product.setdefault(item.woocommerce_product_listing_id.woocommerce_product_id,
+                                                          item.id)
+                skus.add(item.product_sku)
+            self._listing_items_by_product.update(dict.fromkeys(product_ids - set(self._listing_items_by_product),
+                                                                False))
+        skus.discard(False)
+        return skus
+
+    def _prefetch_products(self, skus):
+        skus = skus - set(self._products)
+        if not skus:
+            return
+        for product in self.env['product.product'].search([('default_code', 'in', list(skus))]):
+            self._products.setdefault(product.default_code, product.id)
+        self._products.update(dict.fromkeys(skus - set(self._products), False))
+
+    def get_listing_item(self, woocommerce_variant_id, woocommerce_product_id):
+        """
+        Listing item of the variation, or of the product when the variation is unknown.
+        """
+        variant_key = woocommerce_variant_id and str(woocommerce_variant_id)
+        product_key = woocommerce_product_id and str(woocommerce_product_id)
+        self._prefetch_listing_items({variant_key} if variant_key else set(), {product_key} if product_key else set())
+        item_id = variant_key and self._listing_items_by_variant.get(variant_key)
+        if not item_id and product_key:
+            item_id = self._listing_items_by_product.get(product_key)
+        return self.env['woocommerce.product.listing.item'].browse(item_id or [])
+
+    def get_product(self, sku):
+        if not sku:
+            return self.env['product.product']
+        self._prefetch_products({sku})
+        return self.env['product.product'].browse(self._products.get(sku) or [])
+
+    def invalidate_products(self):
+        """
+        To call after products were imported: the SKU and listing mappings are searched again.
+        """
+        self._products.clear()
+        self._listing_items_by_variant.clear()
+        self._listing_items_by_product.clear()
+
+    def import_product(self, woocommerce_product_id, log_id=False):
+        """
+        Import the WooCommerce product once for the whole run, every order line referring to it afterwards gets the
+        same result, failures included. The product is registered before the import starts, so a nested or
+        repeated request while it runs (or after it raised) is answered by the registry instead of a new import.
+        """
+        listing_object = self.env['woocommerce.product.listing']
+        key = woocommerce_product_id and str(woocommerce_product_id)
+        if not key:
+            return listing_object
+        if key not in self._imported_products:
+            self._imported_products[key] = False
+            listing = listing_object.woocommerce_create_products(
+                product_queue_line=False, instance=self.instance, log_id=log_id,
+                order_line_product_listing_id=woocommerce_product_id)
+            self._imported_products[key] = listing and listing.id or False
+            self.invalidate_products()
+        return listing_object.browse(self._imported_products[key] or [])
+
+    # Taxes, currencies and pricelists
+
+    def _prefetch_taxes(self, woocommerce_tax_ids):
+        woocommerce_tax_ids = woocommerce_tax_ids - set(self._taxes)
+        if not woocommerce_tax_ids:
+            return
+        for tax in self.env['account.tax'].search(
+                [('woocommerce_tax_id.woocommerce_tax_id', 'in', list(woocommerce_tax_ids))]):
+            self._taxes.setdefault(tax.woocommerce_tax_id.woocommerce_tax_id, tax.id)
+        self._taxes.update(dict.fromkeys(woocommerce_tax_ids - set(self._taxes), False))
+
+    def get_tax(self, woocommerce_tax_id):
+        self._prefetch_taxes({woocommerce_tax_id})
+        return self.env['account.tax'].browse(self._taxes.get(woocommerce_tax_id) or [])
+
+    def _prefetch_currencies(self, names):
+        names = names - set(self._currencies)
+        if not names:
+            return
+        for currency in self.env['res.currency'].search([('name', 'in', list(names))]):
+            self._currencies.setdefault(currency.name, currency.id)
+        self._currencies.update(dict.fromkeys(names - set(self._currencies), False))
+
+    def get_currency(self, name):
+        if not name:
+            return self.env['res.currency']
+        self._prefetch_currencies({name})
+        return self.env['res.currency'].browse(self._currencies.get(name) or [])
+
+    def get_pricelist(self, currency):
+        if self.instance and self.instance.woocommerce_price_list_id:
+            return self.instance.woocommerce_price_list_id
+        if currency.id not in self._pricelists:
+            self._pricelists[currency.id] = self.env['product.pricelist'].search(
+                [('currency_id', '=', currency.id)], limit=1).id
+        return self.env['product.pricelist'].browse(self._pricelists[currency.id] or [])
+
+    # Payment gateways and financial statuses
+
+    def _load_payment_references(self):
+        if self._payment_gateways is None:
+            self._payment_gateways = {}
+            for gateway in self.env['woocommerce.payment.gateway'].search([('instance_id', '=', self.instance.id)]):
+                self._payment_gateways.setdefault(gateway.code, gateway.id)
+        if self._financial_statuses is None:
+            self._financial_statuses = self.env['woocommerce.financial.status.configuration'].search(
+                [('instance_id', '=', self.instance.id)]).ids
+
+    def find_payment_gateway(self, code):
+        self._load_payment_references()
+        return self.env['woocommerce.payment.gateway'].browse(self._payment_gateways.get(code) or [])
+
+    def search_or_create_payment_gateway(self, code, name):
+        gateway = self.find_payment_gateway(code)
+        if gateway:
+            return gateway
+        gateway = self.env['woocommerce.payment.gateway'].search_or_create_woocommerce_payment_gateway(
+            self.instance, code=code, name=name)
+        self._payment_gateways[code] = gateway.id
+        # A new gateway comes with its financial statuses.
+        self._financial_statuses = None
+        return gateway
+
+    def get_financial_status(self, financial_status, payment_gateway=None, payment_gateway_name=None):
+        """
+        First financial status of the instance matching the gateway record, or its name when given.
+        """
+        self._load_payment_references()
+        for status in self.env['woocommerce.financial.status.configuration'].browse(self._financial_statuses):
+            if status.financial_status != financial_status:
+                continue
+            if payment_gateway_name is not None:
+                if status.payment_gateway_id.name == payment_gateway_name:
+                    return status
+            elif status.payment_gateway_id == payment_gateway:
+                return status
+        return self.env['woocommerce.financial.status.configuration']
+
+    # Carriers
+
+    def _load_carriers(self):
+        if self._carriers is None:
+            self._carriers = [(carrier.id, carrier.name or '', carrier.woocommerce_delivery_code or '')
+                              for carrier in self.env['delivery.carrier'].search([])]
+        if self._shipping_methods is None:
+            self._shipping_methods = [(method.id, method.name or '')
+                                      for method in self.env['woocommerce.shipping.method'].search([])]
+
+    def find_carrier(self, delivery_method):
+        """
+        Same precedence as the former searches: delivery code, exact name, then name or code containing the
+        method (case insensitive).
+        """
+        if delivery_method not in self._carrier_by_method:
+            self._load_carriers()
+            lower_method = delivery_method.lower()
+            carrier_id = next((carrier_id for carrier_id, name, code in self._carriers if code == delivery_method),
+                              False) or next(
+                (carrier_id for carrier_id, name, code in self._carriers if name == delivery_method), False) or next(
+                (carrier_id for carrier_id, name, code in self._carriers
+                 if lower_method in name.lower() or lower_method in code.lower()), False)
+            if not carrier_id:
+                return self.env['delivery.carrier']
+            self._carrier_by_method[delivery_method] = carrier_id
+        return self.env['delivery.carrier'].browse(self._carrier_by_method[delivery_method])
+
+    def find_shipping_method(self, delivery_method):
+        self._load_carriers()
+        lower_method = delivery_method.lower()
+        method_id = next((method_id for method_id, name in self._shipping_methods if lower_method in name.lower()),
+                         False)
+        return self.env['woocommerce.shipping.method'].browse(method_id or [])
+
+    def register_carrier(self, delivery_method, carrier):
+        self._load_carriers()
+        self._carriers.append((carrier.id, carrier.name or '', carrier.woocommerce_delivery_code or ''))
+        self._carrier_by_method[delivery_method] = carrier.id
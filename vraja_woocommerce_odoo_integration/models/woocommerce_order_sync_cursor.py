@@ -0,0 +1,28 @@
+from odoo import models, fields, api
+
+
+class WooCommerceOrderSyncCursor(models.Model):
+    _name = 'woocommerce.order.sync.cursor'
+    _description = 'WooCommerce Order Sync Cursor'
+    _rec_name = 'order_status'
+
+    instance_id = fields.Many2one('woocommerce.instance.integration', string='Instance', required=True,
+                                  ondelete='cascade', index=True)
+    order_status = fields.Char(string='Order Status', required=True)
+    last_modified_date = fields.Datetime(string='Synced Up To (GMT)',
+                                         help='Highest WooCommerce modification date (GMT) of the orders fetched so '
+                                              'far. The next import asks for the orders modified after this date '
+                                              'minus the instance overlap.')
+    last_run_date = fields.Datetime(string='Last Run')
+    last_fetched_count = fields.Integer(string='Fetched (Last Run)')
+    last_queued_count = fields.Integer(string='Queued (Last Run)')
+
+    _sql_constraints = [
+        ('instance_status_uniq', 'unique(instance_id, order_status)',
+         'An instance can only have one order sync cursor per status.')
+    ]
+
+    @api.model
+    def get_woocommerce_order_sync_cursor(self, instance, order_status):
+        cursor = self.search([('instance_id', '=', instance.id), ('order_status', '=', order_status)], limit=1)
+        return cursor or self.create({'instance_id': instance.id, 'order_status': order_status})
@@ -35,7 +35,10 @@ class ProductCategory(models.Model):
             log_id = self.env['woocommerce.log'].generate_woocommerce_logs('product_category', 'import', instance,
                                                                            'Process Started')
             url = "{0}/wp-json/wc/v3/products/categories".format(instance.woocommerce_url)
-            response_status, response_data,next_page_link = instance.woocommerce_api_calling_process("GET", url)
+            response_status, response_data, next_page_link, unchanged = instance.woocommerce_api_cached_get(
+                url, params={'per_page': 100})
+            if unchanged and self.env.context.get('woocommerce_skip_unchanged_reference_data'):
+                response_data = []
             if response_status:
                 for product_category_response in response_data:
                     self.search_or_create_product_category(instance, product_category_response, log_id)
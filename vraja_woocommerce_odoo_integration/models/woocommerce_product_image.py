@@ -8,6 +8,7 @@ import requests
 import urllib.parse
 from odoo import models, fields, api, _
 from odoo.tools.mimetypes import guess_mimetype
+from odoo.tools.sql import create_index
 
 _logger = logging.getLogger("Shopify_Product_Image")
 
@@ -35,6 +36,15 @@ class WoocommerceProductImage(models.Model):
     listing_item_ids = fields.Many2many('woocommerce.product.listing.item', 'woocommerce_product_image_listing_item_rel',
                                         'woocommerce_image_id', 'listing_item_id', string="Listing Item")
 
+    def init(self):
+        """
+        This method is used to index the WooCommerce image id with its instance, images are looked up by it while
+        the product images are synced.
+        """
+        create_index(self._cr, 'woocommerce_product_image_woocommerce_image_id_index', self._table,
+                     ['woocommerce_image_id', 'woocommerce_instance_id'],
+                     where='woocommerce_image_id IS NOT NULL')
+
     @api.onchange('url')
     def _onchange_url(self):
         if not self.url:
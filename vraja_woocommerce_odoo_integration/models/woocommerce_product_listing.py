@@ -1,11 +1,12 @@
 import pytz
 import logging
-import requests
 import json
 from dateutil import parser
 from odoo import models, fields, api, _
 from odoo.exceptions import AccessError, ValidationError
+from odoo.tools.sql import create_index
 import base64
+from ..tools import fan_out
 
 _logger = logging.getLogger("Import Order Process:")
 utc = pytz.utc
@@ -70,6 +71,15 @@ class WooCommerceProductListing(models.Model):
     image_ids = fields.One2many('woocommerce.product.image', 'woocommerce_listing_id', 'Images')
     is_published = fields.Boolean(string="is_published", copy=False, default=True)
 
+    def init(self):
+        """
+        This method is used to index the WooCommerce product id with its instance, the listing of a product is
+        looked up by it on every product import and order line.
+        """
+        create_index(self._cr, 'woocommerce_product_listing_woocommerce_product_id_index', self._table,
+                     ['woocommerce_product_id', 'woocommerce_instance_id'],
+                     where='woocommerce_product_id IS NOT NULL')
+
     def action_product_publish(self):
         if not self.woocommerce_product_id:
             return
@@ -884,18 +894,9 @@ class WooCommerceProductListing(models.Model):
 
         product_listing_item_obj = self.env['woocommerce.product.listing.item']
 
-        # Call WooCommerce Variants API
-        if api_url:
-            variant_api_url = api_url
-        else:
-            variant_api_url = "{0}/wp-json/wc/v3/products/{1}/variations".format(
-                instance.woocommerce_url,
-                product_data.get('id')
-            )
-        params = "per_page=100"
-        response_status, response_data, next_page_link = instance.woocommerce_api_calling_process("GET",
-                                                                                                  variant_api_url,
-                                                                                                  False, params)
+        # Call WooCommerce Variants API (every page, shared with the other variation fetches of this import)
+        response_status, response_data = self.get_woocommerce_product_variations(instance, product_data.get('id'),
+                                                                                 api_url)
         if not response_status or not isinstance(response_data, list):
             return
         for wc_variant in response_data:
@@ -915,7 +916,7 @@ class WooCommerceProductListing(models.Model):
                     product_queue_line.state = 'failed'
                 continue
             listing_item = product_listing_item_obj.search([
-                ('woocommerce_product_variant_id', '=', wc_variant_id),
+                ('woocommerce_product_variant_id', '=', str(wc_variant_id)),
                 ('woocommerce_product_listing_id', '=', product_listing.id)
             ], limit=1)
 
@@ -932,10 +933,6 @@ class WooCommerceProductListing(models.Model):
                 listing_item.write(vals)
             else:
                 product_listing_item_obj.create(vals)
-        if next_page_link:
-            self.create_or_update_product_listing_items(
-                product_data, product_listing, instance, product_queue_line, log_id, api_url=next_page_link
-            )
         return response_status, response_data
 
     def sync_product_image_from_woocommerce(self, instance, product_listing, product_data):
@@ -944,57 +941,18 @@ class WooCommerceProductListing(models.Model):
         - Store in custom image model
         - Update product template and product.product images
         - Multiple images: first -> image_1920, rest -> product_template_image_ids / product_variant_image_ids
+        All images are downloaded concurrently first, the ORM updates then run sequentially.
         """
         woocommerce_image_model = self.env['woocommerce.product.image']
         listing_item_model = self.env['woocommerce.product.listing.item']
 
-        # ============ STEP 1: SYNC MAIN PRODUCT IMAGES ============
-        template_first_done = False
-        for image in product_data.get('images', []):
-            image_url = image.get('src')
-            if not image_url:
-                continue
-
-            wc_image_id = image.get('id')
-            try:
-                image_datas = base64.b64encode(
-                    requests.get(image_url, verify=False, timeout=30).content
-                )
-            except Exception:
-                continue
-
-            listing_image_id = woocommerce_image_model.search(
-                [('woocommerce_image_id', '=', wc_image_id)], limit=1
-            )
-            vals = {
-                'name': product_listing.name,
-                'woocommerce_image_id': wc_image_id,
-                'image': image_datas,
-                'woocommerce_listing_id': product_listing.id,
-                'listing_item_ids': [(6, 0, [])],  # template image, no variants
-            }
-
-            if listing_image_id:
-                listing_image_id.write(vals)
-            else:
-                woocommerce_image_model.create(vals)
-
-            # Update Odoo product.template
-            if not template_first_done:
-                product_listing.product_tmpl_id.image_1920 = image_datas
-                template_first_done = True
-            else:
-                product_listing.product_tmpl_id.product_template_image_ids = [(0, 0, {
-                    'name': image.get('name') or product_listing.name,
-                    'image_1920': image_datas,
-                })]
-
-        # ============ STEP 2: FETCH VARIANTS ============
+        # ============ STEP 1: FETCH VARIANTS ============
         variant_response_data = self.fetch_woocommerce_variants(
             instance, product_data, listing_item_model
         )
 
-        # ============ STEP 3: SYNC VARIANT IMAGES ============
+        # ============ STEP 2: COLLECT & DOWNLOAD IMAGES ============
+        variant_images_list = []
         for variant in variant_response_data:
             variant_id = variant.get('id')
 
@@ -1019,31 +977,67 @@ class WooCommerceProductListing(models.Model):
             # Find corresponding listing item (mapped to product.product)
             listing_item = listing_item_model.search([
                 ('woocommerce_instance_id', '=', instance.id),
-                ('woocommerce_product_variant_id', '=', variant_id)
+                ('woocommerce_product_variant_id', '=', str(variant_id))
             ], limit=1)
 
             if not listing_item or not listing_item.product_id:
                 continue
+            variant_images_list.append((listing_item, variant_images))
+
+        image_datas_by_url = self.download_woocommerce_images(
+            instance, [image for image in product_data.get('images', [])] + [
+                image for listing_item, variant_images in variant_images_list for image in variant_images])
 
+        # ============ STEP 3: SYNC MAIN PRODUCT IMAGES ============
+        template_first_done = False
+        for image in product_data.get('images', []):
+            image_url = image.get('src')
+            image_datas = image_datas_by_url.get(image_url)
+            if not image_datas:
+                continue
+
+            wc_image_id = image.get('id')
+            listing_image_id = woocommerce_image_model.search(
+                [('woocommerce_image_id', '=', str(wc_image_id))], limit=1
+            )
+            vals = {
+                'name': product_listing.name,
+                'woocommerce_image_id': wc_image_id,
+                'image': image_datas,
+                'woocommerce_listing_id': product_listing.id,
+                'listing_item_ids': [(6, 0, [])],  # template image, no variants
+            }
+
+            if listing_image_id:
+                listing_image_id.write(vals)
+            else:
+                woocommerce_image_model.create(vals)
+
+            # Update Odoo product.template
+            if not template_first_done:
+                product_listing.product_tmpl_id.image_1920 = image_datas
+                template_first_done = True
+            else:
+                product_listing.product_tmpl_id.product_template_image_ids = [(0, 0, {
+                    'name': image.get('name') or product_listing.name,
+                    'image_1920': image_datas,
+                })]
+
+        # ============ STEP 4: SYNC VARIANT IMAGES ============
+        for listing_item, variant_images in variant_images_list:
             product_variant = listing_item.product_id
             first_done = False
 
             for image in variant_images:
                 image_url = image.get('src')
-                if not image_url:
+                image_datas = image_datas_by_url.get(image_url)
+                if not image_datas:
                     continue
 
                 wc_image_id = image.get('id')
-                try:
-                    image_datas = base64.b64encode(
-                        requests.get(image_url, verify=False, timeout=30).content
-                    )
-                except Exception:
-                    continue
-
                 # Check if image already exists in our DB
                 listing_image_id = woocommerce_image_model.search(
-                    [('woocommerce_image_id', '=', wc_image_id)], limit=1
+                    [('woocommerce_image_id', '=', str(wc_image_id))], limit=1
                 )
 
                 vals = {
@@ -1070,10 +1064,33 @@ class WooCommerceProductListing(models.Model):
                         'image_1920': image_datas,
                     })]
 
+    def download_woocommerce_images(self, instance, images):
+        """
+        Download the given WooCommerce images concurrently.
+        :param images: list of WooCommerce image dicts (with a 'src' key)
+        :return: dict of image url -> base64 encoded image (failed downloads are left out)
+        """
+        image_urls = list(dict.fromkeys(image.get('src') for image in images if image.get('src')))
+        image_datas_by_url = {}
+        results = instance.woocommerce_api_fan_out([fan_out.media_spec(image_url) for image_url in image_urls])
+        for image_url, (response_status, response_data, next_page_link) in zip(image_urls, results):
+            if response_status:
+                image_datas_by_url[image_url] = base64.b64encode(response_data)
+            else:
+                _logger.info("Unable to download WooCommerce image %s: %s", image_url, response_data)
+        return image_datas_by_url
+
     def woocommerce_create_products(self, product_queue_line, instance, log_id, order_line_product_listing_id=False):
         """
         Main entry point to create/update WooCommerce products in Odoo.
+        The GET responses are memoized for the whole import, so the variations of a variable product are only
+        downloaded once for the SKU check, the listing items, the variants and the images.
         """
+        response_cache = self.env.context.get('woocommerce_response_cache')
+        if response_cache is None:
+            response_cache = {}
+            self = self.with_context(woocommerce_response_cache=response_cache)
+        instance = instance.with_context(woocommerce_response_cache=response_cache)
         # Step 1: Get Product Data
         product_data = self.get_woocommerce_product_data(instance, product_queue_line, order_line_product_listing_id)
         if not product_data:
@@ -1107,11 +1124,8 @@ class WooCommerceProductListing(models.Model):
         # ✅ For variable product: allow no parent SKU
         # ✅ But ensure at least ONE variant has SKU later (handled in listing items)
         if product_type == "variable":
-            # Check if ANY variant has SKU
-            variant_api_url = f"{instance.woocommerce_url}/wp-json/wc/v3/products/{product_data.get('id')}/variations"
-            response_status, variant_list, next_page_link = instance.woocommerce_api_calling_process(
-                "GET", variant_api_url, False, "per_page=100"
-            )
+            # Check if ANY variant has SKU (the full variations are fetched once and reused by the next steps)
+            response_status, variant_list = self.get_woocommerce_product_variations(instance, product_data.get('id'))
 
             # If API fails, fallback to skip
             if not response_status or not isinstance(variant_list, list):
@@ -1183,7 +1197,7 @@ class WooCommerceProductListing(models.Model):
                 response_status, response_data, next_page_link = instance.woocommerce_api_calling_process("GET",
                                                                                                           api_url)
                 return response_data if response_status else False
-            return eval(product_queue_line.product_data_to_process)
+            return product_queue_line.get_woocommerce_payload()
         except Exception as e:
             raise ValidationError(f"Failed to fetch WooCommerce product data: {e}")
 
@@ -1192,7 +1206,7 @@ class WooCommerceProductListing(models.Model):
         Create or update woocommerce product listing, and link the product template
         only if create_product_if_not_found is True or template already exists.
         """
-        listing = self.search([('woocommerce_product_id', '=', product_data.get("id"))], limit=1)
+        listing = self.search([('woocommerce_product_id', '=', str(product_data.get("id")))], limit=1)
 
         # ✅ Ensure queue line is valid
         if product_queue_line and not product_queue_line.exists():
@@ -1369,28 +1383,27 @@ class WooCommerceProductListing(models.Model):
 
         return attribute_value_map
 
+    def get_woocommerce_product_variations(self, instance, woocommerce_product_id, api_url=False):
+        """
+        This method is used to fetch every variation of a WooCommerce product. The remaining pages are requested
+        concurrently and the result is memoized when the context holds a ``woocommerce_response_cache``.
+        :return: (status, variations or error message)
+        """
+        variant_api_url = api_url or "{0}/wp-json/wc/v3/products/{1}/variations".format(instance.woocommerce_url,
+                                                                                         woocommerce_product_id)
+        return instance.woocommerce_fetch_all_pages(variant_api_url, params={'per_page': 100})
+
     def fetch_woocommerce_variants(self, instance, product_data, product_listing_item_obj):
         """
         Fetch all variants for a WooCommerce product via API.
         Returns a list of variant dicts.
         """
         product_variant_response_data = []
-        variant_api_url = "{0}/wp-json/wc/v3/products/{1}/variations".format(
-            instance.woocommerce_url,
-            product_data.get('id')
-        )
-
-        while variant_api_url:
-            params = "per_page=100"
-            response_status, response_data, next_page_link = instance.woocommerce_api_calling_process("GET",
-                                                                                                      variant_api_url,
-                                                                                                      False, params)
-            if not response_status or not response_data:
-                break
-            product_variant_response_data.extend(response_data)  # to avoid list of list we use extend not append
-            variant_api_url = next_page_link
-
-        _logger.info("Product Variant Response Data List ::: {}".format(product_variant_response_data))
+        response_status, response_data = self.get_woocommerce_product_variations(instance, product_data.get('id'))
+        if response_status:
+            product_variant_response_data = response_data
+        _logger.info("Fetched %s variants for WooCommerce product %s", len(product_variant_response_data),
+                     product_data.get('id'))
         return product_variant_response_data
 
     def process_woocommerce_variant(self, variation, product_template, product_listing, instance, log_id,
@@ -1482,7 +1495,7 @@ class WooCommerceProductListing(models.Model):
         if product_listing and variant:
             listing_item = product_listing_item_obj.search([
                 ('woocommerce_product_listing_id', '=', product_listing.id),
-                ('woocommerce_product_variant_id', '=', variant_id)
+                ('woocommerce_product_variant_id', '=', str(variant_id))
             ], limit=1)
 
             if listing_item:
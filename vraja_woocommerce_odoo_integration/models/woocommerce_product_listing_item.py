@@ -1,5 +1,6 @@
 import logging
 from odoo import models, fields
+from odoo.tools.sql import create_index
 import urllib.parse as urlparse
 
 _logger = logging.getLogger("Woocommerce Product: ")
@@ -13,10 +14,11 @@ class WoocommerceProductListingItem(models.Model):
 
     name = fields.Char("Title")
     woocommerce_instance_id = fields.Many2one('woocommerce.instance.integration', string='Instance', ondelete='cascade')
-    woocommerce_product_listing_id = fields.Many2one('woocommerce.product.listing', string="Product Listing")
+    woocommerce_product_listing_id = fields.Many2one('woocommerce.product.listing', string="Product Listing",
+                                                     index=True)
     product_id = fields.Many2one('product.product', string='Product')
     woocommerce_product_variant_id = fields.Char(string='Woocommerce Product ID')
-    product_sku = fields.Char(string='SKU')
+    product_sku = fields.Char(string='SKU', index=True)
     currency_id = fields.Many2one('res.currency', string='Currency',
                                   default=lambda self: self.env.company.currency_id)
     stock_type = fields.Selection([("fix", "Fix"), ("percentage", "Percentage")], string="Stock Type")
@@ -88,6 +90,15 @@ class WoocommerceProductListingItem(models.Model):
     #                 inventory_name=name_of_inventory).action_apply_inventory()
     #     return quant_list
     #
+    def init(self):
+        """
+        This method is used to index the WooCommerce variation id with its instance, listing items are looked up
+        by it on every product import and order line.
+        """
+        create_index(self._cr, 'woocommerce_product_listing_item_variant_id_index', self._table,
+                     ['woocommerce_product_variant_id', 'woocommerce_instance_id'],
+                     where='woocommerce_product_variant_id IS NOT NULL')
+
     def import_stock_from_shopify_to_odoo(self, instance, auto_validate_inventory_in_odoo):
         """
         This method is used to import product inventory/stock from shopify to Odoo.
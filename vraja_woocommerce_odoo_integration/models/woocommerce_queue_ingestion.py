@@ -0,0 +1,53 @@
+from odoo import models, api, tools
+
+QUEUE_BATCH_SIZE = 50
+
+
+class WooCommerceQueueIngestionMixin(models.AbstractModel):
+    _name = 'woocommerce.queue.ingestion.mixin'
+    _description = 'WooCommerce Queue Ingestion'
+
+    # XML id of the sequence naming the queues, queue line model and its many2one to the queue.
+    _woocommerce_queue_sequence = False
+    _woocommerce_queue_line_model = False
+    _woocommerce_queue_line_field = False
+
+    @api.model
+    def _next_woocommerce_queue_names(self, count):
+        sequence = self._woocommerce_queue_sequence and self.env.ref(self._woocommerce_queue_sequence,
+                                                                     raise_if_not_found=False)
+        if not sequence:
+            return ['/'] * count
+        return sequence.next_woocommerce_sequence_numbers(count)
+
+    @api.model
+    def create_woocommerce_queue_batches(self, instance, records, prepare_line_vals, batch_size=QUEUE_BATCH_SIZE):
+        """
+        This method is used to create one queue per batch of records, the lines of a batch being inserted by a
+        single create. When the records are a list every queue is created (and named) up front, a stream gets its
+        queues while it is consumed.
+        :param prepare_line_vals: function giving the queue line values of a record (without the queue), or
+                                  False to skip the record
+        @return : ids of the created queues
+        """
+        queue_line_object = self.env[self._woocommerce_queue_line_model]
+        batches = tools.split_every(batch_size, records)
+        queues = self.browse()
+        if isinstance(records, (list, tuple)):
+            batches = list(batches)
+            queues = self.create([{'instance_id': instance.id} for _ in batches])
+        queue_id_list = []
+        for index, batch in enumerate(batches):
+            queue = queues[index] if queues else self.create({'instance_id': instance.id})
+            vals_list = []
+            for record in batch:
+                vals = prepare_line_vals(record)
+                if vals:
+                    vals[self._woocommerce_queue_line_field] = queue.id
+                    vals_list.append(vals)
+            if not vals_list:
+                queue.unlink()
+                continue
+            queue_line_object.create(vals_list)
+            queue_id_list.append(queue.id)
+        return queue_id_list
@@ -0,0 +1,55 @@
+import logging
+
+from odoo import models, fields, api
+from ..tools import payload_codec
+
+_logger = logging.getLogger("WooCommerce Queue Payload")
+
+
+class WooCommerceQueuePayloadMixin(models.AbstractModel):
+    _name = 'woocommerce.queue.payload.mixin'
+    _description = 'WooCommerce Queue Payload'
+
+    # Name of the text field holding the (uncompressed) payload on the inheriting queue line model.
+    _woocommerce_payload_field = False
+
+    payload_encoding = fields.Selection(payload_codec.ENCODINGS, string="Data Encoding",
+                                        default=payload_codec.ENCODING_JSON, copy=False)
+    payload_compressed = fields.Binary(string="Compressed Data", attachment=False, copy=False)
+    payload_preview = fields.Text(string="Data", compute="_compute_payload_preview")
+
+    def _compute_payload_preview(self):
+        for line in self:
+            try:
+                line.payload_preview = payload_codec.pretty(line.get_woocommerce_payload())
+            except Exception as error:
+                _logger.info("Unable to decode the data of %s: %s", line, error)
+                line.payload_preview = line[self._woocommerce_payload_field] or False
+
+    @api.model
+    def prepare_woocommerce_payload_vals(self, data, instance=False):
+        """
+        This method is used to prepare the values storing the given dictionary on a queue line.
+        """
+        compress = bool(instance and instance.woocommerce_compress_queue_payloads)
+        encoding, text, compressed = payload_codec.encode(data, compress=compress)
+        return {
+            self._woocommerce_payload_field: text,
+            'payload_encoding': encoding,
+            'payload_compressed': compressed,
+        }
+
+    def get_woocommerce_payload(self):
+        """
+        This method is used to get the dictionary stored on the queue line.
+        """
+        self.ensure_one()
+        # With bin_size (form views) the binary field would be read as its size.
+        line = self.with_context(bin_size=False)
+        return payload_codec.decode(line.payload_encoding, line[self._woocommerce_payload_field],
+                                    line.payload_compressed)
+
+    def set_woocommerce_payload(self, data):
+        for line in self:
+            line.write(line.prepare_woocommerce_payload_vals(data, line.instance_id))
+        return True
@@ -25,7 +25,10 @@ class WoocommerceTaxes(models.Model):
             )
 
             api_url = f"{instance.woocommerce_url}/wp-json/wc/v3/taxes"
-            response_status, response_data, next_page_link = instance.woocommerce_api_calling_process("GET", api_url)
+            response_status, response_data, next_page_link, unchanged = instance.woocommerce_api_cached_get(
+                api_url, params={'per_page': 100})
+            if unchanged and self.env.context.get('woocommerce_skip_unchanged_reference_data'):
+                response_data = []
 
             if response_status:
                 for tax_response in response_data:
@@ -3,17 +3,20 @@ import re
 import requests
 
 from datetime import timedelta
-from odoo import models, fields, tools, api
-import pprint
+from odoo import models, fields, api
+from ..tools import circuit_breaker, pagination
 
 _logger = logging.getLogger("WooCommerce Product Queue")
 
 
 class WooCommerceProductDataQueue(models.Model):
     _name = "woocommerce.product.data.queue"
-    _inherit = ["mail.thread", "mail.activity.mixin"]
+    _inherit = ["mail.thread", "mail.activity.mixin", "woocommerce.queue.ingestion.mixin"]
     _description = "WooCommerece Product Data Queue"
     _order = 'id DESC'
+    _woocommerce_queue_sequence = 'vraja_woocommerce_odoo_integration.woocommerce_seq_product_queue'
+    _woocommerce_queue_line_model = 'woocommerce.product.data.queue.line'
+    _woocommerce_queue_line_field = 'woocommerce_product_queue_id'
 
     @api.depends('woocommerce_product_queue_line_ids.state')
     def _compute_product_queue_line_state_and_count(self):
@@ -50,13 +53,10 @@ class WooCommerceProductDataQueue(models.Model):
     @api.model_create_multi
     def create(self, vals_list):
         """
-        This method is used to add sequence number in new record.
+        This method is used to add sequence number in new record, the numbers of all the records are reserved at once.
         """
-        sequence = self.env.ref("vraja_woocommerce_odoo_integration.woocommerce_seq_product_queue")
-        for vals in vals_list:
-            name = sequence and sequence.next_by_id() or '/'
-            if type(vals) == dict:
-                vals.update({'name': name})
+        for vals, name in zip(vals_list, self._next_woocommerce_queue_names(len(vals_list))):
+            vals.update({'name': name})
         return super(WooCommerceProductDataQueue, self).create(vals_list)
 
     def unlink(self):
@@ -75,16 +75,10 @@ class WooCommerceProductDataQueue(models.Model):
         """
         Based on the batch size product queue will create.
         """
-        queue_id_list = []
-        batch_size = 50
-        for woocommerce_products in tools.split_every(batch_size, woocommerce_product_list):
-            queue_id = self.generate_woocommerce_product_queue(instance_id)
-            for product in woocommerce_products:
-                woocommerce_product_dict = product
-                self.env['woocommerce.product.data.queue.line'].create_woocommerce_product_queue_line(woocommerce_product_dict, instance_id,
-                                                                                      queue_id)
-            queue_id_list.append(queue_id.id)
-        return queue_id_list
+        queue_line_object = self.env['woocommerce.product.data.queue.line']
+        return self.create_woocommerce_queue_batches(
+            instance_id, woocommerce_product_list,
+            lambda product: queue_line_object.prepare_woocommerce_product_queue_line_vals(product, instance_id))
 
     def fetch_product_from_woocommerce_to_odoo(self,instance, from_date=False, to_date=False, woocommerce_product_ids=''):
         """
@@ -102,14 +96,15 @@ class WooCommerceProductDataQueue(models.Model):
                     _logger.info("Fetching products by IDs: %s", params["include"])
 
                 url = "{0}/wp-json/wc/v3/products/".format(instance.woocommerce_url)
-                response_status, response_data,next_page_link = instance.woocommerce_api_calling_process("GET", url, params=params)
+                response_status, response_data = instance.woocommerce_fetch_all_pages(
+                    url, params=params, stream=instance.woocommerce_stream_responses)
 
                 if not response_status:
                     _logger.error("Error while fetching products by ID from WooCommerce: %s", response_data)
                     return False
 
                 woocommerce_product_list = response_data
-                _logger.info("Fetched %s products from WooCommerce by IDs", len(woocommerce_product_list))
+                _logger.info("Fetching products from WooCommerce by IDs")
                 return woocommerce_product_list
             else:
                 if from_date:
@@ -118,14 +113,15 @@ class WooCommerceProductDataQueue(models.Model):
                     params["before"] = to_date.isoformat() if hasattr(to_date, "isoformat") else to_date
 
                 url = "{0}/wp-json/wc/v3/products/".format(instance.woocommerce_url)
-                response_status, response_data,next_page_link = instance.woocommerce_api_calling_process("GET", url, params=params)
+                response_status, response_data = instance.woocommerce_fetch_all_pages(
+                    url, params=params, stream=instance.woocommerce_stream_responses)
 
                 if not response_status:
                     _logger.error("Error while fetching products by date from WooCommerce: %s", response_data)
                     return False
 
                 woocommerce_product_list = response_data
-                _logger.info("Fetched %s products from WooCommerce by date range", len(woocommerce_product_list))
+                _logger.info("Fetching products from WooCommerce by date range")
 
         except Exception as error:
             _logger.exception("Exception while fetching products from WooCommerce: %s", error)
@@ -147,7 +143,14 @@ class WooCommerceProductDataQueue(models.Model):
             woocommerce_product_list = self.fetch_product_from_woocommerce_to_odoo(instance,from_date=from_date, to_date=to_date)
         if woocommerce_product_list:
             queue_id_list = self.create_woocommerce_product_queue_job(instance, woocommerce_product_list)
-            if queue_id_list:
+            if pagination.is_truncated(woocommerce_product_list):
+                # The products of the pages never received must stay in the next date window.
+                _logger.error("Product import of %s interrupted, the last synced date is not updated.",
+                              instance.name)
+                self.env['woocommerce.log'].generate_woocommerce_logs(
+                    'product', 'import', instance, "Product import interrupted after %s products: %s" % (
+                        woocommerce_product_list.count, woocommerce_product_list.error))
+            elif queue_id_list:
                 instance.woocommerce_last_product_synced_date = last_synced_date
         return queue_id_list
 
@@ -180,6 +183,11 @@ class WooCommerceProductDataQueue(models.Model):
 
             commit_counter = 0
             for line in product_data_queue_lines:
+                if instance_id.is_woocommerce_circuit_open():
+                    # The store is down: keep the remaining lines as they are for the next run.
+                    _logger.warning("WooCommerce store of %s is unavailable, product queue %s paused.",
+                                    instance_id.name, product_data_queue.name)
+                    break
                 commit_counter += 1
                 if commit_counter == 10:
                     self._cr.commit()
@@ -190,6 +198,9 @@ class WooCommerceProductDataQueue(models.Model):
                                                                                 log_id=log_id)
                     if not product_id:
                         line.number_of_fails += 1
+                except circuit_breaker.WooCommerceCircuitOpenError as error:
+                    _logger.warning(error)
+                    break
                 except Exception as error:
                     line.state = 'failed'
                     error_msg = 'Getting Some Error When Try To Process Product Queue From Woocommerce To Odoo'
@@ -213,7 +224,8 @@ class WooCommerceProductDataQueue(models.Model):
 class WoocommerceProductDataQueueLine(models.Model):
     _name = "woocommerce.product.data.queue.line"
     _description = "Product Data Queue Line"
-    _inherit = ["mail.thread", "mail.activity.mixin"]
+    _inherit = ["mail.thread", "mail.activity.mixin", "woocommerce.queue.payload.mixin"]
+    _woocommerce_payload_field = 'product_data_to_process'
 
     name = fields.Char(string='Name')
     woocommerce_product_queue_id = fields.Many2one('woocommerce.product.data.queue', string='Product Data Queue')
@@ -228,16 +240,25 @@ class WoocommerceProductDataQueueLine(models.Model):
                                      copy=False)
     log_line = fields.One2many('woocommerce.log.line', 'product_queue_line')
 
-    def create_woocommerce_product_queue_line(self, woocommerce_product_dict, instance_id, queue_id):
+    @api.model
+    def prepare_woocommerce_product_queue_line_vals(self, woocommerce_product_dict, instance_id, queue_id=False):
         """
-        From this method queue line will create.
+        From this method values of the queue line will prepare.
         """
-        product_queue_line_id = self.create({
+        vals = {
             'product_data_id': woocommerce_product_dict.get('id'),
             'state': 'draft',
             'name': woocommerce_product_dict.get('name', '').strip(),
-            'product_data_to_process': pprint.pformat(woocommerce_product_dict),
             'instance_id': instance_id and instance_id.id or False,
             'woocommerce_product_queue_id': queue_id and queue_id.id or False,
-        })
+        }
+        vals.update(self.prepare_woocommerce_payload_vals(woocommerce_product_dict, instance_id))
+        return vals
+
+    def create_woocommerce_product_queue_line(self, woocommerce_product_dict, instance_id, queue_id):
+        """
+        From this method queue line will create.
+        """
+        product_queue_line_id = self.create(
+            self.prepare_woocommerce_product_queue_line_vals(woocommerce_product_dict, instance_id, queue_id))
         return product_queue_line_id
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+from . import batch_writer
+from . import circuit_breaker
+from . import compression
+from . import metrics
+from . import payload_codec
+from . import rate_limiter
+from . import retry_policy
+from . import api_client
+from . import fan_out
+from . import json_stream
+from . import pagination
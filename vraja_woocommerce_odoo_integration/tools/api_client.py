@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP transport used by ``woocommerce.instance.integration`` to talk with the WooCommerce REST API.
+
+Nothing in this module touches the ORM, so it can safely be used from worker threads. Sessions are kept in a
+per-process registry: every Odoo worker keeps one keep-alive ``requests.Session`` per database and instance.
+"""
+import base64
+import logging
+import re
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import circuit_breaker, compression, metrics, rate_limiter, retry_policy
+
+_logger = logging.getLogger("WooCommerce API")
+
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 10
+MAX_THROTTLE_RETRIES = 5
+
+# Named ``_fields`` projections, so every call site asks WooCommerce only for the keys it really uses.
+FIELD_SETS = {
+    'order_status': ('id', 'number', 'status', 'date_modified_gmt'),
+    'variant_sku': ('id', 'sku'),
+    'tax_rate': ('id', 'name', 'rate'),
+}
+
+_ITEM_OR_BATCH_SUFFIX = re.compile(r'/(\d+|batch)$')
+
+_session_registry = {}
+_session_registry_lock = threading.Lock()
+
+
+def normalize_params(params):
+    """
+    Callers pass query parameters either as a dict or as a query string (``"per_page=100"``). Always return a new
+    dict so the parameters can be extended safely.
+    """
+    if not params:
+        return {}
+    if isinstance(params, (str, bytes)):
+        if isinstance(params, bytes):
+            params = params.decode("utf-8")
+        return dict(parse_qsl(params.lstrip('?'), keep_blank_values=True))
+    return dict(params)
+
+
+def apply_field_projection(params, field_set):
+    """
+    Return the normalized params extended with the ``_fields`` projection of ``field_set``. ``field_set`` is either the
+    name of one of the ``FIELD_SETS`` or an iterable of field names.
+    """
+    params = normalize_params(params)
+    if not field_set:
+        return params
+    if isinstance(field_set, str):
+        if field_set not in FIELD_SETS:
+            raise KeyError("Unknown WooCommerce field set %r" % field_set)
+        field_set = FIELD_SETS[field_set]
+    params['_fields'] = ",".join(field_set)
+    return params
+
+
+def request_cache_key(url, params=None):
+    """
+    Stable key of a request: the URL followed by its sorted query parameters.
+    """
+    params = normalize_params(params)
+    return "%s?%s" % (url, urlencode(sorted(params.items()))) if params else url
+
+
+def resource_path(url):
+    """
+    Path of the collection touched by a write: ``/wp-json/wc/v3/products/12/variations/34`` and
+    ``.../variations/batch`` both give ``/wp-json/wc/v3/products/12/variations``.
+    """
+    path = urlsplit(url or '').path.rstrip('/')
+    return _ITEM_OR_BATCH_SUFFIX.sub('', path)
+
+
+def build_authorization_header(consumer_key, consumer_secret):
+    """
+    Prepare the Basic authorization header value for the given consumer key and secret.
+    """
+    data = "%s:%s" % (consumer_key or '', consumer_secret or '')
+    return "Basic %s" % base64.b64encode(data.encode("utf-8")).decode("utf-8")
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    Adapter whose connections report their DNS and connect times to ``metrics``.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(TimedHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = metrics.TIMED_POOL_CLASSES
+
+
+def _create_session(authorization, pool_connections, pool_maxsize):
+    session = requests.Session()
+    adapter = TimedHTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    if authorization:
+        session.headers.update({"Authorization": authorization, "Content-Type": "application/json"})
+    session.verify = False
+    return session
+
+
+def get_session(key, fingerprint, authorization, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                pool_maxsize=DEFAULT_POOL_MAXSIZE):
+    """
+    Return the pooled session registered for ``key``. When the fingerprint (url, credentials, pool sizes) does
+    not match the registered one, the old session is closed and a new one is created.
+    """
+    with _session_registry_lock:
+        registered = _session_registry.get(key)
+        if registered and registered[0] == fingerprint:
+            return registered[1]
+        if registered:
+            _logger.info("WooCommerce connection settings changed for %s, recycling HTTP session.", key)
+            registered[1].close()
+        session = _create_session(authorization, pool_connections, pool_maxsize)
+        _session_registry[key] = (fingerprint, session)
+        return session
+
+
+def close_session(key):
+    """
+    Close and forget the session registered for ``key`` (if any).
+    """
+    with _session_registry_lock:
+        registered = _session_registry.pop(key, None)
+    if registered:
+        registered[1].close()
+    return bool(registered)
+
+
+class WooCommerceApiClient(object):
+    """
+    Lightweight, ORM free client built from an instance record. It only stores plain values so that it can be
+    shared with worker threads.
+    """
+
+    def __init__(self, key, base_url, consumer_key, consumer_secret, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, rate_limit=rate_limiter.DEFAULT_RATE,
+                 rate_limit_burst=rate_limiter.DEFAULT_BURST, max_retries=retry_policy.DEFAULT_MAX_RETRIES,
+                 timeout=retry_policy.DEFAULT_TIMEOUT, compress_responses=True, compress_requests=False,
+                 failure_threshold=circuit_breaker.DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=circuit_breaker.DEFAULT_RESET_TIMEOUT):
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.compress_responses = compress_responses
+        self.compress_requests = compress_requests
+        self.max_retries = max(max_retries or 0, 0)
+        self.timeout = (retry_policy.CONNECT_TIMEOUT, timeout or retry_policy.DEFAULT_TIMEOUT)
+        self.rate_limit = rate_limit
+        self.rate_limit_burst = rate_limit_burst
+        self.base_url = base_url
+        self.pool_connections = pool_connections or DEFAULT_POOL_CONNECTIONS
+        self.pool_maxsize = pool_maxsize or DEFAULT_POOL_MAXSIZE
+        self.authorization = build_authorization_header(consumer_key, consumer_secret)
+        self.fingerprint = (base_url, self.authorization, self.pool_connections, self.pool_maxsize)
+
+    @property
+    def session(self):
+        return get_session(self.key, self.fingerprint, self.authorization, self.pool_connections,
+                           self.pool_maxsize)
+
+    @property
+    def media_session(self):
+        """
+        Session without credentials, used to download product images which may be served by another host.
+        """
+        return get_session((self.key, 'media'), (self.pool_connections, self.pool_maxsize), None,
+                           self.pool_connections, self.pool_maxsize)
+
+    @property
+    def bucket(self):
+        return rate_limiter.get_bucket(self.key, self.rate_limit, self.rate_limit_burst)
+
+    @property
+    def breaker(self):
+        return circuit_breaker.get_breaker(self.key, self.failure_threshold, self.reset_timeout)
+
+    def close(self):
+        close_session((self.key, 'media'))
+        return close_session(self.key)
+
+    def send_media(self, url):
+        """
+        Download a media file (product image). The API credentials are never sent and the API rate limiter is not
+        used, media files are static files served by the web server.
+        """
+        timing = metrics.start_timing()
+        timing.add_attempt()
+        try:
+            response = self.media_session.get(url, timeout=self.timeout)
+        except requests.RequestException:
+            metrics.record_request(self.key, "GET", metrics.MEDIA_ENDPOINT, timing.finish())
+            raise
+        bytes_received = compression.wire_size(response)
+        compression.record_transfer(self.key, bytes_received=bytes_received,
+                                    bytes_received_uncompressed=len(response.content or b''))
+        metrics.record_request(self.key, "GET", metrics.MEDIA_ENDPOINT, timing.finish(response),
+                               response.status_code, bytes_received=bytes_received)
+        return response
+
+    def send(self, method, url, data=None, params=None, **kwargs):
+        """
+        Send a request through the pooled keep-alive session and return the raw ``requests.Response``.
+        Responses are negotiated compressed, batch bodies are gzip encoded when enabled and the transferred bytes
+        are added to the worker counters (streamed responses are counted by ``record_streamed_response``).
+        Timings, status, sizes and attempts are aggregated per endpoint by ``metrics``.
+        While the circuit breaker of the instance is open ``WooCommerceCircuitOpenError`` is raised right away.
+        """
+        breaker = self.breaker
+        breaker.before_request()
+        timing = metrics.start_timing()
+        endpoint = metrics.endpoint_template(url)
+        try:
+            response, body = self._send_encoded(method, url, data, params, **kwargs)
+        except requests.RequestException as error:
+            breaker.record_failure(error)
+            metrics.record_request(self.key, method, endpoint, timing.finish(),
+                                   bytes_sent=compression.body_size(data))
+            raise
+        except Exception:
+            # Not a store failure, but a half-open probe must not stay in flight forever.
+            breaker.release_probe()
+            raise
+        if circuit_breaker.is_failure_status(response.status_code):
+            breaker.record_failure("HTTP %s on %s %s" % (response.status_code, method, endpoint))
+        else:
+            breaker.record_success()
+        bytes_sent, bytes_received = self._record_transfer(response, body, data, kwargs.get('stream'))
+        metrics.record_request(self.key, method, endpoint, timing.finish(response), response.status_code,
+                               bytes_sent, bytes_received)
+        _logger.debug("WooCommerce %s %s -> HTTP %s in %.3fs (dns %.3fs, connect %.3fs, ttfb %.3fs, %s attempt(s))",
+                      method, endpoint, response.status_code, timing.total, timing.dns, timing.connect, timing.ttfb,
+                      timing.attempts)
+        return response
+
+    def _send_encoded(self, method, url, data=None, params=None, **kwargs):
+        """
+        :return: (response, body actually sent)
+        """
+        headers = dict(kwargs.pop('headers', None) or {})
+        headers.setdefault('Accept-Encoding', compression.ACCEPT_ENCODING if self.compress_responses
+                           else compression.IDENTITY_ENCODING)
+        if self.compress_requests and compression.is_compressible_request(self.key, method, url, data):
+            body = compression.gzip_body(data)
+            response = self._send_with_retry(method, url, body, params, payload=data,
+                                             headers=dict(headers, **{'Content-Encoding': 'gzip'}), **kwargs)
+            if not compression.is_compressed_body_rejected(response):
+                return response, body
+            _logger.warning("WooCommerce store %s does not accept compressed request bodies (HTTP %s), sending "
+                            "plain JSON from now on.", self.base_url, response.status_code)
+            compression.mark_body_compression_unsupported(self.key)
+            response.close()
+        response = self._send_with_retry(method, url, data, params, headers=headers, **kwargs)
+        return response, data
+
+    def _record_transfer(self, response, body, payload, stream):
+        """
+        :return: (bytes sent, bytes received)
+        """
+        bytes_sent = compression.body_size(body)
+        if stream:
+            compression.record_transfer(self.key, bytes_sent=bytes_sent,
+                                        bytes_sent_uncompressed=compression.body_size(payload))
+            return bytes_sent, 0
+        bytes_received = compression.wire_size(response)
+        compression.record_transfer(self.key, bytes_sent=bytes_sent,
+                                    bytes_sent_uncompressed=compression.body_size(payload),
+                                    bytes_received=bytes_received,
+                                    bytes_received_uncompressed=len(response.content or b''))
+        return bytes_sent, bytes_received
+
+    def record_streamed_response(self, response, decoded_size):
+        bytes_received = compression.wire_size(response)
+        compression.record_transfer(self.key, bytes_received=bytes_received,
+                                    bytes_received_uncompressed=decoded_size, request_count=0)
+        if response.request is not None:
+            metrics.add_received_bytes(self.key, response.request.method,
+                                       metrics.endpoint_template(response.request.url), bytes_received)
+
+    def _send_with_retry(self, method, url, data=None, params=None, payload=None, **kwargs):
+        """
+        Transient failures are replayed with exponential backoff when ``retry_policy`` allows it. The last error is
+        raised (or the last response returned) once the retries are exhausted. ``payload`` is the uncompressed
+        body, used to classify the request.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        classification = retry_policy.classify_request(method, url, data if payload is None else payload)
+        attempt = 0
+        total_backoff = 0.0
+        while True:
+            attempt += 1
+            try:
+                response = self._send_throttled(method, url, data=data, params=params, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if attempt > self.max_retries or not retry_policy.should_retry_error(classification, error):
+                    _logger.error("WooCommerce request %s %s failed after %s attempt(s) and %.1fs backoff: %s",
+                                  method, url, attempt, total_backoff, error)
+                    raise
+                reason = error
+            else:
+                if attempt > self.max_retries or not retry_policy.should_retry_status(classification,
+                                                                                      response.status_code):
+                    if attempt > 1:
+                        _logger.info("WooCommerce request %s %s finished with HTTP %s after %s attempts and %.1fs "
+                                     "backoff.", method, url, response.status_code, attempt, total_backoff)
+                    return response
+                reason = "HTTP %s" % response.status_code
+                response.close()
+            delay = retry_policy.backoff_delay(attempt)
+            total_backoff += delay
+            _logger.warning("WooCommerce request %s %s failed (%s), retrying in %.1fs (attempt %s/%s).", method, url,
+                            reason, delay, attempt, self.max_retries)
+            time.sleep(delay)
+
+    def _send_throttled(self, method, url, data=None, params=None, **kwargs):
+        """
+        Every request takes a token from the instance rate limiter. Throttled responses (429/503) slow the
+        limiter down and are replayed after the ``Retry-After`` delay.
+        """
+        bucket = self.bucket
+        timing = metrics.current_timing()
+        throttled = 0
+        while True:
+            wait = bucket.acquire()
+            if timing is not None:
+                timing.add_attempt(wait)
+            started = time.monotonic()
+            response = self.session.request(method=method, url=url, data=data, params=params, **kwargs)
+            retry_after = rate_limiter.parse_retry_after(response.headers.get('Retry-After'))
+            pause = bucket.feedback(response.status_code, time.monotonic() - started, retry_after)
+            if response.status_code not in rate_limiter.THROTTLE_STATUS_CODES or throttled >= MAX_THROTTLE_RETRIES:
+                return response
+            throttled += 1
+            _logger.warning("WooCommerce throttled %s %s (HTTP %s), replaying in %.1fs (attempt %s/%s), "
+                            "rate lowered to %.2f req/s.", method, url, response.status_code, pause, throttled,
+                            MAX_THROTTLE_RETRIES, bucket.rate)
+            response.close()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Batched writes to the WooCommerce ``/batch`` endpoints.
+
+``WooCommerceBatchWriter`` collects create / update / delete operations per batch endpoint (products, variations of
+one parent, categories, tags, customers, orders...). ``build_requests`` splits them into bodies of at most
+``batch_size`` objects, the WooCommerce server limit being 100 per request. ``map_results`` maps every item of the
+answers back to the reference given when the operation was added (usually an Odoo record), so callers never deal
+with chunk offsets.
+
+The writer does not send anything itself: ``woocommerce.instance.integration.woocommerce_batch_write`` sends the
+bodies (concurrently when allowed) through the instance client.
+"""
+import json
+from collections import namedtuple
+
+BATCH_LIMIT = 100
+BATCH_OPERATIONS = ('create', 'update', 'delete')
+
+BatchRequest = namedtuple('BatchRequest', ['url', 'body', 'items'])
+BatchItemResult = namedtuple('BatchItemResult', ['ref', 'operation', 'payload', 'success', 'data', 'error'])
+
+
+def batch_url(base_url, resource):
+    """
+    ``batch_url("https://shop", "products/12/variations")`` -> ``https://shop/wp-json/wc/v3/products/12/variations/batch``
+    """
+    return "%s/wp-json/wc/v3/%s/batch" % (base_url.rstrip('/'), resource.strip('/'))
+
+
+def _item_error(item):
+    error = item.get('error') if isinstance(item, dict) else None
+    if not error:
+        return None
+    if isinstance(error, dict):
+        return error.get('message') or error.get('code') or json.dumps(error)
+    return str(error)
+
+
+class WooCommerceBatchWriter(object):
+
+    def __init__(self, batch_size=BATCH_LIMIT):
+        self.batch_size = max(1, min(batch_size or BATCH_LIMIT, BATCH_LIMIT))
+        # {url: [(operation, payload, ref)]} in insertion order
+        self._operations = {}
+
+    def __len__(self):
+        return sum(len(operations) for operations in self._operations.values())
+
+    def add(self, url, operation, payload, ref=None):
+        if operation not in BATCH_OPERATIONS:
+            raise ValueError("Unknown WooCommerce batch operation %r" % operation)
+        self._operations.setdefault(url, []).append((operation, payload, ref))
+        return self
+
+    def create(self, url, values, ref=None):
+        return self.add(url, 'create', values, ref)
+
+    def update(self, url, values, ref=None):
+        return self.add(url, 'update', values, ref)
+
+    def delete(self, url, woocommerce_id, ref=None):
+        return self.add(url, 'delete', woocommerce_id, ref)
+
+    def build_requests(self):
+        """
+        Split the collected operations into ``BatchRequest`` of at most ``batch_size`` objects. ``items`` keeps, per
+        operation, the (payload, ref) pairs in the order of the body, which is also the order of the answer.
+        """
+        requests = []
+        for url, operations in self._operations.items():
+            for start in range(0, len(operations), self.batch_size):
+                body, items = {}, {}
+                for operation, payload, ref in operations[start:start + self.batch_size]:
+                    body.setdefault(operation, []).append(payload)
+                    items.setdefault(operation, []).append((payload, ref))
+                requests.append(BatchRequest(url, body, items))
+        return requests
+
+    def clear(self):
+        self._operations = {}
+
+    @staticmethod
+    def map_results(requests, responses):
+        """
+        :param requests: the ``BatchRequest`` list returned by ``build_requests``
+        :param responses: one (status, data) or (status, data, next_page_link) per request
+        :return: one ``BatchItemResult`` per operation
+        """
+        results = []
+        for request, response in zip(requests, responses):
+            status, data = response[0], response[1]
+            for operation, items in request.items.items():
+                answers = data.get(operation) if status and isinstance(data, dict) else None
+                for index, (payload, ref) in enumerate(items):
+                    if not isinstance(answers, list):
+                        error = data if not status else "WooCommerce did not answer the %s operation." % operation
+                        results.append(BatchItemResult(ref, operation, payload, False, None, str(error)))
+                        continue
+                    answer = answers[index] if index < len(answers) else None
+                    error = _item_error(answer) if answer is not None else "Missing item in WooCommerce answer."
+                    results.append(BatchItemResult(ref, operation, payload, not error, answer, error))
+        return results
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Per-instance circuit breaker.
+
+After ``failure_threshold`` consecutive failures (connection errors, timeouts, HTTP 5xx) the circuit opens and every
+request is refused immediately with ``WooCommerceCircuitOpenError`` until ``reset_timeout`` seconds have passed.
+One probe request is then let through (half-open): a success closes the circuit, a failure opens it again.
+
+The state kept here is the view of the current worker; ``woocommerce.circuit.breaker`` shares it between workers.
+Times are wall clock timestamps so they can be compared across processes.
+"""
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 300
+FAILURE_STATUS_CODES = (500, 502, 503, 504)
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+class WooCommerceCircuitOpenError(Exception):
+
+    def __init__(self, key, retry_at):
+        super(WooCommerceCircuitOpenError, self).__init__(
+            "WooCommerce store of instance %s is unavailable, requests are suspended until %s." % (
+                key[1] if isinstance(key, tuple) else key,
+                time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime(retry_at))))
+        self.key = key
+        self.retry_at = retry_at
+
+
+def is_failure_status(status_code):
+    return status_code in FAILURE_STATUS_CODES
+
+
+class CircuitBreaker(object):
+
+    def __init__(self, key, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_until = 0.0
+        self.last_error = ''
+        self.probe_in_flight = False
+        # True when the state changed locally and was not shared with the other workers yet.
+        self.dirty = False
+        self.loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, failure_threshold, reset_timeout):
+        with self._lock:
+            self.failure_threshold = max(failure_threshold or DEFAULT_FAILURE_THRESHOLD, 1)
+            self.reset_timeout = max(reset_timeout or DEFAULT_RESET_TIMEOUT, 1)
+
+    def is_open(self):
+        with self._lock:
+            return self.state == OPEN and time.time() < self.opened_until
+
+    def is_recovering(self):
+        """
+        True while the next request would be (or is) the single half-open probe.
+        """
+        with self._lock:
+            return self.state != CLOSED and not (self.state == OPEN and time.time() < self.opened_until)
+
+    def before_request(self):
+        """
+        Raise ``WooCommerceCircuitOpenError`` when the request must not be sent.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and time.time() < self.opened_until:
+                raise WooCommerceCircuitOpenError(self.key, self.opened_until)
+            if self.state == HALF_OPEN and self.probe_in_flight:
+                raise WooCommerceCircuitOpenError(self.key, time.time() + 1)
+            # Reset timeout elapsed: let a single probe request through.
+            self.state = HALF_OPEN
+            self.probe_in_flight = True
+            self.dirty = True
+
+    def record_success(self):
+        with self._lock:
+            self.probe_in_flight = False
+            if self.state == CLOSED and not self.failures:
+                return
+            self.dirty = self.dirty or self.state != CLOSED
+            self.state = CLOSED
+            self.failures = 0
+            self.opened_until = 0.0
+
+    def record_failure(self, error):
+        with self._lock:
+            self.probe_in_flight = False
+            self.failures += 1
+            self.last_error = str(error)[:500]
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_until = time.time() + self.reset_timeout
+                self.dirty = True
+
+    def release_probe(self):
+        """
+        The request let through failed before the store answered for a local reason (encoding, invalid URL...):
+        it tells nothing about the store, the next request is the probe instead.
+        """
+        with self._lock:
+            self.probe_in_flight = False
+
+    def load(self, state, failures, opened_until, last_error=''):
+        """
+        Take over the state shared by the other workers (ignored while a local change is pending).
+        """
+        with self._lock:
+            self.loaded_at = time.monotonic()
+            if self.dirty or self.probe_in_flight:
+                return
+            self.state = state or CLOSED
+            self.failures = failures or 0
+            self.opened_until = opened_until or 0.0
+            self.last_error = last_error or ''
+
+    def pop_change(self):
+        """
+        :return: the state to share (state, failures, opened_until, last_error) or None when nothing changed.
+        """
+        with self._lock:
+            if not self.dirty:
+                return None
+            self.dirty = False
+            return self.state, self.failures, self.opened_until, self.last_error
+
+    def load_due(self, interval):
+        return time.monotonic() - self.loaded_at >= interval
+
+
+def get_breaker(key, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker(key, failure_threshold, reset_timeout)
+    breaker.configure(failure_threshold, reset_timeout)
+    return breaker
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Compressed transport helpers and per-worker byte counters.
+
+Responses are negotiated with an explicit ``Accept-Encoding`` (brotli is only offered when a brotli decoder is
+installed, urllib3 decodes it transparently then). Batch request bodies can be sent gzip encoded; stores which do
+not accept them are remembered for the lifetime of the worker and get plain bodies again.
+"""
+import gzip
+import threading
+
+try:
+    import brotli  # noqa: F401
+    BROTLI_AVAILABLE = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        BROTLI_AVAILABLE = True
+    except ImportError:
+        BROTLI_AVAILABLE = False
+
+ACCEPT_ENCODING = "br, gzip, deflate" if BROTLI_AVAILABLE else "gzip, deflate"
+IDENTITY_ENCODING = "identity"
+MIN_COMPRESSED_BODY_SIZE = 1024
+
+_unsupported_body_compression = set()
+_transfer_counters = {}
+_transfer_counters_lock = threading.Lock()
+
+COUNTER_NAMES = ('requests', 'bytes_sent', 'bytes_sent_uncompressed', 'bytes_received',
+                 'bytes_received_uncompressed')
+
+
+def is_compressible_request(key, method, url, data):
+    """
+    Only batch writes are compressed: they are the large request bodies of the integration.
+    """
+    return bool(data and method in ('POST', 'PUT') and key not in _unsupported_body_compression
+                and (url or '').split('?', 1)[0].rstrip('/').endswith('/batch')
+                and len(data) >= MIN_COMPRESSED_BODY_SIZE)
+
+
+def gzip_body(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return gzip.compress(data, compresslevel=6)
+
+
+def mark_body_compression_unsupported(key):
+    _unsupported_body_compression.add(key)
+
+
+def body_size(data):
+    if not data:
+        return 0
+    if isinstance(data, str):
+        return len(data.encode("utf-8"))
+    if isinstance(data, bytes):
+        return len(data)
+    return 0
+
+
+def wire_size(response):
+    """
+    Number of bytes read from the socket for ``response`` (the compressed size when the body was encoded).
+    """
+    raw = getattr(response, 'raw', None)
+    try:
+        return int(raw.tell())
+    except (AttributeError, TypeError, ValueError):
+        pass
+    try:
+        return len(response.content or b'')
+    except RuntimeError:
+        # The streamed body was already consumed.
+        return 0
+
+
+def is_compressed_body_rejected(response):
+    """
+    WordPress answers 415, or 400 ``rest_invalid_json``, when it cannot read a gzip encoded body.
+    """
+    if response.status_code == 415:
+        return True
+    return response.status_code == 400 and 'rest_invalid_json' in (response.text or '')
+
+
+def record_transfer(key, bytes_sent=0, bytes_sent_uncompressed=0, bytes_received=0, bytes_received_uncompressed=0,
+                    request_count=1):
+    with _transfer_counters_lock:
+        counters = _transfer_counters.setdefault(key, dict.fromkeys(COUNTER_NAMES, 0))
+        counters['requests'] += request_count
+        counters['bytes_sent'] += bytes_sent
+        counters['bytes_sent_uncompressed'] += bytes_sent_uncompressed
+        counters['bytes_received'] += bytes_received
+        counters['bytes_received_uncompressed'] += bytes_received_uncompressed
+
+
+def get_transfer_counters(key):
+    """
+    Counters of this worker process for ``key`` since it was started.
+    """
+    with _transfer_counters_lock:
+        return dict(_transfer_counters.get(key) or dict.fromkeys(COUNTER_NAMES, 0))
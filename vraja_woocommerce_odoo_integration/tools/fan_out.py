@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Fan-out of independent requests (variation pages, image downloads, per-ID fetches) on a bounded thread pool.
+
+Worker threads only use the ORM free client, which applies the instance rate limiter, retry policy and connection
+pool. The results are returned in the order of the request specs, so the calling ORM code stays sequential.
+"""
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from . import circuit_breaker
+
+_logger = logging.getLogger("WooCommerce API")
+
+DEFAULT_FAN_OUT_WORKERS = 4
+
+# ``media`` specs download a file (its bytes are returned) instead of calling the REST API.
+RequestSpec = namedtuple('RequestSpec', ['method', 'url', 'params', 'data', 'media'])
+RequestSpec.__new__.__defaults__ = (None, None, False)
+
+
+def media_spec(url):
+    return RequestSpec('GET', url, media=True)
+
+
+def _run_spec(client, spec):
+    """
+    Execute one spec and return ``(status, data, next_page_link)`` like ``woocommerce_api_calling_process``.
+    """
+    try:
+        if spec.media:
+            response = client.send_media(spec.url)
+            if response.status_code != 200:
+                return False, "HTTP %s" % response.status_code, False
+            return True, response.content, False
+        response = client.send(spec.method, spec.url, data=spec.data, params=spec.params)
+        next_page_link = response.links and response.links.get('next', {}).get('url')
+        if response.status_code in (200, 201):
+            return True, response.json(), next_page_link
+        return False, response.text, next_page_link
+    except (OSError, ValueError) as error:
+        _logger.warning("WooCommerce fan-out request %s %s failed: %s", spec.method, spec.url, error)
+        return False, str(error), False
+    except circuit_breaker.WooCommerceCircuitOpenError as error:
+        # Refused by the breaker (open, or half-open with its probe in flight): a failed result like the others.
+        _logger.warning("WooCommerce fan-out request %s %s not sent: %s", spec.method, spec.url, error)
+        return False, str(error), False
+
+
+def fan_out(client, specs, max_workers=DEFAULT_FAN_OUT_WORKERS):
+    """
+    Run ``specs`` concurrently and return their results in the same order.
+    """
+    specs = [spec if isinstance(spec, RequestSpec) else RequestSpec(*spec) for spec in specs]
+    if not specs:
+        return []
+    workers = max(1, min(max_workers or DEFAULT_FAN_OUT_WORKERS, client.pool_maxsize, len(specs)))
+    breaker = getattr(client, 'breaker', None)
+    if breaker is not None and breaker.is_recovering():
+        # Only one probe gets through a half-open breaker: run sequentially so the probe decides for the others.
+        workers = 1
+    if workers == 1:
+        return [_run_spec(client, spec) for spec in specs]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="woocommerce_fan_out") as executor:
+        return list(executor.map(lambda spec: _run_spec(client, spec), specs))
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental decoding of JSON arrays.
+
+WooCommerce list endpoints answer with one JSON array per page. ``iter_json_array`` decodes the body chunk by chunk
+and yields the elements one at a time, so only the element being decoded has to be kept in memory instead of the
+raw page plus its fully decoded copy.
+"""
+import codecs
+import json
+
+_WHITESPACE = ' \t\n\r'
+
+
+def _skip_whitespace(buffer, position):
+    length = len(buffer)
+    while position < length and buffer[position] in _WHITESPACE:
+        position += 1
+    return position
+
+
+def iter_json_array(chunks, encoding='utf-8'):
+    """
+    Yield the elements of the JSON array spread over ``chunks`` (an iterable of bytes). When the document is not an
+    array (an error payload, a single object...) it is decoded as a whole and yielded as is.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder(encoding)()
+    buffer, position = '', 0
+    is_array = None
+    # Inside the array: 'first' right after '[', 'element' after a ',', 'separator' after an element.
+    expected = 'first'
+    for chunk in _with_end_marker(chunks):
+        final = chunk is None
+        buffer = buffer[position:] + text_decoder.decode(chunk or b'', final=final)
+        position = 0
+        if is_array is None:
+            position = _skip_whitespace(buffer, position)
+            if position == len(buffer):
+                continue
+            is_array = buffer[position] == '['
+            if is_array:
+                position += 1
+        if not is_array:
+            if final:
+                yield json.loads(buffer)
+            continue
+        while True:
+            position = _skip_whitespace(buffer, position)
+            if position == len(buffer):
+                break
+            char = buffer[position]
+            if expected == 'separator':
+                if char == ',':
+                    expected = 'element'
+                    position += 1
+                    continue
+                if char == ']':
+                    return
+                raise ValueError("Invalid JSON array in WooCommerce response: ',' or ']' expected at %r" % char)
+            if char == ']' and expected == 'first':
+                return
+            if char in ',]':
+                raise ValueError("Invalid JSON array in WooCommerce response: element expected at %r" % char)
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if final:
+                    raise
+                # Incomplete element, wait for the next chunk.
+                break
+            if not isinstance(element, (dict, list, str)):
+                # A number or a literal is only complete once it is followed by a separator.
+                next_position = _skip_whitespace(buffer, end)
+                if next_position == len(buffer) or buffer[next_position] not in ',]':
+                    if final:
+                        raise ValueError("Invalid JSON array in WooCommerce response")
+                    break
+            yield element
+            position = end
+            expected = 'separator'
+    if is_array:
+        raise ValueError("Truncated JSON array in WooCommerce response")
+
+
+def _with_end_marker(chunks):
+    for chunk in chunks:
+        if chunk:
+            yield chunk
+    yield None
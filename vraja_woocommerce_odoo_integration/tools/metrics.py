@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+Per-request timing of the WooCommerce API calls and their per-worker aggregation.
+
+Every request sent through ``WooCommerceApiClient`` is measured (DNS, connect, time to first byte, total, rate limiter
+wait), together with its status, the transferred bytes and the number of attempts. The measures are aggregated in
+memory per instance, method, endpoint template and hour; ``woocommerce.api.metrics`` regularly drains them into the
+database.
+"""
+import bisect
+import re
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Upper bounds (milliseconds) of the latency histogram buckets, the last bucket is unbounded.
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+FLUSH_INTERVAL_SECONDS = 60
+API_PATH_PREFIX = '/wp-json/wc/v3'
+MEDIA_ENDPOINT = '/media'
+
+_ID_SEGMENT = re.compile(r'^\d+$')
+_local = threading.local()
+_aggregates = {}
+_aggregates_lock = threading.Lock()
+_last_flush = {}
+
+
+class RequestTiming(object):
+    """
+    Timings of one logical request (all its attempts), filled by the connection classes and the client.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.dns = 0.0
+        self.connect = 0.0
+        self.ttfb = 0.0
+        self.total = 0.0
+        self.throttle_wait = 0.0
+        self.attempts = 0
+
+    def add_attempt(self, wait=0.0):
+        self.attempts += 1
+        self.throttle_wait += wait or 0.0
+
+    def finish(self, response=None):
+        self.total = time.monotonic() - self.started
+        elapsed = getattr(response, 'elapsed', None)
+        if elapsed is not None:
+            self.ttfb = elapsed.total_seconds()
+        return self
+
+
+def start_timing():
+    """
+    Start measuring a request sent from the current thread.
+    """
+    _local.timing = RequestTiming()
+    return _local.timing
+
+
+def current_timing():
+    return getattr(_local, 'timing', None)
+
+
+def _record_connection_time(dns, connect):
+    timing = current_timing()
+    if timing is not None:
+        timing.dns += dns
+        timing.connect += connect
+
+
+class _TimedConnectionMixin(object):
+    """
+    Resolve the host name separately so that DNS and TCP/TLS connect times can be told apart.
+    """
+
+    def connect(self):
+        started = time.monotonic()
+        self._woocommerce_dns_time = 0.0
+        super(_TimedConnectionMixin, self).connect()
+        dns = self._woocommerce_dns_time
+        _record_connection_time(dns, time.monotonic() - started - dns)
+
+    def _new_conn(self):
+        dns_host = self._dns_host
+        started = time.monotonic()
+        try:
+            address = socket.getaddrinfo(dns_host, self.port, 0, socket.SOCK_STREAM)[0][4][0]
+        except (OSError, IndexError):
+            # Let urllib3 report the resolution error the usual way.
+            return super(_TimedConnectionMixin, self)._new_conn()
+        self._woocommerce_dns_time = time.monotonic() - started
+        # The certificate is still checked against ``self.host``, only the socket uses the resolved address.
+        self._dns_host = address
+        try:
+            return super(_TimedConnectionMixin, self)._new_conn()
+        except OSError:
+            self._dns_host = dns_host
+            return super(_TimedConnectionMixin, self)._new_conn()
+        finally:
+            self._dns_host = dns_host
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+TIMED_POOL_CLASSES = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+
+def endpoint_template(url):
+    """
+    ``https://shop/wp-json/wc/v3/products/12/variations?page=2`` -> ``/products/{id}/variations``
+    """
+    path = urlsplit(url or '').path
+    if API_PATH_PREFIX in path:
+        path = path.split(API_PATH_PREFIX, 1)[1]
+    segments = ['{id}' if _ID_SEGMENT.match(segment) else segment for segment in path.strip('/').split('/')
+                if segment]
+    return '/' + '/'.join(segments)
+
+
+def _new_aggregate():
+    return {
+        'requests': 0, 'errors': 0, 'retries': 0, 'bytes_sent': 0, 'bytes_received': 0, 'dns': 0.0, 'connect': 0.0,
+        'ttfb': 0.0, 'total': 0.0, 'throttle_wait': 0.0, 'status_codes': {},
+        'histogram': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+    }
+
+
+def latency_bucket(total_seconds):
+    return bisect.bisect_left(LATENCY_BUCKETS_MS, total_seconds * 1000.0)
+
+
+def record_request(key, method, endpoint, timing, status_code=0, bytes_sent=0, bytes_received=0):
+    """
+    Add one finished request to the aggregates of this worker. ``status_code`` 0 means no response was received.
+    """
+    hour = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0, tzinfo=None)
+    with _aggregates_lock:
+        aggregate = _aggregates.setdefault((key, method, endpoint, hour), _new_aggregate())
+        aggregate['requests'] += 1
+        aggregate['errors'] += 1 if not status_code or status_code >= 400 else 0
+        aggregate['retries'] += max(timing.attempts - 1, 0)
+        aggregate['bytes_sent'] += bytes_sent
+        aggregate['bytes_received'] += bytes_received
+        aggregate['dns'] += timing.dns
+        aggregate['connect'] += timing.connect
+        aggregate['ttfb'] += timing.ttfb
+        aggregate['total'] += timing.total
+        aggregate['throttle_wait'] += timing.throttle_wait
+        status = str(status_code or 'error')
+        aggregate['status_codes'][status] = aggregate['status_codes'].get(status, 0) + 1
+        aggregate['histogram'][latency_bucket(timing.total)] += 1
+
+
+def add_received_bytes(key, method, endpoint, bytes_received):
+    """
+    Streamed bodies are read after the request was recorded, their size is added afterwards.
+    """
+    hour = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0, tzinfo=None)
+    with _aggregates_lock:
+        aggregate = _aggregates.setdefault((key, method, endpoint, hour), _new_aggregate())
+        aggregate['bytes_received'] += bytes_received
+
+
+def flush_due(dbname):
+    return time.monotonic() - _last_flush.get(dbname, 0.0) >= FLUSH_INTERVAL_SECONDS
+
+
+def drain(dbname):
+    """
+    Remove and return the aggregates of ``dbname``: {(instance_id, method, endpoint, hour): aggregate}.
+    """
+    with _aggregates_lock:
+        _last_flush[dbname] = time.monotonic()
+        keys = [key for key in _aggregates if key[0][0] == dbname]
+        return {(key[0][1],) + key[1:]: _aggregates.pop(key) for key in keys}
+
+
+def restore(dbname, drained):
+    """
+    Put drained aggregates back, used when they could not be stored.
+    """
+    for (instance_id, method, endpoint, hour), aggregate in drained.items():
+        with _aggregates_lock:
+            current = _aggregates.setdefault(((dbname, instance_id), method, endpoint, hour), _new_aggregate())
+            merge_aggregate(current, aggregate)
+
+
+def merge_aggregate(target, source):
+    for name in ('requests', 'errors', 'retries', 'bytes_sent', 'bytes_received', 'dns', 'connect', 'ttfb',
+                 'total', 'throttle_wait'):
+        target[name] = target.get(name, 0) + source.get(name, 0)
+    for status, count in (source.get('status_codes') or {}).items():
+        target['status_codes'][status] = target['status_codes'].get(status, 0) + count
+    histogram = target.setdefault('histogram', [0] * (len(LATENCY_BUCKETS_MS) + 1))
+    for index, count in enumerate(source.get('histogram') or []):
+        if index < len(histogram):
+            histogram[index] += count
+    return target
+
+
+def percentile(histogram, fraction):
+    """
+    Estimate a latency percentile (milliseconds) from the histogram, interpolating inside the matching bucket.
+    """
+    count = sum(histogram)
+    if not count:
+        return 0.0
+    rank = fraction * count
+    seen = 0
+    for index, bucket_count in enumerate(histogram):
+        if not bucket_count or seen + bucket_count < rank:
+            seen += bucket_count
+            continue
+        lower = LATENCY_BUCKETS_MS[index - 1] if index else 0.0
+        if index >= len(LATENCY_BUCKETS_MS):
+            return float(lower)
+        upper = LATENCY_BUCKETS_MS[index]
+        return lower + (upper - lower) * (rank - seen) / bucket_count
+    return float(LATENCY_BUCKETS_MS[-1])
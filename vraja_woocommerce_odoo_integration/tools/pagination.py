@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent pagination of WooCommerce list endpoints.
+
+The first page is read synchronously to get the ``X-WP-Total`` and ``X-WP-TotalPages`` headers. The remaining pages
+are then fetched on a bounded thread pool. All threads go through the same client, so they share the keep-alive
+session, the instance rate limiter and the retry policy. Pages are always returned in page order.
+"""
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from . import api_client, circuit_breaker, json_stream
+
+_logger = logging.getLogger("WooCommerce API")
+
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_PAGE_WORKERS = 4
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class WooCommercePaginationError(Exception):
+
+    def __init__(self, status_code, response_text, page):
+        super(WooCommercePaginationError, self).__init__(
+            "WooCommerce returned HTTP %s for page %s: %s" % (status_code, page, response_text))
+        self.status_code = status_code
+        self.response_text = response_text
+        self.page = page
+
+
+class GuardedRecordStream(object):
+    """
+    Iterable over a record stream which stops at the first download or decoding failure instead of raising it in
+    the consumer, so the records already handed over are kept. Once consumed, ``truncated`` (and ``error``) tell
+    the caller that the stream was cut short and the records after ``count`` were never received.
+    """
+
+    def __init__(self, records, on_finish=None):
+        self.records = records
+        self.on_finish = on_finish
+        self.count = 0
+        self.truncated = False
+        self.error = None
+
+    def __iter__(self):
+        try:
+            for record in self.records:
+                self.count += 1
+                yield record
+        except (WooCommercePaginationError, circuit_breaker.WooCommerceCircuitOpenError, ValueError,
+                OSError) as error:
+            # The circuit breaker opening while the pages are read cuts the stream short like a failed page.
+            self.truncated = True
+            self.error = error
+        finally:
+            if self.on_finish:
+                self.on_finish(self)
+
+
+def is_truncated(records):
+    return bool(getattr(records, 'truncated', False))
+
+
+def _read_page(client, url, params, page, stream=False):
+    page_params = dict(params, page=page)
+    response = client.send("GET", url, params=page_params, stream=stream)
+    if response.status_code != 200:
+        raise WooCommercePaginationError(response.status_code, response.text, page)
+    return response
+
+
+def _header_int(response, header):
+    try:
+        return int(response.headers.get(header) or 0)
+    except ValueError:
+        return 0
+
+
+def _close_future(future):
+    if not future.cancel() and future.done() and not future.exception():
+        future.result().close()
+
+
+def _iter_responses(client, url, params, first_page, response, max_workers, stream):
+    """
+    Yield ``response`` (the first page) and the responses of the next pages, in page order.
+    """
+    total_pages = _header_int(response, 'X-WP-TotalPages')
+    _logger.info("WooCommerce %s: %s records on %s pages.", url, _header_int(response, 'X-WP-Total'),
+                 total_pages or 'unknown')
+    yield response
+    if not total_pages:
+        next_page_link = response.links and response.links.get('next', {}).get('url')
+        while next_page_link:
+            response = client.send("GET", next_page_link, stream=stream)
+            if response.status_code != 200:
+                raise WooCommercePaginationError(response.status_code, response.text, next_page_link)
+            next_page_link = response.links and response.links.get('next', {}).get('url')
+            yield response
+        return
+    remaining_pages = range(first_page + 1, total_pages + 1)
+    if not remaining_pages:
+        return
+    workers = max(1, min(max_workers or DEFAULT_PAGE_WORKERS, client.pool_maxsize, len(remaining_pages)))
+    # Only a few pages are requested ahead of the consumer, so a long backfill never sits in memory at once.
+    # A streamed page keeps its connection until its body is read, so the window is smaller in that mode.
+    window = workers if stream else workers * 2
+    pending_pages = iter(remaining_pages)
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="woocommerce_page") as executor:
+        try:
+            for page in pending_pages:
+                in_flight.append(executor.submit(_read_page, client, url, params, page, stream))
+                if len(in_flight) >= window:
+                    break
+            while in_flight:
+                page_response = in_flight.popleft().result()
+                next_page = next(pending_pages, None)
+                if next_page:
+                    in_flight.append(executor.submit(_read_page, client, url, params, next_page, stream))
+                yield page_response
+        finally:
+            for future in in_flight:
+                _close_future(future)
+
+
+def _prepare_params(params):
+    params = api_client.normalize_params(params)
+    params.setdefault('per_page', DEFAULT_PAGE_SIZE)
+    first_page = int(params.pop('page', 1) or 1)
+    return params, first_page
+
+
+def iter_pages(client, url, params=None, max_workers=DEFAULT_PAGE_WORKERS):
+    """
+    Yield the decoded content of every page of ``url`` in page order.
+    When the store does not send ``X-WP-TotalPages`` the ``next`` links are followed one by one.
+    """
+    params, first_page = _prepare_params(params)
+    response = _read_page(client, url, params, first_page)
+    for page_response in _iter_responses(client, url, params, first_page, response, max_workers, False):
+        yield page_response.json()
+
+
+def fetch_all_pages(client, url, params=None, max_workers=DEFAULT_PAGE_WORKERS):
+    """
+    Return the records of every page of ``url`` as one list.
+    """
+    records = []
+    for page_data in iter_pages(client, url, params=params, max_workers=max_workers):
+        if isinstance(page_data, list):
+            records.extend(page_data)
+        else:
+            records.append(page_data)
+    return records
+
+
+def open_record_stream(client, url, params=None, max_workers=DEFAULT_PAGE_WORKERS):
+    """
+    Request the first page of ``url`` right away (so a wrong URL or credential fails here) and return a generator
+    yielding the records of every page one by one. Page bodies are decoded while they are downloaded, the headers
+    of the next pages are already fetched by the thread pool.
+    """
+    params, first_page = _prepare_params(params)
+    response = _read_page(client, url, params, first_page, stream=True)
+    return _iter_streamed_records(client, url, params, first_page, response, max_workers)
+
+
+def _iter_streamed_records(client, url, params, first_page, response, max_workers):
+    for page_response in _iter_responses(client, url, params, first_page, response, max_workers, True):
+        decoded_size = [0]
+
+        def _chunks(page_response=page_response):
+            for chunk in page_response.iter_content(STREAM_CHUNK_SIZE):
+                decoded_size[0] += len(chunk)
+                yield chunk
+
+        try:
+            for record in json_stream.iter_json_array(_chunks()):
+                yield record
+        finally:
+            client.record_streamed_response(page_response, decoded_size[0])
+            page_response.close()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Storage format of the data queue lines.
+
+A payload is the WooCommerce dictionary a queue line has to process. It is stored as compact JSON in the text column
+of the line, or, when compression is enabled and the JSON is large enough, zlib compressed (base64, as every Odoo
+binary value) in a binary column with an empty text column. ``encode`` / ``decode`` are the only entry points, the
+encoding name is stored next to the payload.
+
+Lines created before this format were written with ``pprint.pformat``: ``decode`` still reads them with
+``ast.literal_eval`` (never ``eval``) when they are not valid JSON.
+"""
+import ast
+import base64
+import json
+import zlib
+
+ENCODING_JSON = 'json'
+ENCODING_ZLIB = 'zlib'
+ENCODINGS = [(ENCODING_JSON, 'JSON'), (ENCODING_ZLIB, 'Compressed JSON')]
+
+# Below this size (characters of compact JSON) compression saves too little to be worth a binary column.
+MIN_COMPRESSED_SIZE = 2048
+COMPRESSION_LEVEL = 6
+
+
+def dumps(data):
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def loads(text):
+    """
+    Decode a text payload: compact JSON, or the python literal written by the former ``pprint`` storage.
+    """
+    try:
+        return json.loads(text)
+    except ValueError:
+        return ast.literal_eval(text)
+
+
+def encode(data, compress=False, min_size=MIN_COMPRESSED_SIZE):
+    """
+    :return: (encoding, text, compressed) where exactly one of text / compressed is set.
+    """
+    text = dumps(data)
+    if compress and len(text) >= min_size:
+        compressed = base64.b64encode(zlib.compress(text.encode('utf-8'), COMPRESSION_LEVEL))
+        return ENCODING_ZLIB, False, compressed
+    return ENCODING_JSON, text, False
+
+
+def decode(encoding, text, compressed):
+    if encoding == ENCODING_ZLIB and compressed:
+        if isinstance(compressed, str):
+            compressed = compressed.encode('ascii')
+        return json.loads(zlib.decompress(base64.b64decode(compressed)).decode('utf-8'))
+    if not text:
+        return {}
+    return loads(text)
+
+
+def pretty(data):
+    return json.dumps(data, indent=2, ensure_ascii=False, sort_keys=True, default=str)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Adaptive token bucket shared by every cron, wizard and thread of an Odoo worker for one WooCommerce instance.
+
+The bucket starts at the configured rate. It halves the rate when the store answers 429/503 and pauses until the
+``Retry-After`` delay has elapsed. Slow responses reduce the rate a little, and successful responses slowly bring it
+back up to the configured maximum (AIMD).
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+_logger = logging.getLogger("WooCommerce API")
+
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 10
+THROTTLE_STATUS_CODES = (429, 503)
+MIN_RATE = 0.2
+SLOW_RESPONSE_SECONDS = 5.0
+MAX_RETRY_AFTER_SECONDS = 300.0
+
+_bucket_registry = {}
+_bucket_registry_lock = threading.Lock()
+
+
+def parse_retry_after(value):
+    """
+    Convert a ``Retry-After`` header (delta seconds or HTTP date) into a number of seconds.
+    """
+    if not value:
+        return 0.0
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return 0.0
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER_SECONDS)
+
+
+class AdaptiveTokenBucket(object):
+
+    def __init__(self, max_rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self._lock = threading.Lock()
+        self.max_rate = max_rate
+        self.burst = burst
+        self.rate = max_rate
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def configure(self, max_rate, burst):
+        with self._lock:
+            if (max_rate, burst) == (self.max_rate, self.burst):
+                return
+            self.max_rate = max_rate
+            self.burst = burst
+            self.rate = min(self.rate, max_rate)
+            self.tokens = min(self.tokens, float(burst))
+
+    def _refill(self, now):
+        self.tokens = min(float(self.burst), self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self):
+        """
+        Block until a token is available and return the number of seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return waited
+                delay = max(self.blocked_until - now, (1.0 - self.tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def feedback(self, status_code, latency, retry_after=0.0):
+        """
+        Adjust the rate from the result of a request and return the number of seconds the caller should wait
+        before replaying a throttled request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if status_code in THROTTLE_STATUS_CODES:
+                self.rate = max(MIN_RATE, self.rate / 2.0)
+                self.tokens = 0.0
+                pause = retry_after or 1.0 / self.rate
+                self.blocked_until = max(self.blocked_until, now + pause)
+                return pause
+            if latency and latency > SLOW_RESPONSE_SECONDS:
+                self.rate = max(MIN_RATE, self.rate * 0.9)
+            elif self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20.0)
+            return 0.0
+
+
+def get_bucket(key, max_rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+    """
+    Return the token bucket registered for ``key``, creating it on first use.
+    """
+    max_rate = max_rate if max_rate and max_rate > 0 else DEFAULT_RATE
+    burst = max(int(burst or DEFAULT_BURST), 1)
+    with _bucket_registry_lock:
+        bucket = _bucket_registry.get(key)
+        if not bucket:
+            bucket = _bucket_registry[key] = AdaptiveTokenBucket(max_rate, burst)
+            return bucket
+    bucket.configure(max_rate, burst)
+    return bucket
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Retry classification and backoff used by :class:`api_client.WooCommerceApiClient`.
+
+A request is replayed after a transient failure (connection error, timeout, HTTP 500/502/504) only when replaying it
+cannot create duplicates on the WooCommerce side:
+
+* GET, HEAD, OPTIONS, PUT and DELETE are always replayed.
+* POST on ``.../batch`` is replayed when the payload does not contain a ``create`` section.
+* POST on an existing resource (``.../products/42``) is an update and is replayed.
+* Any other POST (order refunds, resource creation, ...) is only replayed when the connection could not be
+  established, i.e. when the request never reached the store.
+"""
+import json
+import random
+import re
+
+from requests import exceptions as requests_exceptions
+from urllib3 import exceptions as urllib3_exceptions
+
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_TIMEOUT = 60
+CONNECT_TIMEOUT = 10
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+RETRY_STATUS_CODES = (500, 502, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+RETRY_ALWAYS = 'always'
+RETRY_CONNECT_ONLY = 'connect_only'
+
+_resource_update_path = re.compile(r'/\d+/?$')
+
+
+def _payload_sections(data):
+    if isinstance(data, (bytes, str)):
+        try:
+            data = json.loads(data)
+        except ValueError:
+            return None
+    return data if isinstance(data, dict) else None
+
+
+def classify_request(method, url, data=None):
+    """
+    Return ``RETRY_ALWAYS`` when the request can be safely replayed, ``RETRY_CONNECT_ONLY`` otherwise.
+    """
+    method = (method or 'GET').upper()
+    if method in IDEMPOTENT_METHODS:
+        return RETRY_ALWAYS
+    path = (url or '').split('?', 1)[0]
+    if method == 'POST' and path.rstrip('/').endswith('/batch'):
+        sections = _payload_sections(data)
+        if sections is not None and not sections.get('create'):
+            return RETRY_ALWAYS
+        return RETRY_CONNECT_ONLY
+    if method in ('POST', 'PATCH') and _resource_update_path.search(path):
+        return RETRY_ALWAYS
+    return RETRY_CONNECT_ONLY
+
+
+def is_connect_error(error):
+    """
+    True when the request could not reach the server at all (DNS failure, refused connection, connect timeout).
+    """
+    if isinstance(error, requests_exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests_exceptions.ConnectionError):
+        reason = error.args and error.args[0]
+        reason = getattr(reason, 'reason', reason)
+        return isinstance(reason, (urllib3_exceptions.NewConnectionError, urllib3_exceptions.ConnectTimeoutError))
+    return False
+
+
+def should_retry_error(classification, error):
+    if classification == RETRY_ALWAYS:
+        return isinstance(error, (requests_exceptions.ConnectionError, requests_exceptions.Timeout))
+    return is_connect_error(error)
+
+
+def should_retry_status(classification, status_code):
+    return classification == RETRY_ALWAYS and status_code in RETRY_STATUS_CODES
+
+
+def backoff_delay(attempt):
+    """
+    Exponential backoff with full jitter for the given (1 based) retry attempt.
+    """
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))